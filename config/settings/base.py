@@ -60,6 +60,17 @@ DATABASES["default"]["ATOMIC_REQUESTS"] = True
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# CACHES
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#caches
+# The cache must be shared by all processes: cached fragments stay valid until
+# a data version is bumped (see kara.base.cache), which the other workers have
+# to see. CACHE_URL may point to e.g. Redis (redis://redis:6379/0), otherwise
+# the database cache is used (created by `manage.py createcachetable`).
+CACHES = {"default": env.cache_url("CACHE_URL", default="dbcache://kara_cache")}
+# Seconds a fragment cached by {% versioned_cache %} is kept at most.
+VERSIONED_CACHE_TIMEOUT = 60 * 60 * 24
+
 # URLS
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#root-urlconf
@@ -286,7 +297,11 @@ NPM_BIN_PATH = "/usr/bin/npm"
 # ------------------------------------------------------------------------------
 SEARCH_VAR = "search"
 ORDER_VAR = "order"
+HIDE_VAR = "hide"
 
 # WEDDING GIFT
 # ------------------------------------------------------------------------------
 WEDDING_GIFT_REGISTRY_TABLE_LIST_PER_PAGE = 15
+WEDDING_GIFT_REGISTRY_SELECTOR_LIST_PER_PAGE = 10
+# Seconds the gifts suggested while typing a search are cached.
+WEDDING_GIFT_TYPEAHEAD_CACHE_TIMEOUT = 30
@@ -17,6 +17,15 @@ DATABASES["default"] = dj_database_url.config(
     conn_health_checks=True,
 )
 
+# CACHES
+# ------------------------------------------------------------------------------
+# Tests run in a single process.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
 # MEDIA
 # ------------------------------------------------------------------------------
 MEDIA_URL = "test_media/"
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class BaseConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "kara.base"
+
+    def ready(self):
+        from django.db.models import CharField, TextField
+
+        from . import checks  # noqa: F401
+        from .search import NormalizedExact
+
+        CharField.register_lookup(NormalizedExact)
+        TextField.register_lookup(NormalizedExact)
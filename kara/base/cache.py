@@ -0,0 +1,89 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+
+DATA_VERSION_KEY_PREFIX = "kara.data_version"
+
+
+def make_cache_key(prefix, *parts):
+    """
+    Build a cache key from arbitrary parts.
+    The parts are hashed so the key stays short and memcached-safe.
+    """
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f"{prefix}.{digest}"
+
+
+def get_data_version(key):
+    """
+    Return the current version of the data identified by `key`.
+
+    Cache entries that include the version in their key are invalidated
+    by `bump_data_version()` instead of expiring after a timeout.
+    A missing version (never set or evicted) starts from the current time,
+    so it never matches a version used by entries cached before.
+    """
+    version_key = f"{DATA_VERSION_KEY_PREFIX}.{key}"
+    return cache.get_or_set(version_key, time.time_ns, timeout=None)
+
+
+def bump_data_version(*keys):
+    for key in keys:
+        version_key = f"{DATA_VERSION_KEY_PREFIX}.{key}"
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, time.time_ns(), timeout=None)
+
+
+REQUEST_SEQUENCE_KEY_PREFIX = "kara.request_sequence"
+# A claim compares and sets the latest sequence while holding a lock, which
+# expires in case the claiming process dies.
+CLAIM_LOCK_TIMEOUT = 1
+CLAIM_LOCK_ATTEMPTS = 20
+CLAIM_LOCK_RETRY_DELAY = 0.005
+
+
+def claim_request(key, sequence, timeout=60):
+    """
+    Record `sequence` as the latest request identified by `key` (e.g. a
+    client and a table) and return True, or return False if a later request
+    was already recorded, so the stale request can be dropped.
+
+    Sequences are numbers growing with each request of the client, e.g. the
+    time the request was sent. Claims of the same key are serialized by a
+    lock taken with `cache.add()`, which is atomic, so an older request never
+    overwrites the sequence of a later one. If the lock can't be taken in
+    time, the request is treated as stale. A request claimed before a later
+    one still runs, `is_latest_request()` tells it apart.
+
+    The cache must be shared by the processes serving the requests (see the
+    CACHES setting).
+    """
+    sequence_key = f"{REQUEST_SEQUENCE_KEY_PREFIX}.{key}"
+    lock_key = f"{sequence_key}.lock"
+    for _ in range(CLAIM_LOCK_ATTEMPTS):
+        if cache.add(lock_key, sequence, timeout=CLAIM_LOCK_TIMEOUT):
+            break
+        time.sleep(CLAIM_LOCK_RETRY_DELAY)
+    else:
+        # Another request of the key holds the lock, most likely a later one.
+        return False
+    try:
+        latest = cache.get(sequence_key)
+        if latest is not None and latest > sequence:
+            return False
+        cache.set(sequence_key, sequence, timeout=timeout)
+        return True
+    finally:
+        cache.delete(lock_key)
+
+
+def is_latest_request(key, sequence):
+    """
+    Return False if a request later than `sequence` was claimed for `key`
+    (see `claim_request()`).
+    """
+    latest = cache.get(f"{REQUEST_SEQUENCE_KEY_PREFIX}.{key}")
+    return latest is None or latest <= sequence
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.module_loading import autodiscover_modules
+
+from .tables import Table, get_all_columns
+
+# Cache backends whose entries aren't shared by the processes of a server.
+PROCESS_LOCAL_CACHE_BACKENDS = {
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+}
+
+
+def get_table_classes(cls=Table):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from get_table_classes(subclass)
+
+
+def get_lookup_path(lookup):
+    return lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+
+
+@checks.register("tables")
+def check_table_related_lookups(app_configs=None, **kwargs):
+    """
+    Warns when a Table declares its related lookups but renders a
+    relational column they don't cover, which runs a query per row.
+    """
+    # Tables are declared in the "tables" module of each app.
+    autodiscover_modules("tables")
+    errors = []
+    for table in get_table_classes():
+        if table.model is None or (
+            table.select_related is None and table.prefetch_related is None
+        ):
+            # Related lookups are planned automatically from the columns.
+            continue
+        opts = table.model._meta
+        if app_configs is not None and opts.app_config not in app_configs:
+            continue
+        columns = get_all_columns(opts) if table.columns == "__all__" else table.columns
+        planned = [
+            get_lookup_path(lookup)
+            for lookup in [
+                *(table.select_related or []),
+                *(table.prefetch_related or []),
+            ]
+        ]
+        for column in columns:
+            try:
+                field = opts.get_field(column)
+            except FieldDoesNotExist:
+                continue
+            if not field.is_relation:
+                continue
+            if any(
+                path == column or path.startswith(f"{column}__") for path in planned
+            ):
+                continue
+            errors.append(
+                checks.Warning(
+                    "%s renders the relation '%s' but doesn't select or "
+                    "prefetch it." % (table.__qualname__, column),
+                    hint=(
+                        "Add '%s' to select_related or prefetch_related, "
+                        "or set both to None to plan them from the columns." % column
+                    ),
+                    obj=table,
+                    id="tables.W001",
+                )
+            )
+    return errors
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs=None, **kwargs):
+    """
+    Fails when the default cache isn't shared by the processes of a server:
+    data versions bumped by one worker (see kara.base.cache) wouldn't be seen
+    by the others, which would keep serving stale fragments.
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [
+        checks.Error(
+            "The default cache (%s) isn't shared by the server processes." % backend,
+            hint="Set CACHE_URL to a Redis, Memcached or database cache.",
+            id="base.E001",
+        )
+    ]
@@ -0,0 +1,223 @@
+import re
+import unicodedata
+
+from django.contrib.postgres.search import SearchVectorField
+
+SYLLABLE_FIRST = 0xAC00
+SYLLABLE_LAST = 0xD7A3
+JUNGSEONG_CNT = 21
+JONGSEONG_CNT = 28
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+# Compound vowels and final consonants are split into the jamo typed to
+# compose them, so a syllable being typed is a prefix of the whole syllable
+# (e.g. 호 while typing 화, 달 while typing 닭).
+JUNGSEONG = [
+    *"ㅏㅐㅑㅒㅓㅔㅕㅖㅗ",
+    "ㅗㅏ",
+    "ㅗㅐ",
+    "ㅗㅣ",
+    *"ㅛㅜ",
+    "ㅜㅓ",
+    "ㅜㅔ",
+    "ㅜㅣ",
+    *"ㅠㅡ",
+    "ㅡㅣ",
+    "ㅣ",
+]
+JONGSEONG = [
+    "",
+    *"ㄱㄲ",
+    "ㄱㅅ",
+    "ㄴ",
+    "ㄴㅈ",
+    "ㄴㅎ",
+    *"ㄷㄹ",
+    "ㄹㄱ",
+    "ㄹㅁ",
+    "ㄹㅂ",
+    "ㄹㅅ",
+    "ㄹㅌ",
+    "ㄹㅍ",
+    "ㄹㅎ",
+    *"ㅁㅂ",
+    "ㅂㅅ",
+    *"ㅅㅆㅇㅈㅊㅋㅌㅍㅎ",
+]
+COMPOUND_JAMO = {
+    "ㄳ": "ㄱㅅ",
+    "ㄵ": "ㄴㅈ",
+    "ㄶ": "ㄴㅎ",
+    "ㄺ": "ㄹㄱ",
+    "ㄻ": "ㄹㅁ",
+    "ㄼ": "ㄹㅂ",
+    "ㄽ": "ㄹㅅ",
+    "ㄾ": "ㄹㅌ",
+    "ㄿ": "ㄹㅍ",
+    "ㅀ": "ㄹㅎ",
+    "ㅄ": "ㅂㅅ",
+    "ㅘ": "ㅗㅏ",
+    "ㅙ": "ㅗㅐ",
+    "ㅚ": "ㅗㅣ",
+    "ㅝ": "ㅜㅓ",
+    "ㅞ": "ㅜㅔ",
+    "ㅟ": "ㅜㅣ",
+    "ㅢ": "ㅡㅣ",
+}
+# Words are runs of letters and digits, split like the PostgreSQL text
+# search parser splits them, so tsquery words match the stored lexemes.
+WORD_RE = re.compile(r"[^\W_]+")
+# Weights of the lexemes in the search vector.
+JAMO_WEIGHT = "A"
+CHOSEONG_WEIGHT = "B"
+
+
+def is_syllable(char):
+    return SYLLABLE_FIRST <= ord(char) <= SYLLABLE_LAST
+
+
+def get_words(text):
+    return WORD_RE.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def decompose(text):
+    """
+    Returns the text with Hangul syllables and compound jamo decomposed into
+    the jamo typed on a keyboard, e.g. "김민수" -> "ㄱㅣㅁㅁㅣㄴㅅㅜ".
+    """
+    jamo = []
+    for char in text:
+        if is_syllable(char):
+            code = ord(char) - SYLLABLE_FIRST
+            jamo.append(CHOSEONG[code // (JUNGSEONG_CNT * JONGSEONG_CNT)])
+            jamo.append(JUNGSEONG[code // JONGSEONG_CNT % JUNGSEONG_CNT])
+            jamo.append(JONGSEONG[code % JONGSEONG_CNT])
+        else:
+            jamo.append(COMPOUND_JAMO.get(char, char))
+    return "".join(jamo)
+
+
+def get_choseong(text):
+    """
+    Returns the initial consonants (choseong) of the Hangul syllables of
+    the text, other characters are kept, e.g. "김민수" -> "ㄱㅁㅅ".
+    """
+    return "".join(
+        (
+            CHOSEONG[(ord(char) - SYLLABLE_FIRST) // (JUNGSEONG_CNT * JONGSEONG_CNT)]
+            if is_syllable(char)
+            else char
+        )
+        for char in text
+    )
+
+
+def is_choseong(word):
+    return all(char in CHOSEONG for char in word)
+
+
+def get_search_lexemes(text):
+    """
+    Returns the (lexeme, weight) pairs indexed for the text: for each word,
+    the decomposed jamo of each of its suffixes and, if the word contains
+    Hangul syllables, the choseong of each of its suffixes.
+
+    Since every suffix is indexed, a prefix match on the lexemes matches any
+    part of a word, e.g. "ㅁㅣㄴ" (민) and "ㅁㅅ" match 김민수.
+    """
+    lexemes = {}
+    for word in get_words(text):
+        has_syllables = any(is_syllable(char) for char in word)
+        for i in range(len(word)):
+            lexemes.setdefault((decompose(word[i:]), JAMO_WEIGHT))
+            if has_syllables:
+                lexemes.setdefault((get_choseong(word[i:]), CHOSEONG_WEIGHT))
+    return list(lexemes)
+
+
+def to_search_vector(text):
+    """
+    Returns the tsvector literal of the search lexemes of the text.
+    Lexemes are made of letters and digits only, so they need no escaping.
+    """
+    return " ".join(
+        f"'{lexeme}':{position}{weight}"
+        for position, (lexeme, weight) in enumerate(get_search_lexemes(text), 1)
+    )
+
+
+def get_search_terms(text):
+    """
+    Returns the (lexeme prefix, weight) terms searched for the text: the
+    choseong lexemes for words of initial consonants only (e.g. "ㄱㅁ"), the
+    jamo lexemes otherwise (e.g. "김미" while typing 김민수).
+    """
+    terms = []
+    for word in get_words(text):
+        if is_choseong(word):
+            terms.append((word, CHOSEONG_WEIGHT))
+        else:
+            terms.append((decompose(word), JAMO_WEIGHT))
+    return terms
+
+
+def to_search_query(text):
+    """
+    Returns the raw tsquery matching the lexemes stored by to_search_vector()
+    that start with every term of the text (see get_search_terms()).
+    Returns an empty string if the text has no words.
+    """
+    return " & ".join(
+        f"'{prefix}':*{weight}" for prefix, weight in get_search_terms(text)
+    )
+
+
+def matches_search(text, search_text):
+    """
+    Returns whether the text matches the search text, like the tsquery of
+    to_search_query() matches the tsvector of to_search_vector().
+    """
+    lexemes = get_search_lexemes(text)
+    return all(
+        any(
+            lexeme.startswith(prefix) and lexeme_weight == weight
+            for lexeme, lexeme_weight in lexemes
+        )
+        for prefix, weight in get_search_terms(search_text)
+    )
+
+
+def is_broader_search(search_text, other_search_text):
+    """
+    Returns whether every text matching other_search_text also matches
+    search_text, e.g. "김" and "김민 ㅅ".
+    """
+    other_terms = get_search_terms(other_search_text)
+    return all(
+        any(
+            other_prefix.startswith(prefix) and other_weight == weight
+            for other_prefix, other_weight in other_terms
+        )
+        for prefix, weight in get_search_terms(search_text)
+    )
+
+
+class HangulSearchVectorField(SearchVectorField):
+    """
+    Stores the search lexemes (see get_search_lexemes()) of the `source`
+    field. The value is computed whenever the model instance is saved or
+    bulk created, but not by QuerySet.update() or bulk_update().
+    """
+
+    def __init__(self, *args, source, **kwargs):
+        self.source = source
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["source"] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = to_search_vector(getattr(model_instance, self.source) or "")
+        setattr(model_instance, self.attname, value)
+        return value
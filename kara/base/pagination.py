@@ -1,15 +1,198 @@
-from django.core.paginator import InvalidPage, Paginator
+import json
 
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ImproperlyConfigured, ValidationError
+from django.core.paginator import EmptyPage, InvalidPage, PageNotAnInteger, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models
+from django.db.models.query import ModelIterable, ValuesIterable
+
+from .cache import make_cache_key
 from .exceptions import IncorectLookupParameter
+from .rows import RowIterable
+
+
+class SinglePassPaginator(Paginator):
+    """
+    A Paginator that fetches a page and the total number of objects
+    in a single query by annotating the rows with a `COUNT(*) OVER ()` window.
+
+    COUNT is only queried separately if the requested page is out of range
+    or the queryset can't carry the window (e.g. DISTINCT or combined
+    queries). Once the count is known, pages are sliced as usual.
+    """
+
+    count_alias = "pagination_total_count"
+
+    def can_count_in_window(self):
+        object_list = self.object_list
+        if not isinstance(object_list, models.QuerySet):
+            return False
+        query = object_list.query
+        return (
+            not self.orphans
+            and not query.distinct
+            and not query.combinator
+            and not query.is_sliced
+            and issubclass(
+                object_list._iterable_class,
+                (ModelIterable, ValuesIterable, RowIterable),
+            )
+        )
+
+    def get_page(self, number):
+        if "count" in self.__dict__ or not self.can_count_in_window():
+            return super().get_page(number)
+        # Unlike Paginator.get_page(), the number isn't validated against
+        # the count up front, page() raises EmptyPage if it is out of range.
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            number = 1
+        except EmptyPage:
+            number = self.num_pages
+        return self.page(number)
+
+    def page(self, number):
+        if "count" in self.__dict__ or not self.can_count_in_window():
+            return super().page(number)
+        # Same as validate_number(), except for the upper bound
+        # which can't be checked before the count is known.
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        object_list = self.object_list.annotate(
+            **{self.count_alias: models.Window(models.Count("*"))}
+        )[bottom:top]
+        if object_list:
+            row = object_list[0]
+            self.count = (
+                row[self.count_alias]
+                if isinstance(row, dict)
+                else getattr(row, self.count_alias)
+            )
+        elif number == 1:
+            self.count = 0
+            if not self.allow_empty_first_page:
+                raise EmptyPage(self.error_messages["no_results"])
+        else:
+            raise EmptyPage(self.error_messages["no_results"])
+        return self._get_page(object_list, number, self)
+
+
+class ExactCount:
+    """
+    Count provider that always counts the results exactly.
+
+    A count provider supplies `Pagination` with the number of results
+    before the page is fetched. `get_count()` returns None when the count
+    isn't known in advance, in which case it is counted together with
+    the page (see SinglePassPaginator) and passed to `set_count()`.
+    """
+
+    estimated = False
+
+    def get_count(self, queryset):
+        return None
+
+    def set_count(self, queryset, count):
+        pass
+
+
+class CachedCount(ExactCount):
+    """
+    Count provider that caches the exact count.
+
+    The cache key is built from the SQL of the unordered queryset, which
+    covers its filters and search terms, and from `version`. Pass a data
+    version that changes whenever the counted rows change (see
+    `kara.base.cache.get_data_version`) so a stale count is never served.
+    """
+
+    cache_key_prefix = "kara.pagination.count"
+
+    def __init__(self, version, timeout=None):
+        self.version = version
+        self.timeout = timeout
+
+    def get_cache_key(self, queryset):
+        try:
+            sql, params = queryset.order_by().query.sql_with_params()
+        except EmptyResultSet:
+            # Nothing to cache, e.g. QuerySet.none().
+            return None
+        return make_cache_key(
+            self.cache_key_prefix, queryset.db, sql, params, self.version
+        )
+
+    def get_count(self, queryset):
+        cache_key = self.get_cache_key(queryset)
+        return cache.get(cache_key) if cache_key else None
+
+    def set_count(self, queryset, count):
+        cache_key = self.get_cache_key(queryset)
+        if cache_key:
+            cache.set(cache_key, count, self.timeout)
+
+
+class EstimatedCount(ExactCount):
+    """
+    Count provider that uses the PostgreSQL planner statistics
+    (`pg_class.reltuples`) for unfiltered querysets.
+
+    The estimate is only used when it is at least `threshold`,
+    smaller tables and filtered, grouped or distinct querysets
+    are counted exactly.
+    """
+
+    estimated = True
+
+    def __init__(self, threshold=10_000):
+        self.threshold = threshold
+
+    def can_estimate(self, queryset):
+        query = queryset.query
+        return (
+            connections[queryset.db].vendor == "postgresql"
+            and not query.where
+            and not query.distinct
+            and not query.combinator
+            and query.group_by is None
+        )
+
+    def get_count(self, queryset):
+        if not self.can_estimate(queryset):
+            return None
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 if the table has never been analyzed.
+        if row is None or row[0] < self.threshold:
+            return None
+        return row[0]
 
 
 class Pagination:
+    count_provider_class = ExactCount
+
     def __init__(
         self,
         request,
         queryset,
         list_per_page,
         page_var="page",
+        count_provider=None,
     ):
         self.queryset = queryset
         model = queryset.model
@@ -23,6 +206,7 @@ class Pagination:
         except ValueError:
             self.page_num = 1
         self.params = request.GET.copy()
+        self.count_provider = count_provider or self.count_provider_class()
         self.setup()
 
     @property
@@ -33,8 +217,16 @@ class Pagination:
             else []
         )
 
+    @property
+    def previous_page_params(self):
+        return {self.page_var: self.page_num - 1}
+
+    @property
+    def next_page_params(self):
+        return {self.page_var: self.page_num + 1}
+
     def get_paginator_class(self, **kwargs):
-        return Paginator
+        return SinglePassPaginator
 
     def get_paginator(
         self,
@@ -48,21 +240,257 @@ class Pagination:
 
     def setup(self):
         paginator = self.get_paginator(self.queryset, self.list_per_page)
+        provided_count = self.count_provider.get_count(self.queryset)
+        if provided_count is not None:
+            paginator.count = provided_count
+        # Fetch the page before reading the count,
+        # SinglePassPaginator counts the results in the same query.
+        page = paginator.get_page(self.page_num)
         result_count = paginator.count
+        if provided_count is None:
+            self.count_provider.set_count(self.queryset, result_count)
         # Determine use pagination.
         multi_page = result_count > self.list_per_page
 
         self.result_count = result_count
+        self.result_count_estimated = (
+            provided_count is not None and self.count_provider.estimated
+        )
         self.multi_page = multi_page
         self.paginator = paginator
-        self.page = paginator.get_page(self.page_num)
+        self.page = page
 
     def get_objects(self):
-        if not self.multi_page:
-            result_list = self.queryset._clone()
-        else:
+        if self.multi_page and self.page.number != self.page_num:
+            # page_num is out of range or was changed after setup().
             try:
-                result_list = self.paginator.page(self.page_num).object_list
+                self.page = self.paginator.page(self.page_num)
             except InvalidPage:
                 raise IncorectLookupParameter
-        return result_list
+        # Reuse the rows fetched in setup() instead of querying them again.
+        return self.page.object_list
+
+
+class CursorSerializer:
+    """
+    JSON serializer for cursor tokens.
+    Ordering values such as dates, UUIDs and decimals are stored as strings
+    and converted back by the model field when the keyset filter is built.
+    """
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(",", ":"), cls=DjangoJSONEncoder).encode(
+            "latin-1"
+        )
+
+    def loads(self, data):
+        return json.loads(data.decode("latin-1"))
+
+
+class CursorPage:
+    """
+    A page of a `CursorPagination`.
+    It provides the subset of the `django.core.paginator.Page` API
+    used by the pagination template.
+    """
+
+    def __init__(self, object_list, has_previous, has_next):
+        self.object_list = object_list
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+
+class CursorPagination(Pagination):
+    """
+    Keyset (cursor) pagination.
+
+    Instead of an offset, a page is located by an opaque token holding the
+    ordering values of the row next to it, so fetching page N costs the same
+    as fetching the first page. The `page_var` query parameter carries the
+    token, which points either "after" the last row or "before" the first
+    row of the current page.
+
+    The ordering of the queryset (in a Table, the active `ORDER_VAR`
+    ordering) is used as the keyset and `tiebreaker` is appended to it
+    to make the keyset unique. `tiebreaker` is a field, or a tuple of
+    fields that are unique together. Ordering fields should be non-nullable.
+
+    No COUNT query is executed and the count provider isn't used,
+    so `result_count` is None and only the "Previous"/"Next" links
+    are rendered.
+    """
+
+    AFTER = "after"
+    BEFORE = "before"
+    tiebreaker = "pk"
+    salt = "kara.base.pagination.CursorPagination"
+
+    def __init__(
+        self, request, queryset, list_per_page, page_var="page", count_provider=None
+    ):
+        self.cursor = request.GET.get(page_var)
+        super().__init__(request, queryset, list_per_page, page_var, count_provider)
+
+    @property
+    def page_range(self):
+        # Page numbers can't be determined without counting rows.
+        return []
+
+    @property
+    def previous_page_params(self):
+        return {self.page_var: self.previous_cursor}
+
+    @property
+    def next_page_params(self):
+        return {self.page_var: self.next_cursor}
+
+    def get_ordering(self):
+        """
+        Return the keyset as a list of (field lookup, descending) pairs.
+        """
+        query = self.queryset.query
+        if query.order_by:
+            ordering = query.order_by
+        elif query.default_ordering:
+            ordering = self.opts.ordering
+        else:
+            ordering = []
+        keyset = []
+        for field in ordering:
+            if not isinstance(field, str) or field == "?":
+                raise ImproperlyConfigured(
+                    "%s only supports ordering by field names (got %r)."
+                    % (self.__class__.__name__, field)
+                )
+            keyset.append((field.removeprefix("-"), field.startswith("-")))
+        keyset_fields = {field for field, _ in keyset}
+        if not keyset_fields & {"pk", self.opts.pk.name}:
+            tiebreaker = self.tiebreaker
+            if isinstance(tiebreaker, str):
+                tiebreaker = (tiebreaker,)
+            descending = keyset[-1][1] if keyset else False
+            keyset.extend(
+                (field, descending)
+                for field in tiebreaker
+                if field not in keyset_fields
+            )
+        return keyset
+
+    @property
+    def ordering(self):
+        return [
+            f"-{field}" if descending else field for field, descending in self.keyset
+        ]
+
+    def encode_cursor(self, direction, obj):
+        values = [self.get_cursor_value(obj, field) for field, _ in self.keyset]
+        return signing.dumps(
+            [direction, self.ordering, values],
+            salt=self.salt,
+            serializer=CursorSerializer,
+            compress=True,
+        )
+
+    def decode_cursor(self, cursor):
+        """
+        Return the direction and the ordering values of a cursor token.
+        Return (None, None) if the token is missing, has been tampered with,
+        or was created for another ordering.
+        """
+        if not cursor:
+            return None, None
+        try:
+            direction, ordering, values = signing.loads(
+                cursor, salt=self.salt, serializer=CursorSerializer
+            )
+        except (signing.BadSignature, TypeError, ValueError):
+            return None, None
+        if direction not in (self.AFTER, self.BEFORE) or ordering != self.ordering:
+            return None, None
+        return direction, values
+
+    def get_cursor_value(self, obj, field):
+        if field == "pk":
+            # Rows of a Table in tuple mode (see kara.base.rows) only have
+            # the loaded fields.
+            field = self.opts.pk.attname
+        value = obj
+        for path_part in field.split("__"):
+            value = getattr(value, path_part)
+        return value
+
+    def get_keyset_filter(self, values, reverse=False):
+        """
+        Build a `Q` object matching the rows that come after the given
+        ordering values (or before them if `reverse` is True):
+        (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+        """
+        term_queries = []
+        for i, (field, descending) in enumerate(self.keyset):
+            lookup = "lt" if descending != reverse else "gt"
+            lookups = [
+                (prev_field, prev_value)
+                for (prev_field, _), prev_value in zip(self.keyset[:i], values)
+            ]
+            lookups.append((f"{field}__{lookup}", values[i]))
+            term_queries.append(models.Q.create(lookups))
+        return models.Q.create(term_queries, connector=models.Q.OR)
+
+    def setup(self):
+        self.keyset = self.get_ordering()
+        direction, values = self.decode_cursor(self.cursor)
+        queryset = self.queryset.order_by(*self.ordering)
+        if direction is not None:
+            reverse = direction == self.BEFORE
+            try:
+                queryset = queryset.filter(self.get_keyset_filter(values, reverse))
+            except (ValidationError, TypeError, ValueError):
+                # The token values don't fit the ordering fields,
+                # fall back to the first page.
+                direction = None
+            else:
+                if reverse:
+                    queryset = queryset.reverse()
+        # Fetch one extra row to find out whether there is a further page.
+        object_list = list(queryset[: self.list_per_page + 1])
+        has_more = len(object_list) > self.list_per_page
+        object_list = object_list[: self.list_per_page]
+        if direction == self.BEFORE:
+            object_list.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = direction == self.AFTER, has_more
+
+        self.result_count = None
+        self.result_count_estimated = False
+        self.multi_page = has_previous or has_next
+        self.paginator = None
+        self.page = CursorPage(object_list, has_previous, has_next)
+        self.previous_cursor = (
+            self.encode_cursor(self.BEFORE, object_list[0])
+            if has_previous and object_list
+            else None
+        )
+        self.next_cursor = (
+            self.encode_cursor(self.AFTER, object_list[-1])
+            if has_next and object_list
+            else None
+        )
+
+    def get_objects(self):
+        return self.page.object_list
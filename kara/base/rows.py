@@ -0,0 +1,144 @@
+import functools
+
+from django.db.models.query import ValuesListIterable
+
+
+class Row:
+    """
+    A lightweight table row holding only the loaded values.
+
+    Rows are built from values_list() tuples, which skips creating a model
+    instance per row. Only attribute access is supported: model methods
+    (e.g. get_FOO_display()) and related managers aren't available.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{name}={getattr(self, name, None)!r}" for name in self.__slots__
+        )
+        return f"<{self.__class__.__name__}: {values}>"
+
+
+class RelatedList(list):
+    """
+    Multi-valued relation of a Row.
+    Supports `.all()` so it can be rendered like a prefetched related manager.
+    """
+
+    def all(self):
+        return self
+
+
+@functools.cache
+def get_row_class(model, names):
+    return type(f"{model.__name__}Row", (Row,), {"__slots__": names})
+
+
+class RowIterable(ValuesListIterable):
+    """
+    Iterable that yields a Row for each row of a values_list() queryset.
+    The row class has a slot for each field, annotation and related name.
+    """
+
+    related_names = ()
+
+    def __iter__(self):
+        queryset = self.queryset
+        query = queryset.query
+        if queryset._fields:
+            names = [
+                *queryset._fields,
+                *(f for f in query.annotation_select if f not in queryset._fields),
+            ]
+        else:
+            names = [
+                *query.extra_select,
+                *query.values_select,
+                *query.annotation_select,
+            ]
+        row_class = get_row_class(queryset.model, (*names, *self.related_names))
+        for values in super().__iter__():
+            yield row_class(*values)
+
+
+@functools.cache
+def get_row_iterable_class(related_names):
+    if not related_names:
+        return RowIterable
+    return type("RowIterable", (RowIterable,), {"related_names": related_names})
+
+
+def as_rows(queryset, fields, related_names=()):
+    """
+    Returns a values_list() clone of the queryset that yields Row objects.
+    `related_names` adds slots for relations loaded afterwards with
+    `load_related()`.
+    """
+    queryset = queryset.values_list(*fields)
+    queryset._iterable_class = get_row_iterable_class(tuple(related_names))
+    return queryset
+
+
+def load_related(rows, field, pk_name="pk"):
+    """
+    Loads a relation of the rows in one query.
+    Single-valued relations are set to the related object (or None),
+    multi-valued relations to a RelatedList.
+    """
+    name = field.name
+    if field.concrete and not field.many_to_many:
+        # Forward foreign key or one-to-one: the row holds the related key.
+        keys = {getattr(row, name) for row in rows} - {None}
+        objects = field.related_model._base_manager.in_bulk(
+            keys, field_name=field.target_field.name
+        )
+        for row in rows:
+            setattr(row, name, objects.get(getattr(row, name)))
+        return
+    pks = [getattr(row, pk_name) for row in rows]
+    if field.many_to_many:
+        if field.concrete:
+            through = field.remote_field.through
+            source = field.m2m_field_name()
+            target = field.m2m_reverse_field_name()
+        else:
+            through = field.through
+            source = field.field.m2m_reverse_field_name()
+            target = field.field.m2m_field_name()
+        ordering = [
+            f"-{target}__{order[1:]}" if order.startswith("-") else f"{target}__{order}"
+            for order in field.related_model._meta.ordering
+            if isinstance(order, str)
+        ]
+        links = (
+            through._base_manager.filter(**{f"{source}__in": pks})
+            .select_related(target)
+            .order_by(*ordering, f"{target}__pk")
+        )
+        source_attname = through._meta.get_field(source).attname
+        related = [
+            (getattr(link, source_attname), getattr(link, target)) for link in links
+        ]
+    else:
+        # Reverse foreign key or one-to-one.
+        remote_field = field.field
+        objects = field.related_model._default_manager.filter(
+            **{f"{remote_field.name}__in": pks}
+        )
+        related = [(getattr(obj, remote_field.attname), obj) for obj in objects]
+    if field.one_to_one:
+        values = dict(related)
+        for row in rows:
+            setattr(row, name, values.get(getattr(row, pk_name)))
+        return
+    values = {pk: RelatedList() for pk in pks}
+    for pk, obj in related:
+        values[pk].append(obj)
+    for row in rows:
+        setattr(row, name, values[getattr(row, pk_name)])
@@ -0,0 +1,206 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models
+from django.db.models import F, FloatField, Func, TextField, Value
+from django.db.models.functions import Cast
+from django.db.models.lookups import Exact, IExact
+
+from .hangul import to_search_query
+
+
+class NormalizedText(Func):
+    """
+    Returns the text normalized to Unicode NFC, lowercased, with runs of
+    whitespace collapsed into a single space and no leading or trailing
+    whitespace.
+
+    Letters are lowercased by LOWER(), so beyond ASCII the result depends on
+    the LC_CTYPE of the database (e.g. "É" is kept as is under "C"). An index
+    on the expression always matches the lookups of the same database.
+    """
+
+    template = (
+        "LOWER(BTRIM("
+        "REGEXP_REPLACE(NORMALIZE(%(expressions)s, NFC), '\\s+', ' ', 'g')"
+        "))"
+    )
+    arity = 1
+    output_field = TextField()
+
+
+class NormalizedExact(Exact):
+    """
+    `field__normalized=value` matches the rows whose field equals the value
+    once both are normalized (see NormalizedText), e.g. " KIM  Minsu" and
+    "kim minsu".
+
+    An index on NormalizedText(field) serves the lookup, e.g.
+    `models.Index(F("registry"), NormalizedText("name"), name=...)`.
+    """
+
+    lookup_name = "normalized"
+
+    def __init__(self, lhs, rhs):
+        if not hasattr(rhs, "resolve_expression"):
+            rhs = Value(rhs)
+        super().__init__(NormalizedText(lhs), NormalizedText(rhs))
+
+    def get_rhs_op(self, connection, rhs):
+        return connection.operators["exact"] % rhs
+
+
+class LookupSearch:
+    """
+    Default search backend of a Table.
+
+    Matches each word of the search value against the `search_fields` of the
+    table with a field lookup (icontains if the field lookup doesn't end
+    with one), and combines the lookups with OR. It works on any database,
+    but contains lookups can't use a B-tree index, so every row of the
+    queryset is scanned.
+    """
+
+    def construct_search(self, opts, field_lookup):
+        lookup_fields = field_lookup.split("__")
+        prev_field = None
+        for path_part in lookup_fields:
+            try:
+                field = opts.get_field(path_part)
+                if not isinstance(
+                    field,
+                    (
+                        models.CharField,
+                        models.TextField,
+                        models.ForeignKey,
+                        models.OneToOneRel,
+                        models.OneToOneField,
+                    ),
+                ):
+                    # Type checking is deferred for relational fields.
+                    raise TypeError(
+                        "Search logic only supports fields of type "
+                        "`CharField` or `TextField`"
+                        '("%s" field type is `%s`)'
+                        % (field.name, field.__class__.__name__)
+                    )
+            except FieldDoesNotExist:
+                lookup = prev_field and prev_field.get_lookup(path_part)
+                if lookup:
+                    return field_lookup, lookup
+            else:
+                prev_field = field
+        # If no lookup is provided, icontains is used by default.
+        return "%s__icontains" % field_lookup, None
+
+    def search(self, table, queryset, search_value):
+        if not table.search_fields or not search_value:
+            return queryset
+        orm_lookups = []
+        for field_lookup in table.search_fields:
+            lookup = self.construct_search(table.opts, field_lookup)
+            orm_lookups.append(lookup)
+        term_queries = []
+        for orm_lookup in orm_lookups:
+            lookup_field, lookup = orm_lookup
+            if lookup is not None and issubclass(lookup, (Exact, IExact)):
+                # If the lookup is exact (or iexact, normalized...),
+                # it returns objects that exactly match the given search value.
+                query = models.Q.create([(lookup_field, search_value)])
+                term_queries.append(query)
+                continue
+            for word in search_value.split():
+                query = models.Q.create([(lookup_field, word)])
+                term_queries.append(query)
+        # Combines the generated `Q` objects using OR.
+        # This means that if search_fields contains multiple fields,
+        # an object will be returned as long as it matches
+        # the condition of any one field.
+        return queryset.filter(models.Q.create(term_queries, connector=models.Q.OR))
+
+
+class FullTextSearch:
+    """
+    PostgreSQL full text search backend of a Table.
+
+    Matches the rows whose `vector` contains every word of the search value,
+    or a word starting with it (prefix matching). `vector` is the name of a
+    stored `SearchVectorField` (e.g. a `GeneratedField` over `SearchVector`)
+    so a GIN index on it serves the search, or a `SearchVector` expression,
+    computed for every row.
+
+    Unless the table is ordered by a column, the best matches come first
+    (see `SearchRank`), followed by the queryset ordering.
+
+    On other databases the search falls back to `fallback`, which uses
+    the `search_fields` of the table.
+    """
+
+    rank_alias = "search_rank"
+
+    def __init__(self, vector, config="simple", rank=True, fallback=None):
+        self.vector = vector
+        # "simple" only lowercases words, which suits names in any language.
+        self.config = config
+        self.rank = rank
+        self.fallback = fallback or LookupSearch()
+
+    def get_search_query(self, search_value):
+        # Every word is quoted as a lexeme, so operators typed by the user
+        # (&, |, !, :...) are searched instead of being interpreted.
+        terms = [
+            "'%s':*" % word.replace("\\", "\\\\").replace("'", "''")
+            for word in search_value.split()
+        ]
+        return SearchQuery(" & ".join(terms), config=self.config, search_type="raw")
+
+    def search(self, table, queryset, search_value):
+        if connections[queryset.db].vendor != "postgresql":
+            return self.fallback.search(table, queryset, search_value)
+        if not search_value.strip():
+            return queryset
+        query = self.get_search_query(search_value)
+        vector = F(self.vector) if isinstance(self.vector, str) else self.vector
+        queryset = queryset.alias(search_document=vector).filter(search_document=query)
+        if not self.rank:
+            return queryset
+        query_ordering = queryset.query.order_by
+        if not query_ordering and queryset.query.default_ordering:
+            query_ordering = table.opts.ordering
+        # The rank is a real, cast to double precision so it survives
+        # the round trip to Python, e.g. in a CursorPagination keyset.
+        return queryset.annotate(
+            **{
+                self.rank_alias: Cast(
+                    SearchRank(F("search_document"), query), FloatField()
+                )
+            }
+        ).order_by(f"-{self.rank_alias}", *query_ordering)
+
+
+class HangulSearch:
+    """
+    Searches Korean names by their initial consonants (e.g. "ㄱㅁㅅ" for
+    김민수) or by any part of their words, even a syllable still being typed
+    (e.g. "김미"), in a HangulSearchVectorField (see kara.base.hangul).
+    Every word of the search value must match. A GIN index on the field
+    serves the search.
+
+    On other databases the search falls back to `fallback`, which uses
+    the `search_fields` of the table.
+    """
+
+    def __init__(self, vector, fallback=None):
+        self.vector = vector
+        self.fallback = fallback or LookupSearch()
+
+    def filter(self, queryset, search_value):
+        raw_query = to_search_query(search_value)
+        if not raw_query:
+            return queryset
+        query = SearchQuery(raw_query, config="simple", search_type="raw")
+        return queryset.filter(**{self.vector: query})
+
+    def search(self, table, queryset, search_value):
+        if connections[queryset.db].vendor != "postgresql":
+            return self.fallback.search(table, queryset, search_value)
+        return self.filter(queryset, search_value)
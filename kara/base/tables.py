@@ -1,10 +1,17 @@
+import functools
+
 from django.conf import settings
-from django.core.exceptions import FieldDoesNotExist
-from django.db import models
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
 from django.forms import CharField
+from django.utils.encoding import force_str
+from django.utils.functional import cached_property
+from django.utils.hashable import make_hashable
+from django.utils.translation import gettext_lazy as _
 
 from .forms import KaraForm
 from .pagination import Pagination
+from .rows import as_rows, load_related
+from .search import LookupSearch
 from .widgets import KaraSearchInput
 
 
@@ -21,104 +28,366 @@ class TableSearchForm(KaraForm):
         }
 
 
+def get_all_columns(opts):
+    """
+    Returns all field names of a model except the primary key.
+    """
+    return [field.name for field in opts.get_fields() if field.primary_key is not True]
+
+
+def plan_related_lookups(opts, columns):
+    """
+    Plans the related lookups needed to render the given columns
+    without a query per row.
+    Returns a (select_related, prefetch_related) pair: forward foreign keys
+    and one-to-one relations are joined, multi-valued relations
+    (many-to-many and reverse foreign keys) are prefetched.
+    """
+    select_related = []
+    prefetch_related = []
+    for column in columns:
+        try:
+            field = opts.get_field(column)
+        except FieldDoesNotExist:
+            # e.g. a column computed by display_for_value().
+            continue
+        if not field.is_relation:
+            continue
+        if field.many_to_many or field.one_to_many:
+            prefetch_related.append(column)
+        else:
+            select_related.append(column)
+    return select_related, prefetch_related
+
+
+@functools.cache
+def get_column_formatter(table_class, model, column, export=False):
+    """
+    Returns the formatter of a column, compiled once per
+    (Table class, model, column) by `Table.compile_formatter()`,
+    or by `Table.compile_export_formatter()` if `export` is True.
+    """
+    if export:
+        return table_class.compile_export_formatter(model._meta, column)
+    return table_class.compile_formatter(model._meta, column)
+
+
 class Table:
     pagination_class = Pagination
     search_form_class = TableSearchForm
     search_fields = []
+    # Filters the results by the search value, e.g. FullTextSearch
+    # (see kara.base.search). LookupSearch matches the search_fields.
+    search_backend = LookupSearch()
     ordering = []
     columns = "__all__"
+    # Rendered in place of the rows when there are no results.
+    empty_text = _("No results.")
+    # The model is usually passed to __init__. Declaring it on the class
+    # allows the system checks to inspect the table.
+    model = None
+    # Related lookups applied to the queryset. If None, they are planned
+    # from the relational columns (see plan_related_lookups()).
+    select_related = None
+    prefetch_related = None
+    # Model fields loaded for each row. If None, only the visible columns,
+    # the ordering fields and the primary key are selected.
+    # Set to "__all__" to load whole rows.
+    load_fields = None
+    # "model" renders model instances. "tuple" fetches the rows with
+    # values_list() into lightweight Row objects, which is much cheaper for
+    # large pages. In tuple mode columns must be model fields, and relational
+    # columns are loaded with one query per column for the current page.
+    row_mode = "model"
+    # Request params read by the view rather than the table (e.g. a tab),
+    # kept in the links of the table.
+    view_params = []
+    # Render the table body with a row renderer generated once per table
+    # class instead of the template loop (see render_table). It is skipped
+    # if display_for_value() is overridden.
+    fast_render = True
 
     def __init__(
-        self, request, model, base_queryset, list_per_page=100, page_var="page"
+        self,
+        request,
+        model,
+        base_queryset,
+        list_per_page=100,
+        page_var="page",
+        pagination_class=None,
+        count_provider=None,
+        paginate=True,
     ):
         self.model = model
         self.opts = model._meta
         self.list_per_page = list_per_page
         self.page_var = page_var
+        if pagination_class is not None:
+            # e.g. CursorPagination to use keyset pagination for this table.
+            self.pagination_class = pagination_class
+        # e.g. CachedCount to avoid counting unchanged results on every render.
+        self.count_provider = count_provider
+        # If False, result_objects is the unevaluated queryset of all results
+        # (e.g. to export them, see kara.base.exports).
+        self.paginate = paginate
         if self.columns == "__all__":
             # Displays all model fields if columns are not specified
-            self.columns = [
-                field.name
-                for field in self.opts.get_fields()
-                if field.primary_key is not True
-            ]
+            self.columns = get_all_columns(self.opts)
         search_form = self.search_form_class(request.GET)
         search_form.is_valid()
         self.search_form = search_form
         self.search_value = self.search_form.cleaned_data.get(settings.SEARCH_VAR) or ""
-        self.params = dict(request.GET.lists())
-        if self.page_var in self.params:
-            del self.params[self.page_var]
-        self.result_objects = self.get_queryset(request, base_queryset)
+        # Other request params (e.g. of another table) are left out of the
+        # links and the cache key of the table.
+        param_names = self.get_param_names()
+        self.params = {
+            key: values for key, values in request.GET.lists() if key in param_names
+        }
+        self.all_columns = self.columns
+        if settings.ORDER_VAR in self.params:
+            # Only the sortable columns (see `ordering`) can be ordered by.
+            # Other values (e.g. "?", many-to-many columns or lookups
+            # spanning relations) are ignored.
+            self.params[settings.ORDER_VAR] = [
+                param
+                for param in self.params[settings.ORDER_VAR]
+                if param.removeprefix("-") in self.ordering
+                and param.removeprefix("-") in self.all_columns
+            ]
+        self.hidden_columns = [
+            column
+            for column in self.params.get(settings.HIDE_VAR, [])
+            if column in self.all_columns
+        ]
+        if len(set(self.hidden_columns)) < len(self.all_columns):
+            self.columns = [
+                column
+                for column in self.all_columns
+                if column not in self.hidden_columns
+            ]
+        else:
+            # At least one column must remain visible.
+            self.hidden_columns = []
+        # The results are fetched on first access, so a table rendered from
+        # cache (see cache_vary_on) never queries the database.
+        self.request = request
+        self.base_queryset = base_queryset
+        # What the rendered table depends on besides the data: the model,
+        # the page and the params of the table (search, ordering, hidden
+        # columns...).
+        self.cache_vary_on = (
+            self.opts.label_lower,
+            request.GET.get(self.page_var),
+            tuple(sorted((key, tuple(values)) for key, values in self.params.items())),
+        )
+
+    @cached_property
+    def result_objects(self):
+        return self.get_queryset(self.request, self.base_queryset)
+
+    @cached_property
+    def pagination(self):
+        # Set by get_queryset().
+        self.result_objects
+        return self.__dict__["pagination"]
+
+    def get_param_names(self):
+        """
+        Returns the names of the request params kept in `params`: those of
+        the search form, the ordering, the hidden columns and `view_params`.
+        The page is left out, see `pagination`.
+        """
+        return {
+            *self.search_form.fields,
+            settings.ORDER_VAR,
+            settings.HIDE_VAR,
+            *self.view_params,
+        }
+
+    def get_select_related(self):
+        """
+        Returns the lookups passed to `select_related()`.
+        Override this in a subclass to customize how relations are joined.
+        """
+        if self.select_related is not None:
+            return self.select_related
+        return plan_related_lookups(self.opts, self.columns)[0]
+
+    def get_prefetch_related(self):
+        """
+        Returns the lookups (or `Prefetch` objects) passed to
+        `prefetch_related()`.
+        Override this in a subclass to customize how relations are prefetched.
+        """
+        if self.prefetch_related is not None:
+            return self.prefetch_related
+        return plan_related_lookups(self.opts, self.columns)[1]
+
+    def get_related_result(self, queryset):
+        if self.row_mode == "tuple":
+            # Relations of tuple rows are loaded by load_related_rows().
+            return queryset
+        select_related = self.get_select_related()
+        prefetch_related = self.get_prefetch_related()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def get_load_fields(self, queryset):
+        """
+        Returns the model fields passed to `only()`, or "__all__" to load
+        whole rows.
+        Whole rows are loaded if a column isn't a model field because
+        `display_for_value()` may read any field to compute it.
+        """
+        if self.load_fields is not None:
+            return self.load_fields
+        query = queryset.query
+        if query.order_by:
+            ordering = query.order_by
+        elif query.default_ordering:
+            ordering = self.opts.ordering
+        else:
+            ordering = []
+        load_fields = [self.opts.pk.name]
+        for column in self.columns:
+            try:
+                field = self.opts.get_field(column)
+            except FieldDoesNotExist:
+                return "__all__"
+            if field.concrete and not field.many_to_many:
+                load_fields.append(column)
+        for order in ordering:
+            if not isinstance(order, str):
+                continue
+            try:
+                field = self.opts.get_field(order.removeprefix("-"))
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.many_to_many:
+                load_fields.append(field.name)
+        return list(dict.fromkeys(load_fields))
+
+    def get_projection_result(self, queryset):
+        load_fields = self.get_load_fields(queryset)
+        if self.row_mode == "tuple":
+            if load_fields == "__all__":
+                load_fields = [field.name for field in self.opts.concrete_fields]
+            return as_rows(queryset, load_fields, self.get_related_row_fields())
+        if self.row_mode != "model":
+            raise ImproperlyConfigured(
+                f"{self.__class__.__name__}.row_mode must be 'model' or 'tuple'."
+            )
+        if load_fields == "__all__":
+            return queryset
+        return queryset.only(*load_fields)
+
+    def get_related_row_fields(self):
+        """
+        Returns the names of relational columns that tuple rows can't hold
+        as a value: multi-valued and reverse one-to-one relations.
+        """
+        related_fields = []
+        for column in self.columns:
+            try:
+                field = self.opts.get_field(column)
+            except FieldDoesNotExist:
+                continue
+            if field.is_relation and (field.many_to_many or not field.concrete):
+                related_fields.append(column)
+        return related_fields
+
+    def load_related_rows(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        for column in self.columns:
+            try:
+                field = self.opts.get_field(column)
+            except FieldDoesNotExist:
+                continue
+            if field.is_relation:
+                load_related(rows, field, self.opts.pk.name)
+
+    @classmethod
+    def compile_formatter(cls, opts, column):
+        """
+        Returns a function that takes a row and returns the value
+        to display for the column.
+        You can apply various formatting to the row value based on the
+        column type in this method. It runs once per Table class and column,
+        so field lookups and type checks belong here rather than in the
+        returned function, which runs for every cell.
+        """
+
+        def format_value(obj):
+            return getattr(obj, column, "")
+
+        return format_value
+
+    @classmethod
+    def compile_export_formatter(cls, opts, column):
+        """
+        Like `compile_formatter()`, but for exports (see kara.base.exports).
+        Returns plain values instead of HTML: choice labels, related objects
+        as text and multi-valued relations joined by commas.
+        """
+        try:
+            field = opts.get_field(column)
+        except FieldDoesNotExist:
+            field = None
+
+        def get_value(obj):
+            return getattr(obj, column, "")
+
+        if field is None:
+            return get_value
+        if field.is_relation and (field.many_to_many or field.one_to_many):
+
+            def format_value(obj):
+                return ", ".join(str(related) for related in get_value(obj).all())
+
+        elif field.is_relation:
+
+            def format_value(obj):
+                value = get_value(obj)
+                return "" if value is None else str(value)
+
+        elif field.choices:
+            choices = dict(make_hashable(field.flatchoices))
+
+            def format_value(obj):
+                value = get_value(obj)
+                return force_str(
+                    choices.get(make_hashable(value), value), strings_only=True
+                )
+
+        else:
+            format_value = get_value
+        return format_value
+
+    def get_formatter(self, column):
+        return get_column_formatter(type(self), self.model, column)
+
+    def get_export_formatter(self, column):
+        return get_column_formatter(type(self), self.model, column, export=True)
 
     def display_for_value(self, obj, column):
         """
         Determines the row value to be displayed in the table.
-        You can apply various formatting to the row value based
-        on the column type in this method.
         """
-        return getattr(obj, column, "")
+        return self.get_formatter(column)(obj)
 
-    def get_search_result(self, queryset, search_value):
+    def get_search_backend(self):
+        """
+        Returns the search backend filtering the queryset by the search value.
+        """
+        return self.search_backend
 
-        def construct_search(field_lookup):
-            lookup_fields = field_lookup.split("__")
-            prev_field = None
-            for path_part in lookup_fields:
-                try:
-                    field = self.opts.get_field(path_part)
-                    if not isinstance(
-                        field,
-                        (
-                            models.CharField,
-                            models.TextField,
-                            models.ForeignKey,
-                            models.OneToOneRel,
-                            models.OneToOneField,
-                        ),
-                    ):
-                        # Type checking is deferred for relational fields.
-                        raise TypeError(
-                            "Search logic only supports fields of type "
-                            "`CharField` or `TextField`"
-                            '("%s" field type is `%s`)'
-                            % (field.name, field.__class__.__name__)
-                        )
-                except FieldDoesNotExist:
-                    if prev_field and prev_field.get_lookup(path_part):
-                        return field_lookup, True
-                else:
-                    prev_field = field
-            # If no lookup is provided, icontains is used by default.
-            return "%s__icontains" % field_lookup, False
-
-        if self.search_fields and search_value:
-            orm_lookups = []
-            for field_lookup in self.search_fields:
-                lookup = construct_search(field_lookup)
-                orm_lookups.append(lookup)
-            term_queries = []
-            for orm_lookup in orm_lookups:
-                lookup_field, have_lookup = orm_lookup
-                if have_lookup:
-                    lookup_value = lookup_field.split("__")[-1]
-                    if lookup_value == "exact" or lookup_value == "iexact":
-                        # If the lookup is exact or iexact,
-                        # it returns objects that exactly match the given search value.
-                        query = models.Q.create([(lookup_field, search_value)])
-                        term_queries.append(query)
-                        continue
-                for word in search_value.split():
-                    query = models.Q.create([(lookup_field, word)])
-                    term_queries.append(query)
-            # Combines the generated `Q` objects using OR.
-            # This means that if search_fields contains multiple fields,
-            # an object will be returned as long as it matches
-            # the condition of any one field.
-            queryset = queryset.filter(
-                models.Q.create(term_queries, connector=models.Q.OR)
-            )
-        return queryset
+    def get_search_result(self, queryset, search_value):
+        return self.get_search_backend().search(self, queryset, search_value)
 
     def columns_ordering(self, queryset):
         # Sorting prioritizes the field that was most recently selected.
@@ -137,12 +406,22 @@ class Table:
             queryset,
             self.list_per_page,
             self.page_var,
+            self.count_provider,
         )
+        # The page links keep the params of the table only.
+        pagination.params = self.params
         self.pagination = pagination
         return pagination.get_objects()
 
     def get_queryset(self, request, queryset):
         search_result = self.get_search_result(queryset, self.search_value)
         column_order_result = self.columns_ordering(search_result)
-        pagination_result = self.get_pagination_result(request, column_order_result)
+        related_result = self.get_related_result(column_order_result)
+        projection_result = self.get_projection_result(related_result)
+        if not self.paginate:
+            self.pagination = None
+            return projection_result
+        pagination_result = self.get_pagination_result(request, projection_result)
+        if self.row_mode == "tuple":
+            self.load_related_rows(pagination_result)
         return pagination_result
@@ -1,8 +1,13 @@
 from collections.abc import Iterable, Mapping
 
 from django import template
+from django.conf import settings
+from django.core.cache import cache
 from django.http import QueryDict
 from django.template.exceptions import TemplateSyntaxError
+from django.utils import translation
+
+from ..cache import get_data_version, make_cache_key
 
 register = template.Library()
 
@@ -70,3 +75,58 @@ def querystring(context, *args, **kwargs):
                 params[key] = value
     query_string = params.urlencode() if params else ""
     return f"?{query_string}"
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, version_keys, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.version_keys = version_keys
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        version_keys = self.version_keys.resolve(context)
+        if isinstance(version_keys, str):
+            version_keys = [version_keys]
+        cache_key = make_cache_key(
+            f"kara.fragment.{self.fragment_name}",
+            [(key, get_data_version(key)) for key in version_keys],
+            translation.get_language(),
+            [var.resolve(context) for var in self.vary_on],
+        )
+        value = cache.get(cache_key)
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(cache_key, value, timeout=settings.VERSIONED_CACHE_TIMEOUT)
+        return value
+
+
+@register.tag("versioned_cache")
+def do_versioned_cache(parser, token):
+    """
+    Cache the contents of a template fragment until the data it shows changes.
+
+    Unlike Django's {% cache %} tag, entries are invalidated when the data
+    changes, and only expire after VERSIONED_CACHE_TIMEOUT so that entries of
+    rarely requested keys don't pile up. The key includes the current version
+    of the given data version key(s) (see `kara.base.cache.bump_data_version()`),
+    the active language and the `vary_on` values.
+
+    Usage::
+
+        {% load base_templatetags %}
+        {% versioned_cache version_key_or_keys fragment_name [vary_on ...] %}
+            .. some expensive processing ..
+        {% endversioned_cache %}
+    """
+    nodelist = parser.parse(("endversioned_cache",))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise TemplateSyntaxError("%r tag requires at least 2 arguments." % tokens[0])
+    return VersionedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
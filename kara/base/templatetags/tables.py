@@ -1,8 +1,13 @@
+import functools
+from collections import namedtuple
+
 from django import template
 from django.conf import settings
-from django.utils.html import format_html
+from django.utils.html import conditional_escape, format_html
 from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
 
+from ..tables import Table, get_column_formatter
 from .base_templatetags import querystring
 
 register = template.Library()
@@ -32,23 +37,61 @@ def pagination_number(pagination, i, htmx):
 
 @register.inclusion_tag("base/tables/pagination.html", name="pagination")
 def pagination_tag(pagination, **kwargs):
-    previous_page_num = pagination.page_num - 1
-    next_page_num = pagination.page_num + 1
     return {
         "pagination": pagination,
-        "previous_page": {pagination.page_var: previous_page_num},
-        "next_page": {pagination.page_var: next_page_num},
+        "previous_page": pagination.previous_page_params,
+        "next_page": pagination.next_page_params,
         **kwargs,
     }
 
 
 @register.inclusion_tag("base/tables/search_form.html", name="search_form")
 def search_form_tag(table, **kwargs):
+    search_form = table.search_form
     return {
         "table": table,
-        "field": table.search_form[settings.SEARCH_VAR],
+        "field": search_form[settings.SEARCH_VAR],
+        # e.g. a search mode, rendered next to the search input.
+        "extra_fields": [
+            search_form[name]
+            for name in search_form.fields
+            if name != settings.SEARCH_VAR
+        ],
         "model_name": table.opts.verbose_name,
-        "clear_param": {settings.SEARCH_VAR: None},
+        # The form submits its own fields.
+        "clear_param": {name: None for name in search_form.fields},
+        **kwargs,
+    }
+
+
+@register.inclusion_tag("base/tables/column_selector.html", name="column_selector")
+def column_selector_tag(table, **kwargs):
+    """
+    Renders links that hide or show the table columns.
+    Hidden columns are also left out of the table query.
+    """
+    columns = []
+    for column in table.all_columns:
+        visible = column not in table.hidden_columns
+        if visible:
+            hidden_columns = [*table.hidden_columns, column]
+        else:
+            hidden_columns = [name for name in table.hidden_columns if name != column]
+        columns.append(
+            {
+                "text": table.opts.get_field(column).verbose_name,
+                "visible": visible,
+                # The last visible column can't be hidden.
+                "toggle": (
+                    {settings.HIDE_VAR: hidden_columns}
+                    if len(hidden_columns) < len(table.all_columns)
+                    else None
+                ),
+            }
+        )
+    return {
+        "table": table,
+        "columns": columns,
         **kwargs,
     }
 
@@ -64,6 +107,37 @@ def display_table_value(table, obj, column):
     return table.display_for_value(obj, column)
 
 
+HeaderDescriptor = namedtuple(
+    "HeaderDescriptor",
+    ["field_name", "text", "sortable", "class_attr", "sorted_class_attr"],
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def get_header_descriptors(table_class, model, columns, ordering, language):
+    """
+    Returns the parts of the table headers that don't depend on the request.
+    They are built once per Table class, columns, ordering and language.
+    """
+    descriptors = []
+    for field_name in columns:
+        is_sortable = field_name in ordering
+        if is_sortable:
+            class_attr = format_html(' class="sortable column-{}"', field_name)
+        else:
+            class_attr = format_html(' class="column-{}"', field_name)
+        descriptors.append(
+            HeaderDescriptor(
+                field_name=field_name,
+                text=str(model._meta.get_field(field_name).verbose_name),
+                sortable=is_sortable,
+                class_attr=class_attr,
+                sorted_class_attr=format_html(' class="sorted column-{}"', field_name),
+            )
+        )
+    return tuple(descriptors)
+
+
 def table_headers(table):
     """
     Generates table headers by defining properties for each field
@@ -72,20 +146,28 @@ def table_headers(table):
         param.removeprefix("-"): param
         for param in table.params.get(settings.ORDER_VAR, [])
     }
-    for field_name in table.columns:
-        is_sortable = field_name in table.ordering
-        verbose_name = table.opts.get_field(field_name).verbose_name
+    descriptors = get_header_descriptors(
+        type(table),
+        table.model,
+        tuple(table.columns),
+        tuple(table.ordering),
+        get_language(),
+    )
+    for descriptor in descriptors:
+        field_name = descriptor.field_name
+        is_sortable = descriptor.sortable
+        verbose_name = descriptor.text
         # Sorting is not supported for this field
         if not is_sortable:
             yield {
                 "text": verbose_name,
                 "sortable": is_sortable,
-                "class_attr": format_html(' class="column-{}"', field_name),
+                "class_attr": descriptor.class_attr,
             }
             continue
         is_sorted = field_name in sorted_fields
-        th_classes = format_html(
-            ' class="{} column-{}"', "sorted" if is_sorted else "sortable", field_name
+        th_classes = (
+            descriptor.sorted_class_attr if is_sorted else descriptor.class_attr
         )
         if is_sorted:
             # Sortable field and it is already sorted
@@ -134,10 +216,71 @@ def table_headers(table):
         }
 
 
+# Markup of a row rendered by the loop of base/tables/table_rows.html,
+# which get_row_renderer() renders the same way. TABLE_CELL is the %-format
+# placeholder of a cell.
+TABLE_ROW = "<tr>%s</tr>\n"
+TABLE_CELL = "<td>%s</td>"
+
+
+@functools.lru_cache(maxsize=1024)
+def get_row_renderer(table_class, model, columns):
+    """
+    Returns a function that renders the table body rows.
+    It is built once per Table class and columns: the markup of a row is
+    a single format string, filled with the escaped output of each column
+    formatter.
+    """
+    row_format = TABLE_ROW % (TABLE_CELL * len(columns))
+    formatters = [
+        get_column_formatter(table_class, model, column) for column in columns
+    ]
+
+    def render_rows(rows):
+        return "".join(
+            row_format % tuple(conditional_escape(format(row)) for format in formatters)
+            for row in rows
+        )
+
+    return render_rows
+
+
+def render_table_rows(table):
+    """
+    Renders the table body rows, or returns None if they must be rendered
+    by the template loop (e.g. the empty row).
+    """
+    if not table.fast_render or (
+        type(table).display_for_value is not Table.display_for_value
+    ):
+        return None
+    rows = table.result_objects
+    if not rows:
+        return None
+    render_rows = get_row_renderer(type(table), table.model, tuple(table.columns))
+    return mark_safe(render_rows(rows))
+
+
 @register.inclusion_tag("base/tables/table.html", name="table")
 def render_table(table, **kwargs):
     return {
         "table_headers": table_headers(table),
+        "table_rows": render_table_rows(table),
+        "table": table,
+        **kwargs,
+    }
+
+
+@register.inclusion_tag("base/tables/table_rows.html", name="table_rows")
+def render_table_rows_tag(table, **kwargs):
+    """
+    Renders only the <tr> elements of the table body, e.g. to append
+    the next rows with htmx.
+    With `infinite_scroll=True`, a last row loads the next page of a
+    CursorPagination when it is revealed.
+    """
+    return {
+        "table_rows": render_table_rows(table),
         "table": table,
         **kwargs,
     }
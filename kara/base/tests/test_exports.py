@@ -0,0 +1,97 @@
+import datetime
+import io
+import zipfile
+
+from django.test import RequestFactory, TestCase
+
+from kara.base.exports import CSVWriter, XLSXWriter, iter_export_rows
+from kara.base.tables import Table
+
+from .models import Character, Comment, Skill, Tag
+
+
+class CommentExportTable(Table):
+    columns = ["title", "tags"]
+    row_mode = "tuple"
+
+
+class CharacterExportTable(Table):
+    columns = ["nickname", "skill", "level"]
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags = [
+            Tag.objects.create(name=f"tag-{i}", hex_color="#000000") for i in range(2)
+        ]
+        for i in range(5):
+            comment = Comment.objects.create(
+                title=f"title-{i}", author="author", content="content"
+            )
+            comment.tags.set(tags[: i % 3])
+            skill = Skill.objects.create(name=f"skill-{i}", damage=i) if i else None
+            Character.objects.create(nickname=f"nickname-{i}", skill=skill, level=i)
+        cls.factory = RequestFactory()
+
+    def test_iter_export_rows(self):
+        request = self.factory.get("/fake-url/")
+        table = CommentExportTable(
+            request, Comment, Comment.objects.order_by("id"), paginate=False
+        )
+        self.assertIsNone(table.pagination)
+        # One query for the rows, one per chunk for the tags.
+        with self.assertNumQueries(4):
+            rows = list(iter_export_rows(table, chunk_size=2))
+        self.assertEqual(
+            rows,
+            [
+                ["title-0", ""],
+                ["title-1", "tag-0"],
+                ["title-2", "tag-0, tag-1"],
+                ["title-3", ""],
+                ["title-4", "tag-0"],
+            ],
+        )
+        table = CharacterExportTable(
+            request, Character, Character.objects.order_by("id"), paginate=False
+        )
+        self.assertEqual(
+            list(iter_export_rows(table, chunk_size=2))[:2],
+            [
+                ["nickname-0", "", 0],
+                ["nickname-1", str(Skill.objects.get(name="skill-1")), 1],
+            ],
+        )
+
+    def test_csv_writer(self):
+        content = "".join(
+            CSVWriter().stream(["name", "note"], [["=1+1", "a,b"], ["-", None]])
+        )
+        self.assertEqual(content, "\ufeffname,note\r\n'=1+1,\"a,b\"\r\n'-,\r\n")
+
+    def test_xlsx_writer(self):
+        writer = XLSXWriter()
+        writer.rows_per_flush = 10
+        rows = (
+            ["guest <&>", i, datetime.date(2030, 7, 7), None, True] for i in range(100)
+        )
+        chunks = list(writer.stream(["name", "price", "date", "none", "bool"], rows))
+        # The sheet is streamed while it is written.
+        self.assertGreater(len(chunks), 3)
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+        self.assertEqual(sheet.count("<row>"), 101)
+        self.assertIn(
+            "<row>"
+            '<c t="inlineStr"><is>'
+            '<t xml:space="preserve">guest &lt;&amp;&gt;</t>'
+            "</is></c>"
+            "<c><v>99</v></c>"
+            '<c s="1"><v>47671</v></c>'
+            "<c/>"
+            '<c t="b"><v>1</v></c>'
+            "</row>",
+            sheet,
+        )
@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase
+
+from kara.base.hangul import (
+    decompose,
+    get_choseong,
+    get_search_lexemes,
+    to_search_query,
+    to_search_vector,
+)
+
+
+class HangulTests(SimpleTestCase):
+    def test_decompose(self):
+        self.assertEqual(decompose("김민수"), "ㄱㅣㅁㅁㅣㄴㅅㅜ")
+        # Compound vowels and final consonants are split into typed jamo.
+        self.assertEqual(decompose("황닭"), "ㅎㅗㅏㅇㄷㅏㄹㄱ")
+        self.assertEqual(decompose("ㄳㅘ"), "ㄱㅅㅗㅏ")
+        self.assertEqual(decompose("kim 1"), "kim 1")
+
+    def test_choseong(self):
+        self.assertEqual(get_choseong("김민수"), "ㄱㅁㅅ")
+        self.assertEqual(get_choseong("쌍용kim"), "ㅆㅇkim")
+
+    def test_search_lexemes(self):
+        self.assertEqual(
+            get_search_lexemes("김민수 Kim"),
+            [
+                ("ㄱㅣㅁㅁㅣㄴㅅㅜ", "A"),
+                ("ㄱㅁㅅ", "B"),
+                ("ㅁㅣㄴㅅㅜ", "A"),
+                ("ㅁㅅ", "B"),
+                ("ㅅㅜ", "A"),
+                ("ㅅ", "B"),
+                ("kim", "A"),
+                ("im", "A"),
+                ("m", "A"),
+            ],
+        )
+        self.assertEqual(to_search_vector("이 이"), "'ㅇㅣ':1A 'ㅇ':2B")
+        self.assertEqual(to_search_vector("!"), "")
+
+    def test_search_query(self):
+        self.assertEqual(to_search_query("ㄱㅁㅅ"), "'ㄱㅁㅅ':*B")
+        # A syllable being typed.
+        self.assertEqual(to_search_query("김미"), "'ㄱㅣㅁㅁㅣ':*A")
+        self.assertEqual(to_search_query("KIM ㅅ"), "'kim':*A & 'ㅅ':*B")
+        # Operators are not words.
+        self.assertEqual(to_search_query("' & !:*"), "")
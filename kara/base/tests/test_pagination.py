@@ -1,8 +1,17 @@
+from django.core.cache import cache
+from django.db import connection
+from django.template import Context, Template
 from django.test import RequestFactory, TestCase
 
 from kara.accounts.factories import UserFactory
 from kara.accounts.models import User
-from kara.base.pagination import Pagination
+from kara.base.exceptions import IncorectLookupParameter
+from kara.base.pagination import (
+    CachedCount,
+    CursorPagination,
+    EstimatedCount,
+    Pagination,
+)
 
 
 class PaginationTest(TestCase):
@@ -59,3 +68,241 @@ class PaginationTest(TestCase):
             objects = pagination.get_objects()
             object_names = list(objects.values_list("username", flat=True))
             self.assertEqual(object_names, expect_object_names)
+
+    def test_pagination_single_query(self):
+        cases = [(5, 1), (5, 20), (200, 1)]
+        for list_per_page, page in cases:
+            with self.subTest(list_per_page=list_per_page, page=page):
+                request = self.factory.get("/fake-url/", {"page": page})
+                # The page and the count are fetched together,
+                # get_objects() reuses the fetched page.
+                with self.assertNumQueries(1):
+                    pagination = Pagination(request, self.queryset, list_per_page)
+                    objects = list(pagination.get_objects())
+                self.assertEqual(pagination.result_count, 100)
+                self.assertEqual(len(objects), min(list_per_page, 100))
+                self.assertEqual(
+                    objects[0].username, f"user-{(page - 1) * list_per_page + 1}"
+                )
+
+    def test_pagination_out_of_range_page(self):
+        request = self.factory.get("/fake-url/", {"page": 30})
+        # The count is queried separately to find the last page.
+        with self.assertNumQueries(2):
+            pagination = Pagination(request, self.queryset, 5)
+        self.assertEqual(pagination.result_count, 100)
+        self.assertEqual(pagination.page.number, 20)
+        with self.assertRaises(IncorectLookupParameter):
+            pagination.get_objects()
+
+    def test_pagination_empty_result(self):
+        request = self.factory.get("/fake-url/")
+        with self.assertNumQueries(1):
+            pagination = Pagination(request, User.objects.filter(username="nobody"), 5)
+            self.assertEqual(list(pagination.get_objects()), [])
+        self.assertEqual(pagination.result_count, 0)
+        self.assertFalse(pagination.multi_page)
+
+    def test_pagination_distinct_queryset(self):
+        # DISTINCT is applied after window functions,
+        # so the count is queried separately.
+        request = self.factory.get("/fake-url/")
+        queryset = User.objects.distinct().order_by("id")
+        with self.assertNumQueries(2):
+            pagination = Pagination(request, queryset, 5)
+            list(pagination.get_objects())
+        self.assertEqual(pagination.result_count, 100)
+
+
+class CountProviderTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(1, 31):
+            UserFactory.create(username=f"user-{i}")
+        cls.queryset = User.objects.all().order_by("id")
+        cls.factory = RequestFactory()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_count(self):
+        request = self.factory.get("/fake-url/", {"page": 2})
+        pagination = Pagination(
+            request, self.queryset, 5, count_provider=CachedCount(version=1)
+        )
+        self.assertEqual(pagination.result_count, 30)
+        UserFactory.create(username="user-31")
+        # The count is served from the cache, only the page is queried.
+        with self.assertNumQueries(1):
+            pagination = Pagination(
+                request, self.queryset, 5, count_provider=CachedCount(version=1)
+            )
+            objects = list(pagination.get_objects())
+        self.assertEqual(pagination.result_count, 30)
+        self.assertFalse(pagination.result_count_estimated)
+        self.assertEqual(objects[0].username, "user-6")
+        # A new data version invalidates the count.
+        pagination = Pagination(
+            request, self.queryset, 5, count_provider=CachedCount(version=2)
+        )
+        self.assertEqual(pagination.result_count, 31)
+        # Filters are part of the cache key.
+        pagination = Pagination(
+            request,
+            self.queryset.filter(username__startswith="user-1"),
+            5,
+            count_provider=CachedCount(version=2),
+        )
+        self.assertEqual(pagination.result_count, 11)
+
+    def test_estimated_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {User._meta.db_table}")
+        request = self.factory.get("/fake-url/")
+        pagination = Pagination(
+            request, self.queryset, 5, count_provider=EstimatedCount(threshold=1)
+        )
+        self.assertTrue(pagination.result_count_estimated)
+        self.assertGreater(pagination.result_count, 0)
+        html = Template("{% load tables %}{% pagination pagination %}").render(
+            Context({"pagination": pagination})
+        )
+        self.assertIn(f"About {pagination.result_count} results", html)
+        cases = [
+            # Below the threshold.
+            (self.queryset, EstimatedCount()),
+            # Filtered queryset.
+            (
+                self.queryset.filter(username__startswith="user-1"),
+                EstimatedCount(threshold=1),
+            ),
+        ]
+        for queryset, count_provider in cases:
+            with self.subTest(count_provider=count_provider):
+                pagination = Pagination(
+                    request, queryset, 5, count_provider=count_provider
+                )
+                self.assertFalse(pagination.result_count_estimated)
+                self.assertEqual(pagination.result_count, queryset.count())
+
+
+class CursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(1, 26):
+            UserFactory.create(username=f"user-{i:02}")
+        cls.queryset = User.objects.all().order_by("username")
+        cls.factory = RequestFactory()
+
+    def get_usernames(self, pagination):
+        return [user.username for user in pagination.get_objects()]
+
+    def test_first_page(self):
+        request = self.factory.get("/fake-url/")
+        with self.assertNumQueries(1):
+            pagination = CursorPagination(request, self.queryset, 10)
+        self.assertEqual(
+            self.get_usernames(pagination), [f"user-{i:02}" for i in range(1, 11)]
+        )
+        self.assertIsNone(pagination.result_count)
+        self.assertTrue(pagination.multi_page)
+        self.assertFalse(pagination.page.has_previous())
+        self.assertTrue(pagination.page.has_next())
+        self.assertEqual(list(pagination.page_range), [])
+
+    def test_next_and_previous_page(self):
+        request = self.factory.get("/fake-url/")
+        pagination = CursorPagination(request, self.queryset, 10)
+        pages = [[f"user-{i:02}" for i in range(1, 11)]]
+        # Walk forward to the last page.
+        while pagination.page.has_next():
+            request = self.factory.get("/fake-url/", pagination.next_page_params)
+            with self.assertNumQueries(1):
+                pagination = CursorPagination(request, self.queryset, 10)
+            pages.append(self.get_usernames(pagination))
+        self.assertEqual(
+            pages[1:],
+            [
+                [f"user-{i:02}" for i in range(11, 21)],
+                [f"user-{i:02}" for i in range(21, 26)],
+            ],
+        )
+        self.assertTrue(pagination.page.has_previous())
+        # Walk backward from the last page.
+        request = self.factory.get("/fake-url/", pagination.previous_page_params)
+        pagination = CursorPagination(request, self.queryset, 10)
+        self.assertEqual(self.get_usernames(pagination), pages[1])
+        self.assertTrue(pagination.page.has_next())
+        request = self.factory.get("/fake-url/", pagination.previous_page_params)
+        pagination = CursorPagination(request, self.queryset, 10)
+        self.assertEqual(self.get_usernames(pagination), pages[0])
+        self.assertFalse(pagination.page.has_previous())
+
+    def test_descending_ordering_with_duplicate_values(self):
+        User.objects.filter(username__in=["user-04", "user-05", "user-06"]).update(
+            email="same@kara.com"
+        )
+        queryset = User.objects.filter(
+            username__in=["user-03", "user-04", "user-05", "user-06", "user-07"]
+        ).order_by("-email")
+        expected = list(queryset.order_by("-email", "-pk"))
+        request = self.factory.get("/fake-url/")
+        pagination = CursorPagination(request, queryset, 2)
+        result = list(pagination.get_objects())
+        while pagination.page.has_next():
+            request = self.factory.get("/fake-url/", pagination.next_page_params)
+            pagination = CursorPagination(request, queryset, 2)
+            result += pagination.get_objects()
+        self.assertEqual(result, expected)
+
+    def test_tiebreaker_fields(self):
+        class EmailCursorPagination(CursorPagination):
+            tiebreaker = ("email", "username")
+
+        User.objects.filter(username__in=["user-04", "user-05"]).update(
+            email="same@kara.com"
+        )
+        cases = [
+            ("-date_joined", ["-date_joined", "-email", "-username"]),
+            ("email", ["email", "username"]),
+            ("pk", ["pk"]),
+        ]
+        for order, ordering in cases:
+            with self.subTest(order=order):
+                queryset = User.objects.order_by(order)
+                request = self.factory.get("/fake-url/")
+                pagination = EmailCursorPagination(request, queryset, 10)
+                self.assertEqual(pagination.ordering, ordering)
+                result = list(pagination.get_objects())
+                while pagination.page.has_next():
+                    request = self.factory.get(
+                        "/fake-url/", pagination.next_page_params
+                    )
+                    pagination = EmailCursorPagination(request, queryset, 10)
+                    result += pagination.get_objects()
+                self.assertEqual(result, list(queryset.order_by(*ordering)))
+
+    def test_invalid_cursor(self):
+        request = self.factory.get("/fake-url/")
+        pagination = CursorPagination(request, self.queryset, 10)
+        cursor = pagination.next_cursor
+        cases = [
+            "invalid",
+            cursor[:-1],
+            # The cursor was created for another ordering.
+            (User.objects.order_by("-username"), cursor),
+        ]
+        for case in cases:
+            queryset, cursor = (
+                case if isinstance(case, tuple) else (self.queryset, case)
+            )
+            with self.subTest(cursor=cursor):
+                request = self.factory.get("/fake-url/", {"page": cursor})
+                pagination = CursorPagination(request, queryset, 10)
+                self.assertFalse(pagination.page.has_previous())
+                self.assertEqual(
+                    self.get_usernames(pagination),
+                    [user.username for user in queryset[:10]],
+                )
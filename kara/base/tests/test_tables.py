@@ -1,14 +1,24 @@
-from django.test import RequestFactory, TestCase, override_settings
+from django.contrib.postgres.search import SearchVector
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import QuerySet
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import translation
 
-from kara.base.tables import Table
-from kara.base.templatetags.tables import table_headers
+from kara.base.checks import check_shared_cache, check_table_related_lookups
+from kara.base.pagination import CursorPagination
+from kara.base.search import FullTextSearch
+from kara.base.tables import Table, get_column_formatter
+from kara.base.templatetags.tables import get_header_descriptors, table_headers
 
-from .models import Character, Fruit, Skill
+from .models import Character, Comment, Fruit, Skill, Tag
 
 
 class FruitTable(Table):
     columns = ["name", "price", "expiration_date"]
-    ordering = []
+    ordering = ["name", "price", "expiration_date"]
 
 
 class CharacterTable(Table):
@@ -19,6 +29,34 @@ class PostTable(Table):
     pass
 
 
+class CommentTable(Table):
+    model = Comment
+    columns = ["title", "tags"]
+
+
+class CharacterSkillTable(Table):
+    model = Character
+    columns = ["nickname", "skill", "level"]
+
+
+class UnplannedCommentTable(CommentTable):
+    prefetch_related = []
+
+
+class CommentRowTable(CommentTable):
+    row_mode = "tuple"
+
+
+class CharacterSkillRowTable(CharacterSkillTable):
+    row_mode = "tuple"
+
+
+class CharacterFullTextTable(Table):
+    model = Character
+    ordering = ["nickname"]
+    search_backend = FullTextSearch(SearchVector("nickname", config="simple"))
+
+
 @override_settings(ORDER_VAR="o")
 class TableTest(TestCase):
 
@@ -115,6 +153,422 @@ class TableTest(TestCase):
             ],
         )
 
+    def test_table_headers_cached_per_language(self):
+        request = self.factory.get("/fake-url/")
+        table = FruitTable(request, self.model, self.queryset)
+        get_header_descriptors.cache_clear()
+        list(table_headers(table))
+        list(table_headers(FruitTable(request, self.model, self.queryset)))
+        self.assertEqual(get_header_descriptors.cache_info().misses, 1)
+        self.assertEqual(get_header_descriptors.cache_info().hits, 1)
+        with translation.override("ko"):
+            list(table_headers(table))
+        self.assertEqual(get_header_descriptors.cache_info().misses, 2)
+
+    def test_formatter_compiled_once(self):
+        request = self.factory.get("/fake-url/")
+        fruit = self.queryset.get()
+        get_column_formatter.cache_clear()
+        table = FruitTable(request, self.model, self.queryset)
+        self.assertEqual(table.display_for_value(fruit, "name"), "hello")
+        table = FruitTable(request, self.model, self.queryset)
+        self.assertEqual(table.display_for_value(fruit, "name"), "hello")
+        self.assertEqual(get_column_formatter.cache_info().misses, 1)
+
+    def test_fast_render_parity(self):
+        Fruit.objects.create(
+            name="<b>apple & pear</b>", price=500, expiration_date="2025-01-01"
+        )
+        template = Template("{% load tables %}{% table table %}")
+        cases = [
+            ("/fake-url/", FruitTable, Fruit.objects.order_by("id")),
+            ("/fake-url/?hide=price", FruitTable, Fruit.objects.order_by("id")),
+            ("/fake-url/", FruitTable, Fruit.objects.filter(price__lt=0)),
+            ("/fake-url/", CommentRowTable, Comment.objects.order_by("id")),
+        ]
+        outputs = []
+        for url, table_class, queryset in cases:
+            with self.subTest(url=url, table_class=table_class):
+                request = self.factory.get(url)
+                table = table_class(request, queryset.model, queryset)
+                fast_html = template.render(Context({"table": table}))
+                table.fast_render = False
+                html = template.render(Context({"table": table}))
+                self.assertEqual(fast_html, html)
+                outputs.append(fast_html)
+        self.assertIn("&lt;b&gt;apple &amp; pear&lt;/b&gt;", outputs[0])
+        self.assertIn('<td colspan="3">No results.</td>', outputs[2])
+
+
+class TablePaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(1, 8):
+            Fruit.objects.create(
+                name=f"fruit-{i}", price=i, expiration_date="2024-12-31"
+            )
+        cls.factory = RequestFactory()
+
+    def test_single_query(self):
+        cases = [
+            (3, 2, ["fruit-4", "fruit-5", "fruit-6"]),
+            (100, 1, [f"fruit-{i}" for i in range(1, 8)]),
+        ]
+        for list_per_page, page, expected in cases:
+            with self.subTest(list_per_page=list_per_page):
+                request = self.factory.get("/fake-url/", {"page": page})
+                with self.assertNumQueries(1):
+                    table = FruitTable(
+                        request,
+                        Fruit,
+                        Fruit.objects.order_by("id"),
+                        list_per_page=list_per_page,
+                    )
+                    result = [fruit.name for fruit in table.result_objects]
+                    # The rows are fetched once.
+                    list(table.result_objects)
+                self.assertEqual(table.pagination.result_count, 7)
+                self.assertEqual(result, expected)
+
+
+class TableParamsTest(SimpleTestCase):
+
+    def test_params(self):
+        request = RequestFactory().get(
+            "/fake-url/",
+            {"search": "apple", "order": "price", "page": "2", "other": "1"},
+        )
+        table = FruitTable(request, Fruit, Fruit.objects.none())
+        self.assertEqual(table.params, {"search": ["apple"], "order": ["price"]})
+        request = RequestFactory().get(
+            "/fake-url/",
+            {"search": "apple", "order": "price", "page": "2", "other": "2"},
+        )
+        other_table = FruitTable(request, Fruit, Fruit.objects.none())
+        # Other params don't create new cache entries.
+        self.assertEqual(other_table.cache_vary_on, table.cache_vary_on)
+        request = RequestFactory().get("/fake-url/", {"page": "3"})
+        other_table = FruitTable(request, Fruit, Fruit.objects.none())
+        self.assertNotEqual(other_table.cache_vary_on, table.cache_vary_on)
+
+    def test_view_params(self):
+        class TabFruitTable(FruitTable):
+            view_params = ["tab"]
+
+        request = RequestFactory().get("/fake-url/", {"tab": "a", "other": "1"})
+        table = TabFruitTable(request, Fruit, Fruit.objects.none())
+        self.assertEqual(table.params, {"tab": ["a"]})
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_check_shared_cache(self):
+        self.assertEqual([error.id for error in check_shared_cache()], ["base.E001"])
+        with override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                    "LOCATION": "kara_cache",
+                }
+            }
+        ):
+            self.assertEqual(check_shared_cache(), [])
+
+
+class TableProjectionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Fruit.objects.create(name="apple", price=1000, expiration_date="2024-12-31")
+        skill = Skill.objects.create(name="fire", damage=10)
+        Character.objects.create(nickname="tom", skill=skill)
+        cls.factory = RequestFactory()
+
+    def get_select_list(self, queries):
+        return queries[0]["sql"].split(" FROM ")[0]
+
+    def test_select_visible_columns(self):
+        cases = [
+            ({}, Fruit, FruitTable, ["id", "name", "price", "expiration_date"]),
+            ({"hide": "price"}, Fruit, FruitTable, ["id", "name", "expiration_date"]),
+            # Ordering fields are selected even if their column is hidden.
+            (
+                {"hide": ["price", "name"], "order": "price"},
+                Fruit,
+                FruitTable,
+                ["id", "expiration_date", "price"],
+            ),
+            ({"hide": "level"}, Character, CharacterSkillTable, ["nickname", "skill"]),
+        ]
+        for params, model, table_class, expected_columns in cases:
+            with self.subTest(params=params):
+                request = self.factory.get("/fake-url/", params)
+                with CaptureQueriesContext(connection) as context:
+                    table = table_class(request, model, model.objects.order_by("id"))
+                    list(table.result_objects)
+                select_list = self.get_select_list(context.captured_queries)
+                table_name = model._meta.db_table
+                for field in model._meta.concrete_fields:
+                    column = f'"{table_name}"."{field.column}"'
+                    if field.name in expected_columns or field.name == "id":
+                        self.assertIn(column, select_list)
+                    else:
+                        self.assertNotIn(column, select_list)
+
+    def test_hidden_columns(self):
+        cases = [
+            ({"hide": "price"}, ["name", "expiration_date"], ["price"]),
+            # Unknown columns are ignored.
+            ({"hide": ["unknown", "name"]}, ["price", "expiration_date"], ["name"]),
+            # At least one column remains visible.
+            (
+                {"hide": ["name", "price", "expiration_date"]},
+                ["name", "price", "expiration_date"],
+                [],
+            ),
+        ]
+        for params, columns, hidden_columns in cases:
+            with self.subTest(params=params):
+                request = self.factory.get("/fake-url/", params)
+                table = FruitTable(request, Fruit, Fruit.objects.order_by("id"))
+                self.assertEqual(table.columns, columns)
+                self.assertEqual(table.hidden_columns, hidden_columns)
+                self.assertEqual(
+                    table.all_columns, ["name", "price", "expiration_date"]
+                )
+
+    def test_load_fields_override(self):
+        request = self.factory.get("/fake-url/", {"hide": "price"})
+        table = FruitTable(request, Fruit, Fruit.objects.order_by("id"))
+        table.load_fields = "__all__"
+        queryset = table.get_projection_result(Fruit.objects.all())
+        self.assertEqual(queryset.query.deferred_loading, (frozenset(), True))
+
+    def test_column_selector(self):
+        request = self.factory.get("/fake-url/", {"hide": "price"})
+        table = FruitTable(request, Fruit, Fruit.objects.order_by("id"))
+        html = Template("{% load tables %}{% column_selector table %}").render(
+            Context({"table": table})
+        )
+        self.assertInHTML(
+            '<a class="px-2 py-1 border rounded-md text-sm column-hidden '
+            'line-through opacity-50" href="?" aria-pressed="false">price label</a>',
+            html,
+        )
+        self.assertInHTML(
+            '<a class="px-2 py-1 border rounded-md text-sm column-shown" '
+            'href="?hide=price&amp;hide=name" aria-pressed="true">name label</a>',
+            html,
+        )
+
+
+class TableCursorPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(1, 8):
+            Fruit.objects.create(
+                name=f"fruit-{i}", price=i % 3, expiration_date="2024-12-31"
+            )
+        cls.queryset = Fruit.objects.all().order_by("-id")
+        cls.factory = RequestFactory()
+
+    def test_keyset_follows_column_ordering(self):
+        expected = list(Fruit.objects.order_by("-price", "-pk"))
+        request = self.factory.get("/fake-url/", {"order": "-price"})
+        table = FruitTable(
+            request,
+            Fruit,
+            self.queryset,
+            list_per_page=3,
+            pagination_class=CursorPagination,
+        )
+        result = list(table.result_objects)
+        while table.pagination.page.has_next():
+            request = self.factory.get(
+                "/fake-url/",
+                {"order": "-price", **table.pagination.next_page_params},
+            )
+            table = FruitTable(
+                request,
+                Fruit,
+                self.queryset,
+                list_per_page=3,
+                pagination_class=CursorPagination,
+            )
+            result += table.result_objects
+        self.assertEqual(result, expected)
+        # Changing the ordering drops the cursor.
+        self.assertNotIn(table.page_var, table.params)
+
+    def test_ignore_invalid_ordering(self):
+        expected = list(Fruit.objects.order_by("-id")[:3])
+        for order in ["?", "-?", "id__in", "unknown", "--price"]:
+            with self.subTest(order=order):
+                request = self.factory.get("/fake-url/", {"order": order})
+                table = FruitTable(
+                    request,
+                    Fruit,
+                    self.queryset,
+                    list_per_page=3,
+                    pagination_class=CursorPagination,
+                )
+                self.assertEqual(list(table.result_objects), expected)
+                self.assertEqual(table.params["order"], [])
+
+
+class TableRelatedLookupsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags = [
+            Tag.objects.create(name=f"tag-{i}", hex_color="#000000") for i in range(3)
+        ]
+        for i in range(5):
+            comment = Comment.objects.create(
+                title=f"title-{i}", author="author", content="content"
+            )
+            comment.tags.set(tags)
+            skill = Skill.objects.create(name=f"skill-{i}", damage=i)
+            Character.objects.create(nickname=f"nickname-{i}", skill=skill)
+        cls.factory = RequestFactory()
+
+    def test_plan_related_lookups(self):
+        request = self.factory.get("/fake-url/")
+        cases = [
+            (CommentTable, Comment, [], ["tags"]),
+            (CharacterSkillTable, Character, ["skill"], []),
+            (FruitTable, Fruit, [], []),
+        ]
+        for table_class, model, select_related, prefetch_related in cases:
+            with self.subTest(table_class=table_class):
+                table = table_class(request, model, model.objects.order_by("id"))
+                self.assertEqual(table.get_select_related(), select_related)
+                self.assertEqual(table.get_prefetch_related(), prefetch_related)
+
+    def test_render_relations_without_query_per_row(self):
+        request = self.factory.get("/fake-url/")
+        cases = [
+            (CommentTable, Comment, "tags", 2),
+            (CharacterSkillTable, Character, "skill", 1),
+        ]
+        for table_class, model, column, num_queries in cases:
+            with self.subTest(table_class=table_class):
+                with self.assertNumQueries(num_queries):
+                    table = table_class(request, model, model.objects.order_by("id"))
+                    for obj in table.result_objects:
+                        value = table.display_for_value(obj, column)
+                        if column == "tags":
+                            self.assertEqual(len(value.all()), 3)
+                        else:
+                            self.assertTrue(value.name.startswith("skill-"))
+
+    def test_related_lookups_override(self):
+        request = self.factory.get("/fake-url/")
+        with self.assertNumQueries(6):
+            table = UnplannedCommentTable(
+                request, Comment, Comment.objects.order_by("id")
+            )
+            for obj in table.result_objects:
+                list(table.display_for_value(obj, "tags").all())
+
+    def test_check_related_lookups(self):
+        errors = [
+            error
+            for error in check_table_related_lookups()
+            if error.obj in (CommentTable, CharacterSkillTable, UnplannedCommentTable)
+        ]
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].id, "tables.W001")
+        self.assertIs(errors[0].obj, UnplannedCommentTable)
+        self.assertEqual(
+            errors[0].msg,
+            "UnplannedCommentTable renders the relation 'tags' "
+            "but doesn't select or prefetch it.",
+        )
+
+
+class TableRowModeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags = [
+            Tag.objects.create(name=f"tag-{i}", hex_color="#000000") for i in range(3)
+        ]
+        for i in range(5):
+            comment = Comment.objects.create(
+                title=f"title-{i}", author="author", content="content"
+            )
+            comment.tags.set(tags[: i % 4])
+            skill = Skill.objects.create(name=f"skill-{i}", damage=i) if i else None
+            Character.objects.create(nickname=f"nickname-{i}", skill=skill)
+        cls.factory = RequestFactory()
+
+    def test_rows_match_model_instances(self):
+        request = self.factory.get("/fake-url/")
+        cases = [
+            (CommentTable, CommentRowTable, Comment),
+            (CharacterSkillTable, CharacterSkillRowTable, Character),
+        ]
+        for model_table_class, row_table_class, model in cases:
+            with self.subTest(table_class=row_table_class):
+                queryset = model.objects.order_by("id")
+                model_table = model_table_class(request, model, queryset)
+                row_table = row_table_class(request, model, queryset)
+                self.assertEqual(len(row_table.result_objects), 5)
+                for obj, row in zip(
+                    model_table.result_objects, row_table.result_objects
+                ):
+                    self.assertNotIsInstance(row, model)
+                    for column in row_table.columns:
+                        expected = model_table.display_for_value(obj, column)
+                        value = row_table.display_for_value(row, column)
+                        if column == "tags":
+                            expected, value = list(expected.all()), list(value.all())
+                        self.assertEqual(value, expected)
+
+    def test_one_query_per_relation(self):
+        request = self.factory.get("/fake-url/")
+        cases = [
+            (CommentRowTable, Comment, 2),
+            (CharacterSkillRowTable, Character, 2),
+            (CharacterSkillRowTable, Character.objects.none(), 0),
+        ]
+        for table_class, queryset, num_queries in cases:
+            if not isinstance(queryset, QuerySet):
+                queryset = queryset.objects.all()
+            with self.subTest(table_class=table_class, num_queries=num_queries):
+                table = table_class(request, queryset.model, queryset.order_by("id"))
+                with self.assertNumQueries(num_queries):
+                    list(table.result_objects)
+
+    def test_cursor_pagination(self):
+        queryset = Comment.objects.order_by("author")
+        expected = list(Comment.objects.order_by("author", "pk").values_list("title"))
+        request = self.factory.get("/fake-url/")
+        result = []
+        while True:
+            table = CommentRowTable(
+                request,
+                Comment,
+                queryset,
+                list_per_page=2,
+                pagination_class=CursorPagination,
+            )
+            result += [(row.title,) for row in table.result_objects]
+            if not table.pagination.page.has_next():
+                break
+            request = self.factory.get("/fake-url/", table.pagination.next_page_params)
+        self.assertEqual(result, expected)
+
+    def test_invalid_row_mode(self):
+        class InvalidRowModeTable(FruitTable):
+            row_mode = "dict"
+
+        request = self.factory.get("/fake-url/")
+        table = InvalidRowModeTable(request, Fruit, Fruit.objects.all())
+        with self.assertRaises(ImproperlyConfigured):
+            table.result_objects
+
 
 class TableSearchTest(TestCase):
     @classmethod
@@ -139,6 +593,7 @@ class TableSearchTest(TestCase):
         cases = [
             ("sky", ["nickname"], ["Blue Sky", "Red Sky"]),
             ("sunny hill", ["nickname__iexact"], ["Sunny Hill"]),
+            (" sunny   HILL ", ["nickname__normalized"], ["Sunny Hill"]),
             (
                 "Happy",
                 ["nickname__startswith"],
@@ -160,6 +615,27 @@ class TableSearchTest(TestCase):
                 for expected_result in expected_results:
                     self.assertIn(expected_result, result)
 
+    def test_normalized_search(self):
+        Character.objects.create(nickname="Café Mocha")
+        request = self.factory.get("/fake-url/")
+        table = CharacterTable(request, Character, self.queryset)
+        table.search_fields = ["nickname__normalized"]
+        cases = [
+            # Decomposed (NFD) é, case and whitespace differences. Only
+            # ASCII letters differ in case, since LOWER() of other letters
+            # depends on the LC_CTYPE of the database.
+            ("cafe\u0301 \t MOCHA ", ["Café Mocha"]),
+            ("blue  fox", ["Blue Fox"]),
+            ("blue", []),
+        ]
+        for value, expected_results in cases:
+            with self.subTest(value=value):
+                queryset = table.get_search_result(self.queryset, value)
+                self.assertEqual(
+                    list(queryset.values_list("nickname", flat=True)),
+                    expected_results,
+                )
+
     def test_invalid_field_set_search_field(self):
         request = self.factory.get("/fake-url/")
         table = CharacterTable(request, Character, self.queryset)
@@ -196,3 +672,54 @@ class TableSearchTest(TestCase):
         expected_username = ["Happy Cloud", "Happy Hills", "Happy Sunday", "Sky Rain"]
         for username in expected_username:
             self.assertIn(username, result)
+
+
+class TableFullTextSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Character.objects.bulk_create(
+            Character(nickname=name)
+            for name in ["Blue Sky", "Sky Sky Rain", "Skyline", "Red Sky", "Sunny"]
+        )
+        cls.queryset = Character.objects.order_by("id")
+        cls.factory = RequestFactory()
+
+    def search(self, value, table_class=CharacterFullTextTable):
+        table = table_class(self.factory.get("/fake-url/"), Character, self.queryset)
+        queryset = table.get_search_result(self.queryset, value)
+        return list(queryset.values_list("nickname", flat=True))
+
+    def test_prefix_search(self):
+        self.assertEqual(
+            self.search("sky"), ["Sky Sky Rain", "Blue Sky", "Skyline", "Red Sky"]
+        )
+        # Every word must match.
+        self.assertEqual(self.search("SKY bl"), ["Blue Sky"])
+        self.assertEqual(self.search("ky"), [])
+
+    def test_operators_are_searched(self):
+        for value in ["sky & !", "'sky", "sky:*", "sky \\"]:
+            with self.subTest(value=value):
+                self.assertEqual(len(self.search(value)), 4)
+        self.assertEqual(len(self.search(" ")), 5)
+
+    def test_without_rank(self):
+        class UnrankedTable(CharacterFullTextTable):
+            search_backend = FullTextSearch(
+                SearchVector("nickname", config="simple"), rank=False
+            )
+
+        self.assertEqual(
+            self.search("sky", UnrankedTable),
+            ["Blue Sky", "Sky Sky Rain", "Skyline", "Red Sky"],
+        )
+
+    def test_column_ordering_replaces_rank(self):
+        request = self.factory.get("/fake-url/", {"o": "nickname", "search": "sky"})
+        with override_settings(ORDER_VAR="o"):
+            table = CharacterFullTextTable(request, Character, self.queryset)
+            results = table.get_queryset(request, self.queryset)
+        self.assertEqual(
+            [character.nickname for character in results],
+            ["Blue Sky", "Red Sky", "Sky Sky Rain", "Skyline"],
+        )
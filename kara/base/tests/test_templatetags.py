@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+from django.utils import translation
+
+from kara.base.cache import bump_data_version
+
+
+class VersionedCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_versioned_cache(self):
+        template = Template(
+            "{% load base_templatetags %}"
+            '{% versioned_cache keys "fragment" page %}{{ value }}'
+            "{% endversioned_cache %}"
+        )
+
+        def render(value, page=1, keys=("fish",)):
+            return template.render(
+                Context({"value": value, "page": page, "keys": list(keys)})
+            )
+
+        self.assertEqual(render("a"), "a")
+        # Served from the cache until a version changes.
+        self.assertEqual(render("b"), "a")
+        self.assertEqual(render("b", page=2), "b")
+        with translation.override("ko"):
+            self.assertEqual(render("c"), "c")
+        bump_data_version("fish")
+        self.assertEqual(render("d"), "d")
+        self.assertEqual(render("e", keys=("fish", "comment")), "e")
+        bump_data_version("comment")
+        self.assertEqual(render("f", keys=("fish", "comment")), "f")
+        self.assertEqual(render("g"), "d")
+
+    @override_settings(VERSIONED_CACHE_TIMEOUT=60)
+    def test_versioned_cache_timeout(self):
+        template = Template(
+            "{% load base_templatetags %}"
+            '{% versioned_cache "fish" "fragment" %}a{% endversioned_cache %}'
+        )
+        with mock.patch.object(cache, "set", wraps=cache.set) as cache_set:
+            template.render(Context())
+        self.assertEqual(cache_set.call_args.kwargs["timeout"], 60)
@@ -6,6 +6,7 @@ from django.views.generic.base import View
 
 from kara.base.tests.models import Fruit, Skill, Tag
 from kara.base.views import (
+    LazyContextValue,
     MultipleObjectMixin,
     PartialTemplateFormMixin,
     PartialTemplateModelFormMixin,
@@ -21,6 +22,11 @@ class DogView(PartialTemplateResponseMixin):
     pass
 
 
+class WalletView(PartialTemplateResponseMixin):
+    template_name = "test/template_money.html"
+    partial_context = {"coins": ["coins"]}
+
+
 class PartialTemplateResponseMixinTests(SimpleTestCase):
 
     def setUp(self):
@@ -55,6 +61,28 @@ class PartialTemplateResponseMixinTests(SimpleTestCase):
                     "to be defined and the request must include an 'Hx-Target' header.",
                 )
 
+    def test_partial_context(self):
+        view = WalletView()
+        context = {"coins": 3, "bills": LazyContextValue(lambda: 1 / 0)}
+        cases = [
+            ("coins", {"coins": 3}, False),
+            ("unknown", context, True),
+            (None, context, True),
+        ]
+        for hx_target, expected_context, needs_bills in cases:
+            with self.subTest(hx_target=hx_target):
+                if hx_target is None:
+                    request = self.factory.get("/fake-url/")
+                    request.htmx = False
+                else:
+                    request = self.factory.get("/fake-url/", HTTP_HX_TARGET=hx_target)
+                    request.htmx = True
+                view.request = request
+                self.assertTrue(view.needs_context("coins"))
+                self.assertIs(view.needs_context("bills"), needs_bills)
+                response = view.render_to_response(context)
+                self.assertEqual(response.context_data, expected_context)
+
 
 class CakeForm(forms.Form):
     name = forms.CharField()
@@ -91,6 +119,21 @@ class PartialTemplateFormMixinTests(SimpleTestCase):
         self.assertIn("cheese_cake_form", context)
         self.assertTrue(isinstance(context["cheese_cake_form"], CakeForm))
 
+    def test_form_created_when_read(self):
+        created = []
+
+        class LoggedCakeForm(CakeForm):
+            def __init__(self, *args, **kwargs):
+                created.append(self)
+                super().__init__(*args, **kwargs)
+
+        view = CakeView()
+        view.form_class = LoggedCakeForm
+        context = view.get_context_data()
+        self.assertEqual(created, [])
+        self.assertIn("name", str(context[view.form_name]))
+        self.assertEqual(len(created), 1)
+
     def test_form_invalid(self):
         view = CakeView()
         request = RequestFactory().get("/fake-url/")
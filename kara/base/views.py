@@ -1,6 +1,6 @@
 from django.core.exceptions import ImproperlyConfigured
 from django.db.models import QuerySet
-from django.utils.functional import cached_property
+from django.utils.functional import SimpleLazyObject, cached_property
 from django.views.generic.base import ContextMixin, TemplateResponseMixin, View
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import BaseCreateView, FormMixin, ModelFormMixin
@@ -9,11 +9,59 @@ from .pagination import Pagination
 from .utils import pascal_to_snake
 
 
+class LazyContextValue(SimpleLazyObject):
+    """
+    A context value computed the first time it is read.
+
+    Templates that don't render the value, such as a partial template
+    rendered for an HTMX request, never compute it.
+    """
+
+
 class PartialTemplateResponseMixin(TemplateResponseMixin):
+    """
+    Renders the partial template named by the Hx-Target header of HTMX
+    requests.
+
+    partial_context:
+        Declares the context keys read by each partial template.
+        e.g. {"gift-form": ["gift_form"]}
+        When a declared partial is rendered, the other keys are left out of
+        its context. Use `needs_context()` to skip computing them and
+        LazyContextValue for values only computed when read.
+        Partials that aren't declared receive the whole context.
+    """
+
+    partial_context = {}
+
+    def get_partial_name(self):
+        if self.request.htmx:
+            return self.request.headers.get("Hx-Target", None)
+        return None
+
+    def get_partial_context_keys(self):
+        return self.partial_context.get(self.get_partial_name(), None)
+
+    def needs_context(self, *keys):
+        """
+        Return whether the rendered template reads any of the context keys.
+        """
+        context_keys = self.get_partial_context_keys()
+        return context_keys is None or any(key in context_keys for key in keys)
+
+    def render_to_response(self, context, **response_kwargs):
+        context_keys = self.get_partial_context_keys()
+        if context_keys is not None:
+            context = {
+                key: value
+                for key, value in context.items()
+                if key == "view" or key in context_keys
+            }
+        return super().render_to_response(context, **response_kwargs)
 
     def get_template_names(self):
         if self.request.htmx:
-            htmx_target = self.request.headers.get("Hx-Target", None)
+            htmx_target = self.get_partial_name()
             if self.template_name is None or htmx_target is None:
                 raise ImproperlyConfigured(
                     "PartialTemplateResponseMixin requires 'template_name' to be "
@@ -44,8 +92,9 @@ class PartialTemplateFormMixin(FormMixin):
     def get_context_data(self, **kwargs):
         context = ContextMixin().get_context_data(**kwargs)
         if self.form_name not in kwargs or kwargs[self.form_name] is None:
-            # If no form is provided, a new one will be created.
-            context[self.form_name] = self.form_class()
+            # If no form is provided, a new one will be created
+            # when the template renders it.
+            context[self.form_name] = LazyContextValue(self.form_class)
         return context
 
     def form_invalid(self, form):
@@ -79,6 +128,8 @@ class MultipleObjectMixin(ContextMixin):
         Use the model name as the key to define list_per_page and page_kwarg.
         e.g. CashGift(models.Model)
         - paginate = {"cashgift"(CashGift._meta.model_name): {"list_per_page": 10, "page_kwarg": "gift_p"}} # noqa
+        A "pagination_class" key overrides the view's pagination_class
+        for that model (e.g. CursorPagination for keyset pagination).
 
     context_object_name:
         Determines the context variable name for a specific model.
@@ -122,15 +173,20 @@ class MultipleObjectMixin(ContextMixin):
             )
         return queryset
 
-    def get_pagination(self, request, queryset, list_per_page, page_var):
-        return self.pagination_class(request, queryset, list_per_page, page_var)
+    def get_pagination(
+        self, request, queryset, list_per_page, page_var, pagination_class=None
+    ):
+        pagination_class = pagination_class or self.pagination_class
+        return pagination_class(request, queryset, list_per_page, page_var)
 
-    def paginate_queryset(self, queryset, list_per_page, page_var):
+    def paginate_queryset(
+        self, queryset, list_per_page, page_var, pagination_class=None
+    ):
         data = {}
         key = self.get_context_object_name(queryset.model)
         page_var = page_var if page_var is not None else f"{key}_page"
         pagination = self.get_pagination(
-            self.request, queryset, list_per_page, page_var
+            self.request, queryset, list_per_page, page_var, pagination_class
         )
         data[key] = pagination.get_objects()
         # Pagination object can be accessed using context_name + '_pagination'.
@@ -168,6 +224,7 @@ class MultipleObjectMixin(ContextMixin):
                     q,
                     paginate["list_per_page"],
                     paginate.get("page_var", None),
+                    paginate.get("pagination_class", None),
                 )
                 context.update(data)
             else:
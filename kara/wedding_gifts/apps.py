@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WeddingGiftsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "kara.wedding_gifts"
+
+    def ready(self):
+        from . import signals  # noqa: F401
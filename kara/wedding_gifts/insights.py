@@ -0,0 +1,211 @@
+import datetime
+import functools
+from collections import namedtuple
+
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.core.cache import cache
+from django.db import connections, router
+from django.utils.formats import date_format
+from django.utils.translation import gettext_lazy as _
+
+from kara.base.cache import get_data_version, make_cache_key
+
+from .models import CashGift, GiftDailyRollup, GiftTag, InKindGift, WeddingGiftRegistry
+
+# Upper bounds of the price bands, the last band has no upper bound.
+PRICE_BANDS = (30000, 50000, 100000, 200000, 500000)
+TOP_GIVERS_CNT = 10
+
+InsightRow = namedtuple("InsightRow", ["key", "label", "cnt", "total_price", "ratio"])
+
+# Both gift tables are read once (as the "gifts" and "tagged_gifts" common
+# table expressions) and every chart is a grouped aggregate over them, except
+# the receipts per day which are read from the daily rollups.
+# The rows of all charts are returned by a single query as
+# (chart, key, count, total price).
+INSIGHTS_SQL = """
+WITH gifts AS (
+    SELECT 'cash' AS gift_type, NULL AS kind, name, price, receipt_date
+    FROM {cash_gift}
+    WHERE registry_id = %(registry)s
+    UNION ALL
+    SELECT 'in_kind', kind, name, price, receipt_date
+    FROM {in_kind_gift}
+    WHERE registry_id = %(registry)s
+),
+tagged_gifts AS (
+    SELECT link.{cash_gift_tags_tag} AS tag_id, gift.price
+    FROM {cash_gift_tags} link
+    INNER JOIN {cash_gift} gift ON gift.id = link.{cash_gift_tags_gift}
+    WHERE gift.registry_id = %(registry)s
+    UNION ALL
+    SELECT link.{in_kind_gift_tags_tag}, gift.price
+    FROM {in_kind_gift_tags} link
+    INNER JOIN {in_kind_gift} gift ON gift.id = link.{in_kind_gift_tags_gift}
+    WHERE gift.registry_id = %(registry)s
+)
+SELECT 'gift_types', gift_type, COUNT(*), SUM(price)
+FROM gifts GROUP BY gift_type
+UNION ALL
+SELECT 'kinds', kind, COUNT(*), SUM(price)
+FROM gifts WHERE kind IS NOT NULL GROUP BY kind
+UNION ALL
+SELECT 'receipts', CAST(date AS text), SUM(cnt), CAST(SUM(total_price) AS bigint)
+FROM {gift_daily_rollup}
+WHERE registry_id = %(registry)s
+GROUP BY date
+UNION ALL
+SELECT 'price_bands', CAST({price_band} AS text), COUNT(*), SUM(price)
+FROM gifts GROUP BY 2
+UNION ALL
+SELECT 'tags', tag.name, COUNT(*), SUM(tagged_gifts.price)
+FROM tagged_gifts INNER JOIN {gift_tag} tag ON tag.id = tagged_gifts.tag_id
+GROUP BY tag.name
+UNION ALL
+SELECT 'top_givers', name, cnt, total_price FROM (
+    SELECT name, COUNT(*) AS cnt, SUM(price) AS total_price
+    FROM gifts GROUP BY name
+    ORDER BY total_price DESC, cnt DESC, name
+    LIMIT %(top_givers)s
+) top_givers
+"""
+
+
+@functools.cache
+def get_insights_sql(alias):
+    quote_name = connections[alias].ops.quote_name
+    tables = {}
+    for prefix, model in (("cash_gift", CashGift), ("in_kind_gift", InKindGift)):
+        tags = model._meta.get_field("tags")
+        tables[prefix] = quote_name(model._meta.db_table)
+        tables[f"{prefix}_tags"] = quote_name(tags.m2m_db_table())
+        tables[f"{prefix}_tags_gift"] = quote_name(tags.m2m_column_name())
+        tables[f"{prefix}_tags_tag"] = quote_name(tags.m2m_reverse_name())
+    tables["gift_tag"] = quote_name(GiftTag._meta.db_table)
+    tables["gift_daily_rollup"] = quote_name(GiftDailyRollup._meta.db_table)
+    # Index of the price band, the bounds are constants.
+    tables["price_band"] = (
+        "CASE "
+        + " ".join(
+            f"WHEN price < {int(bound)} THEN {i}" for i, bound in enumerate(PRICE_BANDS)
+        )
+        + f" ELSE {len(PRICE_BANDS)} END"
+    )
+    return INSIGHTS_SQL.format(**tables)
+
+
+def get_insight_rows(registry_pk):
+    """
+    Returns the (chart, key, count, total price) rows of the registry
+    insights, fetched with a single query.
+    The rows are cached until the registry, its gifts or their tags change.
+    """
+    cache_key = make_cache_key(
+        "kara.gift_insights",
+        str(registry_pk),
+        get_data_version(WeddingGiftRegistry.get_data_version_key(registry_pk)),
+    )
+    rows = cache.get(cache_key)
+    if rows is not None:
+        return rows
+    alias = router.db_for_read(CashGift)
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            get_insights_sql(alias),
+            {"registry": registry_pk, "top_givers": TOP_GIVERS_CNT},
+        )
+        rows = cursor.fetchall()
+    cache.set(cache_key, rows, timeout=None)
+    return rows
+
+
+def get_price_band_label(index):
+    if index == 0:
+        return f"~ {intcomma(PRICE_BANDS[0])}"
+    if index == len(PRICE_BANDS):
+        return f"{intcomma(PRICE_BANDS[-1])} ~"
+    return f"{intcomma(PRICE_BANDS[index - 1])} ~ {intcomma(PRICE_BANDS[index])}"
+
+
+def build_chart(values, ratio_of="total_price"):
+    """
+    Returns the InsightRow of each (key, label, count, total price) value.
+    The ratio is the percentage of the largest count or total price of the
+    chart, e.g. for the width of a bar.
+    """
+    index = 2 if ratio_of == "cnt" else 3
+    largest = max((value[index] for value in values), default=0)
+    return [
+        InsightRow(*value, ratio=value[index] * 100 // largest if largest else 0)
+        for value in values
+    ]
+
+
+def get_gift_insights(registry):
+    """
+    Returns the insights of the registry gifts: the totals by gift type,
+    by kind and by tag, the receipts per day, the top givers and the number
+    of gifts per price band.
+
+    Every chart is a grouped aggregate of a single query, whatever the number
+    of gifts, and the aggregated rows are cached per registry data version.
+    """
+    charts = {
+        "gift_types": {},
+        "kinds": {},
+        "receipts": {},
+        "price_bands": {},
+        "tags": {},
+        "top_givers": {},
+    }
+    for chart, key, cnt, total_price in get_insight_rows(registry.pk):
+        charts[chart][key] = (cnt, total_price or 0)
+
+    gift_type_labels = {
+        "cash": _("Cash Gift"),
+        "in_kind": _("In Kind Gift"),
+    }
+    kind_labels = dict(InKindGift.KIND_CHOICES)
+    receipts = sorted(
+        (datetime.date.fromisoformat(key), *totals)
+        for key, totals in charts["receipts"].items()
+    )
+
+    def by_total_price(chart, labels=None):
+        values = [
+            (key, labels.get(key, key) if labels else key, *totals)
+            for key, totals in charts[chart].items()
+        ]
+        return sorted(values, key=lambda value: (-value[3], -value[2], value[0]))
+
+    return {
+        "total_cnt": sum(cnt for cnt, total in charts["gift_types"].values()),
+        "total_price": sum(total for cnt, total in charts["gift_types"].values()),
+        "gift_types": build_chart(
+            [
+                (key, label, *charts["gift_types"].get(key, (0, 0)))
+                for key, label in gift_type_labels.items()
+            ]
+        ),
+        "kinds": build_chart(by_total_price("kinds", kind_labels)),
+        "tags": build_chart(by_total_price("tags")),
+        "top_givers": build_chart(by_total_price("top_givers")),
+        "receipts": build_chart(
+            [
+                (date, date_format(date, "SHORT_DATE_FORMAT"), cnt, total_price)
+                for date, cnt, total_price in receipts
+            ],
+            ratio_of="cnt",
+        ),
+        "price_bands": build_chart(
+            [
+                (
+                    index,
+                    get_price_band_label(index),
+                    *charts["price_bands"].get(str(index), (0, 0)),
+                )
+                for index in range(len(PRICE_BANDS) + 1)
+            ],
+            ratio_of="cnt",
+        ),
+    }
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from kara.wedding_gifts.models import GiftDailyRollup, WeddingGiftRegistry
+
+ROLLUP_FIELDS = ("registry_id", "date", "gift_type", "side", "cnt", "total_price")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the daily gift rollups of the wedding gift registries, "
+        "and reports the registries that were out of date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of registries checked and rebuilt at once.",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report out of date registries, and fail if there are any.",
+        )
+
+    def get_stale_registries(self, pks):
+        stored = set(
+            GiftDailyRollup.objects.filter(registry__in=pks).values_list(*ROLLUP_FIELDS)
+        )
+        live = {
+            tuple(getattr(rollup, field) for field in ROLLUP_FIELDS)
+            for rollup in GiftDailyRollup.compute(pks)
+        }
+        return sorted({rollup[0] for rollup in stored ^ live})
+
+    def handle(self, *args, batch_size, verify, **options):
+        registries = WeddingGiftRegistry.objects.order_by("pk")
+        checked = out_of_date = 0
+        last_pk = None
+        while True:
+            batch = registries
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            checked += len(pks)
+            stale_pks = self.get_stale_registries(pks)
+            out_of_date += len(stale_pks)
+            for pk in stale_pks:
+                self.stdout.write(f"Registry {pk} is out of date.", self.style.WARNING)
+            if stale_pks and not verify:
+                GiftDailyRollup.rebuild(stale_pks)
+        if verify and out_of_date:
+            raise CommandError(
+                f"{out_of_date} of {checked} registries are out of date."
+            )
+        action = "checked" if verify else "rebuilt"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{checked} registries {action}, {out_of_date} were out of date."
+            )
+        )
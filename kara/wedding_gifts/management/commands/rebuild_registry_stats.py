@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from kara.wedding_gifts.models import WeddingGiftRegistry
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the gift statistics (counts and total prices) stored on "
+        "the wedding gift registries, and reports the registries that were "
+        "out of date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of registries checked and updated per query.",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report out of date registries, and fail if there are any.",
+        )
+
+    def handle(self, *args, batch_size, verify, **options):
+        registries = WeddingGiftRegistry.objects.order_by("pk")
+        checked = out_of_date = 0
+        last_pk = None
+        while True:
+            batch = registries
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            checked += len(pks)
+            stale_registries = registries.filter(pk__in=pks).with_outdated_gift_stats()
+            stale_pks = list(stale_registries.values_list("pk", flat=True))
+            out_of_date += len(stale_pks)
+            for pk in stale_pks:
+                self.stdout.write(f"Registry {pk} is out of date.", self.style.WARNING)
+            if stale_pks and not verify:
+                registries.filter(pk__in=stale_pks).rebuild_gift_stats()
+        if verify and out_of_date:
+            raise CommandError(
+                f"{out_of_date} of {checked} registries are out of date."
+            )
+        action = "checked" if verify else "rebuilt"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{checked} registries {action}, {out_of_date} were out of date."
+            )
+        )
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def compute_gift_stats(apps, schema_editor):
+    WeddingGiftRegistry = apps.get_model("wedding_gifts", "WeddingGiftRegistry")
+    stats = {}
+    for model_name, prefix in (("CashGift", "cash"), ("InKindGift", "in_kind")):
+        gifts = (
+            apps.get_model("wedding_gifts", model_name)
+            .objects.filter(registry=OuterRef("pk"))
+            .order_by()
+            .values("registry")
+        )
+        stats[f"{prefix}_gift_cnt"] = Coalesce(
+            Subquery(gifts.annotate(value=Count("pk")).values("value")), 0
+        )
+        stats[f"{prefix}_gift_total_price"] = Coalesce(
+            Subquery(gifts.annotate(value=Sum("price")).values("value")), 0
+        )
+    WeddingGiftRegistry.objects.update(**stats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wedding_gifts", "0009_remove_weddinggiftregistry_in_kind_gifts_allow"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="weddinggiftregistry",
+            name="cash_gift_cnt",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="weddinggiftregistry",
+            name="cash_gift_total_price",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="weddinggiftregistry",
+            name="in_kind_gift_cnt",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="weddinggiftregistry",
+            name="in_kind_gift_total_price",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            compute_gift_stats, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wedding_gifts", "0010_weddinggiftregistry_gift_stats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cashgift",
+            index=models.Index(
+                fields=["registry", "-id"], name="cashgift_registry_id_desc"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cashgift",
+            index=models.Index(
+                fields=["registry", "price"], name="cashgift_registry_price"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cashgift",
+            index=models.Index(
+                fields=["registry", "receipt_date"], name="cashgift_registry_date"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inkindgift",
+            index=models.Index(
+                fields=["registry", "-id"], name="inkindgift_registry_id_desc"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inkindgift",
+            index=models.Index(
+                fields=["registry", "price"], name="inkindgift_registry_price"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inkindgift",
+            index=models.Index(
+                fields=["registry", "receipt_date"], name="inkindgift_registry_date"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="cashgift",
+            name="registry",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="wedding_gifts.weddinggiftregistry",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="inkindgift",
+            name="registry",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="wedding_gifts.weddinggiftregistry",
+            ),
+        ),
+    ]
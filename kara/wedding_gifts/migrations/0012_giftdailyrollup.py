@@ -0,0 +1,90 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def compute_daily_rollups(apps, schema_editor):
+    GiftDailyRollup = apps.get_model("wedding_gifts", "GiftDailyRollup")
+    for model_name, gift_type in (("CashGift", "cash"), ("InKindGift", "in_kind")):
+        rows = (
+            apps.get_model("wedding_gifts", model_name)
+            .objects.order_by()
+            .values("registry_id", "receipt_date", "registry__side")
+            .annotate(cnt=Count("pk"), total_price=Sum("price"))
+        )
+        GiftDailyRollup.objects.bulk_create(
+            (
+                GiftDailyRollup(
+                    registry_id=row["registry_id"],
+                    date=row["receipt_date"],
+                    gift_type=gift_type,
+                    side=row["registry__side"],
+                    cnt=row["cnt"],
+                    total_price=row["total_price"],
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wedding_gifts", "0011_gift_registry_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GiftDailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "gift_type",
+                    models.CharField(
+                        choices=[("cash", "Cash Gift"), ("in_kind", "In Kind Gift")],
+                        max_length=16,
+                    ),
+                ),
+                (
+                    "side",
+                    models.CharField(
+                        choices=[("Groom", "Groom's side"), ("Bride", "Bride's side")]
+                    ),
+                ),
+                ("cnt", models.IntegerField(default=0)),
+                ("total_price", models.BigIntegerField(default=0)),
+                (
+                    "registry",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_rollups",
+                        to="wedding_gifts.weddinggiftregistry",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("registry", "date", "gift_type", "side"),
+                        name="unique_gift_daily_rollup",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            compute_daily_rollups, reverse_code=migrations.RunPython.noop
+        ),
+    ]
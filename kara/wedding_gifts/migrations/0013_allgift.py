@@ -0,0 +1,99 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Filters and ordering on the view are pushed down into both SELECTs,
+# so they use the indexes of each gift table.
+ALL_GIFT_VIEW_SQL = """
+CREATE VIEW wedding_gifts_allgift AS
+SELECT
+    'cash:' || id AS key,
+    'cash' AS gift_type,
+    id AS gift_id,
+    registry_id,
+    name,
+    price,
+    receipt_date,
+    CAST(NULL AS varchar) AS kind,
+    CAST(NULL AS varchar(128)) AS kind_detail
+FROM wedding_gifts_cashgift
+UNION ALL
+SELECT
+    'in_kind:' || id,
+    'in_kind',
+    id,
+    registry_id,
+    name,
+    price,
+    receipt_date,
+    kind,
+    kind_detail
+FROM wedding_gifts_inkindgift
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wedding_gifts", "0012_giftdailyrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AllGift",
+            fields=[
+                ("key", models.CharField(primary_key=True, serialize=False)),
+                (
+                    "gift_type",
+                    models.CharField(
+                        choices=[("cash", "Cash Gift"), ("in_kind", "In Kind Gift")],
+                        verbose_name="gift type",
+                    ),
+                ),
+                ("gift_id", models.BigIntegerField()),
+                (
+                    "registry",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="all_gifts",
+                        to="wedding_gifts.weddinggiftregistry",
+                    ),
+                ),
+                ("name", models.CharField(max_length=128, verbose_name="name")),
+                ("price", models.PositiveIntegerField(verbose_name="price")),
+                ("receipt_date", models.DateField(verbose_name="date of receipt")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("appliance", "Appliance"),
+                            ("kitchenware", "Kitchenware"),
+                            ("furniture", "Furniture"),
+                            ("decor", "Decor"),
+                            ("bedding", "Bedding"),
+                            ("food_or_drink", "Food or Drink"),
+                            ("daily_goods", "Daily Goods"),
+                            ("other", "Other"),
+                        ],
+                        null=True,
+                        verbose_name="Gift Kind",
+                    ),
+                ),
+                (
+                    "kind_detail",
+                    models.CharField(
+                        max_length=128, null=True, verbose_name="Gift Detail"
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "wedding_gifts_allgift",
+                "managed": False,
+            },
+        ),
+        migrations.RunSQL(
+            sql=ALL_GIFT_VIEW_SQL,
+            reverse_sql="DROP VIEW wedding_gifts_allgift",
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:38
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wedding_gifts", "0013_allgift"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inkindgift",
+            name="search_vector",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.SearchVector(
+                    "name", "kind_detail", config="simple"
+                ),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inkindgift",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="inkindgift_search_vector"
+            ),
+        ),
+    ]
@@ -0,0 +1,270 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:44
+
+import re
+import unicodedata
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+import kara.base.hangul
+
+# Same as 0013_allgift, with the name_search column of the gifts appended.
+ALL_GIFT_VIEW_SQL = """
+CREATE OR REPLACE VIEW wedding_gifts_allgift AS
+SELECT
+    'cash:' || id AS key,
+    'cash' AS gift_type,
+    id AS gift_id,
+    registry_id,
+    name,
+    price,
+    receipt_date,
+    CAST(NULL AS varchar) AS kind,
+    CAST(NULL AS varchar(128)) AS kind_detail,
+    name_search
+FROM wedding_gifts_cashgift
+UNION ALL
+SELECT
+    'in_kind:' || id,
+    'in_kind',
+    id,
+    registry_id,
+    name,
+    price,
+    receipt_date,
+    kind,
+    kind_detail,
+    name_search
+FROM wedding_gifts_inkindgift
+"""
+
+PREVIOUS_ALL_GIFT_VIEW_SQL = """
+DROP VIEW wedding_gifts_allgift;
+CREATE VIEW wedding_gifts_allgift AS
+SELECT
+    'cash:' || id AS key,
+    'cash' AS gift_type,
+    id AS gift_id,
+    registry_id,
+    name,
+    price,
+    receipt_date,
+    CAST(NULL AS varchar) AS kind,
+    CAST(NULL AS varchar(128)) AS kind_detail
+FROM wedding_gifts_cashgift
+UNION ALL
+SELECT
+    'in_kind:' || id,
+    'in_kind',
+    id,
+    registry_id,
+    name,
+    price,
+    receipt_date,
+    kind,
+    kind_detail
+FROM wedding_gifts_inkindgift
+"""
+
+
+# The name search vectors as computed by kara.base.hangul when this migration
+# was written, frozen so that replaying it always stores the same vectors.
+SYLLABLE_FIRST = 0xAC00
+SYLLABLE_LAST = 0xD7A3
+JUNGSEONG_CNT = 21
+JONGSEONG_CNT = 28
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+# Compound vowels and final consonants are split into the jamo typed to
+# compose them, so a syllable being typed is a prefix of the whole syllable
+# (e.g. 호 while typing 화, 달 while typing 닭).
+JUNGSEONG = [
+    *"ㅏㅐㅑㅒㅓㅔㅕㅖㅗ",
+    "ㅗㅏ",
+    "ㅗㅐ",
+    "ㅗㅣ",
+    *"ㅛㅜ",
+    "ㅜㅓ",
+    "ㅜㅔ",
+    "ㅜㅣ",
+    *"ㅠㅡ",
+    "ㅡㅣ",
+    "ㅣ",
+]
+JONGSEONG = [
+    "",
+    *"ㄱㄲ",
+    "ㄱㅅ",
+    "ㄴ",
+    "ㄴㅈ",
+    "ㄴㅎ",
+    *"ㄷㄹ",
+    "ㄹㄱ",
+    "ㄹㅁ",
+    "ㄹㅂ",
+    "ㄹㅅ",
+    "ㄹㅌ",
+    "ㄹㅍ",
+    "ㄹㅎ",
+    *"ㅁㅂ",
+    "ㅂㅅ",
+    *"ㅅㅆㅇㅈㅊㅋㅌㅍㅎ",
+]
+COMPOUND_JAMO = {
+    "ㄳ": "ㄱㅅ",
+    "ㄵ": "ㄴㅈ",
+    "ㄶ": "ㄴㅎ",
+    "ㄺ": "ㄹㄱ",
+    "ㄻ": "ㄹㅁ",
+    "ㄼ": "ㄹㅂ",
+    "ㄽ": "ㄹㅅ",
+    "ㄾ": "ㄹㅌ",
+    "ㄿ": "ㄹㅍ",
+    "ㅀ": "ㄹㅎ",
+    "ㅄ": "ㅂㅅ",
+    "ㅘ": "ㅗㅏ",
+    "ㅙ": "ㅗㅐ",
+    "ㅚ": "ㅗㅣ",
+    "ㅝ": "ㅜㅓ",
+    "ㅞ": "ㅜㅔ",
+    "ㅟ": "ㅜㅣ",
+    "ㅢ": "ㅡㅣ",
+}
+# Words are runs of letters and digits, split like the PostgreSQL text
+# search parser splits them, so tsquery words match the stored lexemes.
+WORD_RE = re.compile(r"[^\W_]+")
+# Weights of the lexemes in the search vector.
+JAMO_WEIGHT = "A"
+CHOSEONG_WEIGHT = "B"
+
+
+def is_syllable(char):
+    return SYLLABLE_FIRST <= ord(char) <= SYLLABLE_LAST
+
+
+def get_words(text):
+    return WORD_RE.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def decompose(text):
+    """
+    Returns the text with Hangul syllables and compound jamo decomposed into
+    the jamo typed on a keyboard, e.g. "김민수" -> "ㄱㅣㅁㅁㅣㄴㅅㅜ".
+    """
+    jamo = []
+    for char in text:
+        if is_syllable(char):
+            code = ord(char) - SYLLABLE_FIRST
+            jamo.append(CHOSEONG[code // (JUNGSEONG_CNT * JONGSEONG_CNT)])
+            jamo.append(JUNGSEONG[code // JONGSEONG_CNT % JUNGSEONG_CNT])
+            jamo.append(JONGSEONG[code % JONGSEONG_CNT])
+        else:
+            jamo.append(COMPOUND_JAMO.get(char, char))
+    return "".join(jamo)
+
+
+def get_choseong(text):
+    """
+    Returns the initial consonants (choseong) of the Hangul syllables of
+    the text, other characters are kept, e.g. "김민수" -> "ㄱㅁㅅ".
+    """
+    return "".join(
+        (
+            CHOSEONG[(ord(char) - SYLLABLE_FIRST) // (JUNGSEONG_CNT * JONGSEONG_CNT)]
+            if is_syllable(char)
+            else char
+        )
+        for char in text
+    )
+
+
+def get_search_lexemes(text):
+    """
+    Returns the (lexeme, weight) pairs indexed for the text: for each word,
+    the decomposed jamo of each of its suffixes and, if the word contains
+    Hangul syllables, the choseong of each of its suffixes.
+
+    Since every suffix is indexed, a prefix match on the lexemes matches any
+    part of a word, e.g. "ㅁㅣㄴ" (민) and "ㅁㅅ" match 김민수.
+    """
+    lexemes = {}
+    for word in get_words(text):
+        has_syllables = any(is_syllable(char) for char in word)
+        for i in range(len(word)):
+            lexemes.setdefault((decompose(word[i:]), JAMO_WEIGHT))
+            if has_syllables:
+                lexemes.setdefault((get_choseong(word[i:]), CHOSEONG_WEIGHT))
+    return list(lexemes)
+
+
+def to_search_vector(text):
+    """
+    Returns the tsvector literal of the search lexemes of the text.
+    Lexemes are made of letters and digits only, so they need no escaping.
+    """
+    return " ".join(
+        f"'{lexeme}':{position}{weight}"
+        for position, (lexeme, weight) in enumerate(get_search_lexemes(text), 1)
+    )
+
+
+def compute_name_search(apps, schema_editor):
+    # bulk_update() doesn't call HangulSearchVectorField.pre_save().
+    for model_name in ("CashGift", "InKindGift"):
+        model = apps.get_model("wedding_gifts", model_name)
+        gifts = []
+        for gift in model.objects.only("pk", "name").iterator(chunk_size=1000):
+            gift.name_search = to_search_vector(gift.name)
+            gifts.append(gift)
+            if len(gifts) == 1000:
+                model.objects.bulk_update(gifts, ["name_search"])
+                gifts = []
+        model.objects.bulk_update(gifts, ["name_search"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wedding_gifts", "0014_inkindgift_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cashgift",
+            name="name_search",
+            field=kara.base.hangul.HangulSearchVectorField(
+                default="", editable=False, source="name"
+            ),
+        ),
+        migrations.AddField(
+            model_name="inkindgift",
+            name="name_search",
+            field=kara.base.hangul.HangulSearchVectorField(
+                default="", editable=False, source="name"
+            ),
+        ),
+        migrations.RunPython(
+            compute_name_search, reverse_code=migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name="cashgift",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name_search"], name="cashgift_name_search"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inkindgift",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name_search"], name="inkindgift_name_search"
+            ),
+        ),
+        migrations.AddField(
+            model_name="allgift",
+            name="name_search",
+            field=django.contrib.postgres.search.SearchVectorField(),
+        ),
+        migrations.RunSQL(
+            sql=ALL_GIFT_VIEW_SQL,
+            reverse_sql=PREVIOUS_ALL_GIFT_VIEW_SQL,
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:47
+
+from django.db import migrations, models
+
+import kara.base.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wedding_gifts", "0015_gift_name_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cashgift",
+            index=models.Index(
+                models.F("registry"),
+                kara.base.search.NormalizedText("name"),
+                name="cashgift_registry_name",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inkindgift",
+            index=models.Index(
+                models.F("registry"),
+                kara.base.search.NormalizedText("name"),
+                name="inkindgift_registry_name",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 21:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wedding_gifts", "0016_gift_registry_name"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="cashgift",
+            name="cashgift_registry_date",
+        ),
+        migrations.RemoveIndex(
+            model_name="inkindgift",
+            name="inkindgift_registry_date",
+        ),
+        migrations.AddIndex(
+            model_name="cashgift",
+            index=models.Index(
+                fields=["registry", "receipt_date", "id"], name="cashgift_registry_date"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inkindgift",
+            index=models.Index(
+                fields=["registry", "receipt_date", "id"],
+                name="inkindgift_registry_date",
+            ),
+        ),
+    ]
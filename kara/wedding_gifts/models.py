@@ -1,17 +1,24 @@
 import random
 import uuid
+from functools import reduce
+from operator import or_
 from pathlib import Path
 from random import randint
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import RegexValidator
-from django.db import models
-from django.db.models.functions import Lower
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Lower
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from kara.accounts.models import User
+from kara.base.hangul import HangulSearchVectorField
+from kara.base.search import NormalizedText
 
 WEDDING_GIFT_REGISTRY_IMAGE_ROOT = Path(
     f"{settings.MAIN_DIR}/wedding_gifts/static/wedding_gifts/img/registry"
@@ -28,6 +35,69 @@ def get_random_registry_image():
     return f"wedding_gifts/img/registry/{random_file}"
 
 
+class WeddingGiftRegistryQuerySet(models.QuerySet):
+    @staticmethod
+    def get_gift_stats_expressions():
+        """
+        Returns subqueries computing the gift statistics fields of a registry
+        (see WeddingGiftRegistry.STATS_FIELDS) from its gifts.
+
+        Each relation is aggregated by its own subquery. Joining both gift
+        tables in one aggregate would produce a row per cash gift and in-kind
+        gift pair, which Count(distinct=True) then has to collapse.
+        """
+        expressions = {}
+        for model in (CashGift, InKindGift):
+            gifts = (
+                model._base_manager.filter(registry=OuterRef("pk"))
+                .order_by()
+                .values("registry")
+            )
+            expressions[model.registry_cnt_field] = Coalesce(
+                Subquery(gifts.annotate(value=Count("pk")).values("value")), 0
+            )
+            expressions[model.registry_total_price_field] = Coalesce(
+                Subquery(gifts.annotate(value=Sum("price")).values("value")), 0
+            )
+        return expressions
+
+    def with_gift_stats(self):
+        """
+        Annotates the gift statistics computed from the gifts, prefixed with
+        "live_" (e.g. live_cash_gift_cnt).
+        Views read the stored fields instead; this is the reference they are
+        checked against.
+        """
+        return self.annotate(
+            **{
+                f"live_{field}": expression
+                for field, expression in self.get_gift_stats_expressions().items()
+            }
+        )
+
+    def with_outdated_gift_stats(self):
+        """
+        Filters the registries whose stored gift statistics are wrong.
+        """
+        return self.with_gift_stats().filter(
+            reduce(
+                or_,
+                (
+                    ~Q(**{field: F(f"live_{field}")})
+                    for field in WeddingGiftRegistry.STATS_FIELDS
+                ),
+            )
+        )
+
+    def rebuild_gift_stats(self):
+        """
+        Recomputes the stored gift statistics.
+        The values are computed by the UPDATE statement itself, so gifts
+        recorded meanwhile are counted either way.
+        """
+        return self.update(**self.get_gift_stats_expressions())
+
+
 class WeddingGiftRegistry(models.Model):
     GROOM = "Groom"
     BRIDE = "Bride"
@@ -59,10 +129,64 @@ class WeddingGiftRegistry(models.Model):
     )
     wedding_date = models.DateField(verbose_name=_("wedding date"))
     updated_at = models.DateField(auto_now=True)
+    # Gift statistics, updated along with the gifts (see Gift.update_registry_stats()).
+    # The rebuild_registry_stats command recomputes them.
+    cash_gift_cnt = models.IntegerField(default=0, editable=False)
+    in_kind_gift_cnt = models.IntegerField(default=0, editable=False)
+    cash_gift_total_price = models.BigIntegerField(default=0, editable=False)
+    in_kind_gift_total_price = models.BigIntegerField(default=0, editable=False)
+
+    objects = WeddingGiftRegistryQuerySet.as_manager()
+
+    STATS_FIELDS = (
+        "cash_gift_cnt",
+        "in_kind_gift_cnt",
+        "cash_gift_total_price",
+        "in_kind_gift_total_price",
+    )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # The statistics are only updated in the database, so that saving
+            # a registry doesn't overwrite gifts recorded in the meantime.
+            # Deferred fields aren't saved, as by Model.save().
+            deferred_fields = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.STATS_FIELDS
+                and field.attname not in deferred_fields
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def total_price(self):
+        return self.cash_gift_total_price + self.in_kind_gift_total_price
+
+    @property
+    def total_gift_cnt(self):
+        return self.cash_gift_cnt + self.in_kind_gift_cnt
 
     def get_absolute_url(self):
         return reverse("detail_registry", kwargs={"pk": self.pk})
 
+    @classmethod
+    def get_data_version_key(cls, pk):
+        """
+        Returns the data version key of a registry (see kara.base.cache).
+        It is bumped whenever the registry, its gifts or their tags change.
+        """
+        return f"{cls._meta.label_lower}.{pk}"
+
+    @classmethod
+    def get_owner_data_version_key(cls, owner_id):
+        """
+        Returns the data version key of all registries of an owner.
+        It is bumped along with the data version of any of them.
+        """
+        return f"{cls._meta.label_lower}.owner.{owner_id}"
+
 
 def get_random_hex_color():
     """
@@ -110,8 +234,13 @@ class Gift(models.Model):
     registry = models.ForeignKey(
         WeddingGiftRegistry,
         on_delete=models.CASCADE,
+        # Covered by the composite indexes below.
+        db_index=False,
     )
     name = models.CharField(max_length=128, verbose_name=_("name"))
+    # Initial consonants and jamo of the name, searched by GiftTable
+    # (see HangulSearch).
+    name_search = HangulSearchVectorField(source="name", default="", editable=False)
     price = models.PositiveIntegerField(verbose_name=_("price"))
     receipt_date = models.DateField(
         default=timezone.now, verbose_name=_("date of receipt")
@@ -122,17 +251,75 @@ class Gift(models.Model):
         verbose_name=_("tags"),
     )
 
+    # Registry fields holding the count and total price of the gifts.
+    registry_cnt_field = None
+    registry_total_price_field = None
+    # Gift type of the daily rollups (see GiftDailyRollup).
+    gift_type = None
+
     class Meta:
         abstract = True
+        # Gifts are always listed per registry (see GiftTable.ordering).
+        indexes = [
+            models.Index(fields=["registry", "-id"], name="%(class)s_registry_id_desc"),
+            models.Index(fields=["registry", "price"], name="%(class)s_registry_price"),
+            # Also orders the gifts of a day, see AllGift.
+            models.Index(
+                fields=["registry", "receipt_date", "id"],
+                name="%(class)s_registry_date",
+            ),
+            GinIndex(fields=["name_search"], name="%(class)s_name_search"),
+            # Exact name searches (see GiftTable.search_fields).
+            models.Index(
+                F("registry"), NormalizedText("name"), name="%(class)s_registry_name"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "name_search"}
+        # The registry statistics are updated by signals, in the same
+        # transaction as the gift.
+        with transaction.atomic(using=router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def update_registry_stats(cls, registry_id, cnt, price):
+        """
+        Adds to the gift count and total price of a registry.
+        The update is computed by the database, so concurrent writes
+        are never lost.
+        """
+        if not cnt and not price:
+            return
+        WeddingGiftRegistry._base_manager.filter(pk=registry_id).update(
+            **{
+                cls.registry_cnt_field: F(cls.registry_cnt_field) + cnt,
+                cls.registry_total_price_field: (
+                    F(cls.registry_total_price_field) + price
+                ),
+            }
+        )
+
+    @classmethod
+    def update_daily_rollup(cls, registry_id, date, cnt, price):
+        GiftDailyRollup.add(registry_id, date, cls.gift_type, cnt, price)
 
 
 class CashGift(Gift):
+    registry_cnt_field = "cash_gift_cnt"
+    registry_total_price_field = "cash_gift_total_price"
+    gift_type = "cash"
 
-    class Meta:
+    class Meta(Gift.Meta):
         default_related_name = "cash_gifts"
 
 
 class InKindGift(Gift):
+    registry_cnt_field = "in_kind_gift_cnt"
+    registry_total_price_field = "in_kind_gift_total_price"
+    gift_type = "in_kind"
     KIND_CHOICES = [
         ("appliance", _("Appliance")),
         ("kitchenware", _("Kitchenware")),
@@ -149,9 +336,19 @@ class InKindGift(Gift):
     kind_detail = models.CharField(
         max_length=128, null=True, verbose_name=_("Gift Detail")
     )
+    # Words of the name and detail, searched by InKindGiftTable.
+    search_vector = models.GeneratedField(
+        expression=SearchVector("name", "kind_detail", config="simple"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
-    class Meta:
+    class Meta(Gift.Meta):
         default_related_name = "in_kind_gifts"
+        indexes = [
+            *Gift.Meta.indexes,
+            GinIndex(fields=["search_vector"], name="inkindgift_search_vector"),
+        ]
         # kind must have a detail when it is set to "other"
         constraints = [
             models.CheckConstraint(
@@ -162,3 +359,170 @@ class InKindGift(Gift):
         ]
         verbose_name = _("In-kind gift")
         verbose_name_plural = _("In-kind gifts")
+
+
+GIFT_TYPES = (
+    (CashGift.gift_type, _("Cash Gift")),
+    (InKindGift.gift_type, _("In Kind Gift")),
+)
+
+
+class GiftDailyRollup(models.Model):
+    """
+    Number and total price of the gifts of a registry received on a day,
+    per gift type. Time series (e.g. gifts per day) read these rows instead
+    of the gifts.
+
+    The rollups are updated along with the gifts (see
+    Gift.update_daily_rollup()), the rebuild_gift_daily_rollups command
+    recomputes them.
+    """
+
+    registry = models.ForeignKey(
+        WeddingGiftRegistry,
+        on_delete=models.CASCADE,
+        related_name="daily_rollups",
+        # Covered by the unique constraint below.
+        db_index=False,
+    )
+    date = models.DateField()
+    gift_type = models.CharField(max_length=16, choices=GIFT_TYPES)
+    # Side of the registry, copied so sides compare without a join.
+    side = models.CharField(choices=WeddingGiftRegistry.SIDE)
+    cnt = models.IntegerField(default=0)
+    total_price = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["registry", "date", "gift_type", "side"],
+                name="unique_gift_daily_rollup",
+            )
+        ]
+
+    @classmethod
+    def add(cls, registry_id, date, gift_type, cnt, price):
+        """
+        Adds to the gift count and total price of a registry on a day.
+        The update is computed by the database, the row is created by the
+        first gift of the day.
+        """
+        if not cnt and not price:
+            return
+        date = cls._meta.get_field("date").to_python(date)
+        rollups = cls._base_manager.filter(
+            registry_id=registry_id, date=date, gift_type=gift_type
+        )
+        increments = {
+            "cnt": F("cnt") + cnt,
+            "total_price": F("total_price") + price,
+        }
+        if rollups.update(**increments):
+            if cnt < 0:
+                # No gifts left on that day.
+                rollups.filter(cnt=0).delete()
+            return
+        if cnt <= 0:
+            # There is no rollup to subtract from, e.g. the gift was bulk
+            # created (see the rebuild_gift_daily_rollups command).
+            return
+        side = WeddingGiftRegistry._base_manager.values_list("side", flat=True).get(
+            pk=registry_id
+        )
+        try:
+            with transaction.atomic(using=router.db_for_write(cls)):
+                cls._base_manager.create(
+                    registry_id=registry_id,
+                    date=date,
+                    gift_type=gift_type,
+                    side=side,
+                    cnt=cnt,
+                    total_price=price,
+                )
+        except IntegrityError:
+            # Created by a concurrent gift of the same day.
+            rollups.update(**increments)
+
+    @classmethod
+    def compute(cls, registries):
+        """
+        Returns the rollups of the registries computed from their gifts,
+        as unsaved instances.
+        """
+        for model in (CashGift, InKindGift):
+            rows = (
+                model._base_manager.filter(registry__in=registries)
+                .order_by()
+                .values("registry_id", "receipt_date", "registry__side")
+                .annotate(cnt=Count("pk"), total_price=Sum("price"))
+            )
+            for row in rows:
+                yield cls(
+                    registry_id=row["registry_id"],
+                    date=row["receipt_date"],
+                    gift_type=model.gift_type,
+                    side=row["registry__side"],
+                    cnt=row["cnt"],
+                    total_price=row["total_price"],
+                )
+
+    @classmethod
+    def rebuild(cls, registries):
+        """
+        Replaces the rollups of the registries with the ones computed from
+        their gifts.
+        The registries are locked first: gifts saved meanwhile update their
+        registry statistics, so they wait and are added to the new rollups.
+        """
+        with transaction.atomic(using=router.db_for_write(cls)):
+            pks = list(
+                WeddingGiftRegistry._base_manager.select_for_update()
+                .filter(pk__in=registries)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            cls._base_manager.filter(registry__in=pks).delete()
+            cls._base_manager.bulk_create(cls.compute(pks), batch_size=1000)
+
+
+class AllGift(models.Model):
+    """
+    Cash and in-kind gifts in a single list, read from a database view that
+    unions both gift tables (UNION ALL) with the gift type as discriminator.
+
+    Filters, ordering, counting and slicing are applied by the database to
+    both tables, so a mixed list (e.g. all gifts of a registry, or everything
+    a guest gave) is a single query using the gift indexes. Unlike
+    QuerySet.union(), the results can still be filtered, e.g. by a search
+    or a keyset pagination cursor.
+
+    The view is read-only, see get_gift() for the gift itself.
+    """
+
+    # Unique across both tables, e.g. "cash:42".
+    key = models.CharField(primary_key=True)
+    gift_type = models.CharField(choices=GIFT_TYPES, verbose_name=_("gift type"))
+    gift_id = models.BigIntegerField()
+    registry = models.ForeignKey(
+        WeddingGiftRegistry, on_delete=models.DO_NOTHING, related_name="all_gifts"
+    )
+    name = models.CharField(max_length=128, verbose_name=_("name"))
+    price = models.PositiveIntegerField(verbose_name=_("price"))
+    receipt_date = models.DateField(verbose_name=_("date of receipt"))
+    # Only set for in-kind gifts.
+    kind = models.CharField(
+        choices=InKindGift.KIND_CHOICES, null=True, verbose_name=_("Gift Kind")
+    )
+    kind_detail = models.CharField(
+        max_length=128, null=True, verbose_name=_("Gift Detail")
+    )
+    name_search = SearchVectorField()
+
+    gift_models = {model.gift_type: model for model in (CashGift, InKindGift)}
+
+    class Meta:
+        managed = False
+        db_table = "wedding_gifts_allgift"
+
+    def get_gift(self):
+        return self.gift_models[self.gift_type]._default_manager.get(pk=self.gift_id)
@@ -0,0 +1,118 @@
+import bisect
+from array import array
+
+from django.core.cache import cache
+
+from kara.base.cache import get_data_version, make_cache_key
+
+from .insights import PRICE_BANDS
+from .models import CashGift, InKindGift, WeddingGiftRegistry
+
+PERCENTILES = (10, 25, 50, 75, 90, 95, 99)
+# Prices farther than this many interquartile ranges below the first or above
+# the third quartile are outliers (Tukey's fences).
+OUTLIER_IQR_FACTOR = 1.5
+PRICE_FETCH_CHUNK_SIZE = 10000
+
+
+def fetch_prices(**filters):
+    """
+    Returns the sorted prices of the cash and in-kind gifts matching the
+    filters as an array of machine integers.
+
+    The database sorts the prices (using the (registry, price) indexes) and
+    only the prices are transferred. The array takes 8 bytes per gift,
+    instead of a Python int (or a model instance) per gift.
+    """
+    prices = [
+        model.objects.filter(**filters).values_list("price", flat=True)
+        for model in (CashGift, InKindGift)
+    ]
+    queryset = prices[0].union(prices[1], all=True).order_by("price")
+    return array("l", queryset.iterator(chunk_size=PRICE_FETCH_CHUNK_SIZE))
+
+
+def percentile(prices, percent):
+    """
+    Returns the percentile of sorted prices, interpolated linearly between
+    the closest ranks (like NumPy's default method).
+    """
+    position = (len(prices) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(prices) - 1)
+    return prices[lower] + (prices[upper] - prices[lower]) * (position - lower)
+
+
+def get_price_distribution(prices):
+    """
+    Returns the distribution of sorted prices (see fetch_prices()): the mean,
+    the percentiles, the number of prices per price band and the outliers.
+    Returns None if there are no prices.
+
+    Nothing loops over the prices in Python: percentiles are read by index
+    and the histogram and outliers are counted by bisecting the sorted array.
+    """
+    if not prices:
+        return None
+    cnt = len(prices)
+    percentiles = {percent: percentile(prices, percent) for percent in PERCENTILES}
+    iqr = percentiles[75] - percentiles[25]
+    lower_fence = percentiles[25] - OUTLIER_IQR_FACTOR * iqr
+    upper_fence = percentiles[75] + OUTLIER_IQR_FACTOR * iqr
+    band_ends = [bisect.bisect_left(prices, bound) for bound in PRICE_BANDS]
+    band_starts = [0, *band_ends]
+    return {
+        "cnt": cnt,
+        "min": prices[0],
+        "max": prices[-1],
+        "mean": sum(prices) / cnt,
+        "median": percentiles[50],
+        "percentiles": percentiles,
+        # Number of prices per price band, as in the insights.
+        "histogram": [
+            end - start for start, end in zip(band_starts, [*band_ends, cnt])
+        ],
+        "lower_fence": lower_fence,
+        "upper_fence": upper_fence,
+        "low_outlier_cnt": bisect.bisect_left(prices, lower_fence),
+        "high_outlier_cnt": cnt - bisect.bisect_right(prices, upper_fence),
+    }
+
+
+def is_outlier(price, distribution):
+    return not (distribution["lower_fence"] <= price <= distribution["upper_fence"])
+
+
+def get_cached_distribution(cache_key, **filters):
+    # Wrapped so registries without gifts (None) are cached too.
+    cached = cache.get(cache_key)
+    if cached is None:
+        cached = {"distribution": get_price_distribution(fetch_prices(**filters))}
+        cache.set(cache_key, cached, timeout=None)
+    return cached["distribution"]
+
+
+def get_registry_price_distribution(registry_pk):
+    """
+    Returns the price distribution of the registry gifts, cached until the
+    registry or its gifts change.
+    """
+    cache_key = make_cache_key(
+        "kara.price_distribution.registry",
+        str(registry_pk),
+        get_data_version(WeddingGiftRegistry.get_data_version_key(registry_pk)),
+    )
+    return get_cached_distribution(cache_key, registry_id=registry_pk)
+
+
+def get_owner_price_distribution(owner_pk):
+    """
+    Returns the price distribution of the gifts of all the owner's registries,
+    cached until one of them or their gifts change.
+    """
+    cache_key = make_cache_key(
+        "kara.price_distribution.owner",
+        owner_pk,
+        get_data_version(WeddingGiftRegistry.get_owner_data_version_key(owner_pk)),
+    )
+    return get_cached_distribution(cache_key, registry__owner_id=owner_pk)
@@ -0,0 +1,190 @@
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from kara.base.cache import bump_data_version
+
+from .models import (
+    CashGift,
+    Gift,
+    GiftDailyRollup,
+    GiftTag,
+    InKindGift,
+    WeddingGiftRegistry,
+)
+
+# The (name, attname) of the gift fields the registry statistics depend on.
+REGISTRY_STATS_FIELDS = (
+    ("registry", "registry_id"),
+    ("price", "price"),
+    ("receipt_date", "receipt_date"),
+)
+
+
+def bump_registry_data_version(*registries):
+    """
+    Bumps the data versions of the registries and of their owners.
+    """
+    bump_data_version(
+        *(WeddingGiftRegistry.get_data_version_key(r.pk) for r in registries),
+        *{
+            WeddingGiftRegistry.get_owner_data_version_key(r.owner_id)
+            for r in registries
+        },
+    )
+
+
+def bump_owner_registries_data_version(owner_id):
+    bump_registry_data_version(
+        *WeddingGiftRegistry.objects.filter(owner_id=owner_id).only("pk", "owner_id")
+    )
+
+
+def get_saved_registry_stats(instance, registry_stats, update_fields):
+    """
+    Returns the registry, price and date of receipt the gift is counted in
+    once saved: the instance values of the saved fields, and the previous
+    values (registry_stats) of the fields left out of update_fields.
+    """
+    if update_fields is None:
+        return instance.registry_id, instance.price, instance.receipt_date
+    return tuple(
+        getattr(instance, attname) if {name, attname} & update_fields else value
+        for (name, attname), value in zip(REGISTRY_STATS_FIELDS, registry_stats)
+    )
+
+
+def is_deleted_with_registry(origin):
+    """
+    Returns whether gifts are deleted along with their registry, i.e. the
+    deletion started from something else than gifts (e.g. a registry or
+    its owner) and cascaded to them.
+    """
+    if origin is None:
+        # The gift was saved.
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return not issubclass(model, Gift)
+
+
+@receiver(pre_save, sender=CashGift)
+@receiver(pre_save, sender=InKindGift)
+def load_gift_registry_stats(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Loads the registry, price and date of receipt the gift is counted in
+    before it is updated, unless none of them is saved.
+    The row is locked until the statistics are updated (see Gift.save()).
+    """
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not any(
+        {name, attname} & update_fields for name, attname in REGISTRY_STATS_FIELDS
+    ):
+        return
+    instance._registry_stats = (
+        sender._base_manager.select_for_update()
+        .filter(pk=instance.pk)
+        .values_list("registry_id", "price", "receipt_date")
+        .first()
+    )
+
+
+@receiver(post_save, sender=CashGift)
+@receiver(post_save, sender=InKindGift)
+def update_registry_stats_on_save(
+    sender, instance, created, raw=False, update_fields=None, **kwargs
+):
+    if raw:
+        return
+    registry_stats = instance.__dict__.pop("_registry_stats", None)
+    if created:
+        sender.update_registry_stats(instance.registry_id, 1, instance.price)
+        sender.update_daily_rollup(
+            instance.registry_id, instance.receipt_date, 1, instance.price
+        )
+        return
+    if registry_stats is None:
+        # None of the fields the statistics depend on was saved.
+        return
+    registry_id, price, receipt_date = registry_stats
+    new_registry_id, new_price, new_receipt_date = get_saved_registry_stats(
+        instance, registry_stats, update_fields
+    )
+    if registry_id == new_registry_id:
+        sender.update_registry_stats(registry_id, 0, new_price - price)
+    else:
+        sender.update_registry_stats(registry_id, -1, -price)
+        sender.update_registry_stats(new_registry_id, 1, new_price)
+    if (registry_id, receipt_date) == (new_registry_id, new_receipt_date):
+        sender.update_daily_rollup(registry_id, receipt_date, 0, new_price - price)
+    else:
+        sender.update_daily_rollup(registry_id, receipt_date, -1, -price)
+        sender.update_daily_rollup(new_registry_id, new_receipt_date, 1, new_price)
+
+
+@receiver(post_delete, sender=CashGift)
+@receiver(post_delete, sender=InKindGift)
+def update_registry_stats_on_delete(sender, instance, origin=None, **kwargs):
+    if is_deleted_with_registry(origin):
+        return
+    sender.update_registry_stats(instance.registry_id, -1, -instance.price)
+    sender.update_daily_rollup(
+        instance.registry_id, instance.receipt_date, -1, -instance.price
+    )
+
+
+@receiver(post_save, sender=CashGift)
+@receiver(post_save, sender=InKindGift)
+@receiver(post_delete, sender=CashGift)
+@receiver(post_delete, sender=InKindGift)
+def bump_gift_data_version(sender, instance, origin=None, **kwargs):
+    """
+    Invalidates cached data (e.g. table counts) derived from the gifts.
+    """
+    bump_data_version(sender._meta.label_lower)
+    if is_deleted_with_registry(origin):
+        # Bumped once by the registry deletion instead of once per gift.
+        return
+    bump_registry_data_version(instance.registry)
+
+
+@receiver(m2m_changed, sender=CashGift.tags.through)
+@receiver(m2m_changed, sender=InKindGift.tags.through)
+def bump_gift_tags_data_version(sender, instance, action, reverse, model, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        # Gifts were added to or removed from a tag.
+        gift_model = model
+        bump_owner_registries_data_version(instance.owner_id)
+    else:
+        gift_model = type(instance)
+        bump_registry_data_version(instance.registry)
+    bump_data_version(gift_model._meta.label_lower)
+
+
+@receiver(post_save, sender=GiftTag)
+@receiver(post_delete, sender=GiftTag)
+def bump_tag_data_version(sender, instance, **kwargs):
+    # Tags are shared by all registries of their owner.
+    bump_data_version(sender._meta.label_lower)
+    bump_owner_registries_data_version(instance.owner_id)
+
+
+@receiver(post_save, sender=WeddingGiftRegistry)
+def update_daily_rollup_side(
+    sender, instance, created, raw=False, update_fields=None, **kwargs
+):
+    if created or raw:
+        return
+    if update_fields is not None and "side" not in update_fields:
+        return
+    GiftDailyRollup._base_manager.filter(registry=instance).exclude(
+        side=instance.side
+    ).update(side=instance.side)
+
+
+@receiver(post_save, sender=WeddingGiftRegistry)
+@receiver(post_delete, sender=WeddingGiftRegistry)
+def bump_registry_data_version_on_change(sender, instance, **kwargs):
+    bump_registry_data_version(instance)
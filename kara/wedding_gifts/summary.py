@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import RowNumber
+
+from kara.base.cache import get_data_version, make_cache_key
+
+from .models import WeddingGiftRegistry
+
+# Context keys of the summary returned by get_registry_summary().
+REGISTRY_SUMMARY_KEYS = (
+    "my_registry_cnt",
+    "my_cash_gift_cnt",
+    "my_in_kind_gift_cnt",
+    "top_gift_cnt_registry",
+    "top_total_price_registry",
+)
+
+
+def get_registry_summary(owner):
+    """
+    Returns the dashboard summary of the owner's registries: the number of
+    registries and gifts, the registry with the most gifts and the registry
+    with the highest total price.
+
+    Everything is computed by a single query: window functions add the
+    totals and the rankings to each registry row, and only the top ranked
+    rows are fetched.
+    The summary is cached until one of the owner's registries or their
+    gifts changes.
+    """
+    cache_key = make_cache_key(
+        "kara.registry_summary",
+        owner.pk,
+        get_data_version(WeddingGiftRegistry.get_owner_data_version_key(owner.pk)),
+    )
+    summary = cache.get(cache_key)
+    if summary is not None:
+        return summary
+    total_gift_cnt = F("cash_gift_cnt") + F("in_kind_gift_cnt")
+    total_price = F("cash_gift_total_price") + F("in_kind_gift_total_price")
+    registries = (
+        WeddingGiftRegistry.objects.filter(owner=owner)
+        .only("id", "receiver", *WeddingGiftRegistry.STATS_FIELDS)
+        .annotate(
+            my_registry_cnt=Window(Count("pk")),
+            my_cash_gift_cnt=Window(Sum("cash_gift_cnt")),
+            my_in_kind_gift_cnt=Window(Sum("in_kind_gift_cnt")),
+            gift_cnt_rank=Window(RowNumber(), order_by=[total_gift_cnt.desc(), "pk"]),
+            total_price_rank=Window(RowNumber(), order_by=[total_price.desc(), "pk"]),
+        )
+        .filter(Q(gift_cnt_rank=1) | Q(total_price_rank=1))
+    )
+    summary = {
+        "my_registry_cnt": 0,
+        "my_cash_gift_cnt": 0,
+        "my_in_kind_gift_cnt": 0,
+        "top_gift_cnt_registry": None,
+        "top_total_price_registry": None,
+    }
+    for registry in registries:
+        summary["my_registry_cnt"] = registry.my_registry_cnt
+        summary["my_cash_gift_cnt"] = registry.my_cash_gift_cnt
+        summary["my_in_kind_gift_cnt"] = registry.my_in_kind_gift_cnt
+        if registry.gift_cnt_rank == 1:
+            summary["top_gift_cnt_registry"] = registry
+        if registry.total_price_rank == 1:
+            summary["top_total_price_registry"] = registry
+    cache.set(cache_key, summary, timeout=None)
+    return summary
@@ -7,63 +7,159 @@ from django.db.models import (
     ManyToManyField,
     TextField,
 )
+from django.forms import ChoiceField, Select
 from django.template.defaultfilters import truncatewords
+from django.utils.encoding import force_str
 from django.utils.formats import date_format
+from django.utils.hashable import make_hashable
 from django.utils.html import format_html, format_html_join
 from django.utils.translation import gettext_lazy as _
 
+from kara.base.search import FullTextSearch, HangulSearch
 from kara.base.tables import Table, TableSearchForm
 from kara.base.utils import get_contrast_color
 
+from .models import AllGift, CashGift, GiftTag, InKindGift
+
+SEARCH_MODE_VAR = "search_mode"
+
 
 class CashGiftSearchForm(TableSearchForm):
+    SEARCH_MODE_CHOICES = [
+        ("exact", _("Exact name")),
+        ("partial", _("Initial consonants or part of a name")),
+    ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields[settings.SEARCH_VAR].help_text = _(
+            "Looking for someone? Enter a name to find records that match it "
+            "exactly, or search by initial consonants (ㄱㅁㅅ) or part of a name."
+        )
+        self.fields[SEARCH_MODE_VAR] = ChoiceField(
+            required=False,
+            choices=self.SEARCH_MODE_CHOICES,
+            widget=Select(
+                attrs={
+                    "aria-label": _("Search mode"),
+                    "class": "py-2 px-4 border-2 border-kara-strong rounded-md",
+                }
+            ),
+        )
+
+
+class InKindGiftSearchForm(TableSearchForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields[settings.SEARCH_VAR].help_text = _(
-            "Looking for someone? Enter a name to find records that match it exactly."
+            "Enter words of the name or the gift detail. "
+            "The beginning of a word is enough."
         )
 
 
 class GiftTable(Table):
-    search_fields = ["name__iexact"]
+    # Served by the (registry, normalized name) indexes of the gifts.
+    search_fields = ["name__normalized"]
     search_form_class = CashGiftSearchForm
+    # Used in the "partial" search mode of CashGiftSearchForm.
+    partial_search_backend = HangulSearch("name_search")
     int_commas = ["price"]
     ordering = ["price", "receipt_date"]
+    # Read by GiftTableView.
+    view_params = ["gift_type", "scroll"]
+    empty_text = _("No gifts")
+
+    def get_search_backend(self):
+        if self.search_form.cleaned_data.get(SEARCH_MODE_VAR) == "partial":
+            return self.partial_search_backend
+        return super().get_search_backend()
 
-    def display_for_value(self, obj, column):
-        field = obj.__class__._meta.get_field(column)
-        value = super().display_for_value(obj, column)
+    @classmethod
+    def compile_formatter(cls, opts, column):
+        get_value = super().compile_formatter(opts, column)
+        field = opts.get_field(column)
         if isinstance(field, CharField) and field.choices is not None:
-            value = getattr(obj, f"get_{column}_display")()
+            choices = dict(make_hashable(field.flatchoices))
+
+            def format_value(obj):
+                value = get_value(obj)
+                if value is None:
+                    # e.g. the kind of a cash gift in an AllGiftTable.
+                    return ""
+                return force_str(
+                    choices.get(make_hashable(value), value), strings_only=True
+                )
+
         elif isinstance(field, (CharField, TextField)):
-            value = truncatewords(value, 8)
+
+            def format_value(obj):
+                return truncatewords(get_value(obj), 8)
+
         elif isinstance(field, (DateField, DateTimeField)):
-            value = date_format(value)
-        elif column in self.int_commas and isinstance(value, (int, float)):
-            value = intcomma(value)
+
+            def format_value(obj):
+                return date_format(get_value(obj))
+
+        elif column in cls.int_commas:
+
+            def format_value(obj):
+                value = get_value(obj)
+                if isinstance(value, (int, float)):
+                    return intcomma(value)
+                return value
+
         elif isinstance(field, ManyToManyField) and column == "tags":
             # tags field renders all tags as HTML in a ul/li format.
-            tags = value.all()
-            tag_list_html = format_html_join(
-                "\n",
-                '<li style="background-color: {}; color: {};">{}</li>',
-                (
-                    (tag.hex_color, get_contrast_color(tag.hex_color), tag.name)
-                    for tag in tags
-                ),
-            )
-            value = format_html('<ul class="tags">\n{}\n</ul>', tag_list_html)
-            return value
-        return value
+            def format_value(obj):
+                tag_list_html = format_html_join(
+                    "\n",
+                    '<li style="background-color: {}; color: {};">{}</li>',
+                    (
+                        (tag.hex_color, get_contrast_color(tag.hex_color), tag.name)
+                        for tag in get_value(obj).all()
+                    ),
+                )
+                return format_html('<ul class="tags">\n{}\n</ul>', tag_list_html)
+
+        else:
+            format_value = get_value
+        return format_value
 
 
 class CashGiftTable(GiftTable):
+    model = CashGift
     columns = ["name", "price", "receipt_date", "tags"]
 
 
 class InKindGiftTable(GiftTable):
+    model = InKindGift
     columns = ["name", "kind", "kind_detail", "price", "receipt_date", "tags"]
+    # Served by the GIN index of the search vector. search_fields are
+    # only used by the fallback on databases other than PostgreSQL.
+    search_backend = FullTextSearch("search_vector")
+    search_fields = ["name", "kind_detail"]
+    search_form_class = InKindGiftSearchForm
+
+
+class AllGiftTable(GiftTable):
+    # Cash and in-kind gifts in one list (see AllGift).
+    model = AllGift
+    columns = ["gift_type", "name", "kind", "price", "receipt_date"]
+
+
+class CashGiftExportTable(CashGiftTable):
+    # Exports fetch every gift, skip building model instances.
+    row_mode = "tuple"
+
+
+class InKindGiftExportTable(InKindGiftTable):
+    row_mode = "tuple"
+
+
+class AllGiftExportTable(AllGiftTable):
+    row_mode = "tuple"
 
 
 class GiftTagTable(Table):
+    model = GiftTag
     columns = ["name", "description", "hex_color"]
@@ -1,15 +1,22 @@
 from django.template import Library
 from django.utils.translation import gettext_lazy as _
 
+from ..models import WeddingGiftRegistry
+
 register = Library()
 
 
-@register.inclusion_tag("wedding_gifts/components/registry_card.html")
-def registry_card(registry, url_name, htmx=False):
+@register.inclusion_tag(
+    "wedding_gifts/components/registry_card.html", takes_context=True
+)
+def registry_card(context, registry, url_name, htmx=False):
     return {
         "registry": registry,
         "url_name": url_name,
         "htmx": htmx,
+        "selected": str(registry.pk) in context.request.path,
+        # The rendered card is cached until the registry or its gifts change.
+        "version_key": WeddingGiftRegistry.get_data_version_key(registry.pk),
     }
 
 
@@ -0,0 +1,428 @@
+import statistics
+import timeit
+from datetime import date
+
+import pytest
+from django.db import connection
+from django.db.models import Count
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+
+from kara.base.hangul import get_choseong
+from kara.base.search import LookupSearch
+from kara.wedding_gifts.factories import (
+    GiftTagFactory,
+    UserFactory,
+    WeddingGiftRegistryFactory,
+)
+from kara.wedding_gifts.insights import PRICE_BANDS
+from kara.wedding_gifts.models import CashGift, InKindGift, WeddingGiftRegistry
+from kara.wedding_gifts.price_stats import fetch_prices, get_price_distribution
+from kara.wedding_gifts.tables import CashGiftTable, InKindGiftTable
+
+
+class InKindGiftRowTable(InKindGiftTable):
+    row_mode = "tuple"
+
+
+class InKindGiftLookupTable(InKindGiftTable):
+    search_backend = LookupSearch()
+
+
+@pytest.mark.benchmark
+class GiftTableBenchmark(TestCase):
+    """
+    Fetches and formats 1,000 rows x 6 columns of an InKindGiftTable.
+    Run with `pytest -m benchmark -s`.
+    """
+
+    rows = 1000
+    repeat = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        user = UserFactory()
+        registry = WeddingGiftRegistryFactory(owner=user)
+        tags = [
+            GiftTagFactory(owner=user, name="Family", hex_color="#527525"),
+            GiftTagFactory(owner=user, name="Friend", hex_color="#9965BA"),
+        ]
+        gifts = InKindGift.objects.bulk_create(
+            InKindGift(
+                registry=registry,
+                name=f"guest {i}",
+                price=10000 + i,
+                receipt_date=date(2030, 7, 7),
+                kind="appliance",
+                kind_detail="a rice cooker with a very long detail text " * 2,
+            )
+            for i in range(cls.rows)
+        )
+        InKindGift.tags.through.objects.bulk_create(
+            InKindGift.tags.through(inkindgift=gift, gifttag=tag)
+            for gift in gifts
+            for tag in tags
+        )
+
+    def test_display_for_value(self):
+        request = RequestFactory().get("/fake-url/")
+        queryset = InKindGift.objects.order_by("pk")
+        table = InKindGiftTable(request, InKindGift, queryset, list_per_page=self.rows)
+        rows = list(table.result_objects)
+        columns = table.columns
+        self.assertEqual((len(rows), len(columns)), (self.rows, 6))
+
+        def compiled():
+            for row in rows:
+                for column in columns:
+                    table.display_for_value(row, column)
+
+        def per_cell():
+            # Resolves the field and its formatting for every cell.
+            opts = InKindGift._meta
+            for row in rows:
+                for column in columns:
+                    InKindGiftTable.compile_formatter(opts, column)(row)
+
+        compiled_time = min(timeit.repeat(compiled, number=1, repeat=self.repeat))
+        per_cell_time = min(timeit.repeat(per_cell, number=1, repeat=self.repeat))
+        print(
+            f"\n{self.rows} rows x {len(columns)} columns: "
+            f"compiled {compiled_time * 1000:.1f}ms, "
+            f"per cell {per_cell_time * 1000:.1f}ms"
+        )
+        self.assertLess(compiled_time, per_cell_time)
+
+    def test_row_mode(self):
+        request = RequestFactory().get("/fake-url/")
+        queryset = InKindGift.objects.order_by("pk")
+
+        def fetch(table_class):
+            def run():
+                table = table_class(
+                    request, InKindGift, queryset, list_per_page=self.rows
+                )
+                for row in table.result_objects:
+                    for column in table.columns:
+                        table.display_for_value(row, column)
+
+            return run
+
+        model_time = min(
+            timeit.repeat(fetch(InKindGiftTable), number=1, repeat=self.repeat)
+        )
+        tuple_time = min(
+            timeit.repeat(fetch(InKindGiftRowTable), number=1, repeat=self.repeat)
+        )
+        print(
+            f"\n{self.rows} rows fetched and formatted: "
+            f"model rows {model_time * 1000:.1f}ms, "
+            f"tuple rows {tuple_time * 1000:.1f}ms"
+        )
+        self.assertLess(tuple_time, model_time)
+
+    def test_render_table(self):
+        request = RequestFactory().get("/fake-url/")
+        queryset = InKindGift.objects.order_by("pk")
+        table = InKindGiftTable(request, InKindGift, queryset, list_per_page=self.rows)
+        list(table.result_objects)
+        template = Template("{% load tables %}{% table table %}")
+
+        def render(fast_render):
+            def run():
+                table.fast_render = fast_render
+                template.render(Context({"table": table}))
+
+            return run
+
+        fast_time = min(timeit.repeat(render(True), number=1, repeat=self.repeat))
+        loop_time = min(timeit.repeat(render(False), number=1, repeat=self.repeat))
+        print(
+            f"\n{self.rows} rows rendered: "
+            f"row renderer {fast_time * 1000:.1f}ms, "
+            f"template loop {loop_time * 1000:.1f}ms"
+        )
+        self.assertLess(fast_time, loop_time)
+
+
+@pytest.mark.benchmark
+class RegistryGiftStatsBenchmark(TestCase):
+    """
+    Counts and sums the gifts of a registry with 2,000 cash gifts and
+    500 in-kind gifts.
+    Run with `pytest -m benchmark -s`.
+    """
+
+    cash_gifts = 2000
+    in_kind_gifts = 500
+    repeat = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        registry = WeddingGiftRegistryFactory()
+        CashGift.objects.bulk_create(
+            CashGift(registry=registry, name=f"guest {i}", price=50000)
+            for i in range(cls.cash_gifts)
+        )
+        InKindGift.objects.bulk_create(
+            InKindGift(registry=registry, name=f"guest {i}", price=100000)
+            for i in range(cls.in_kind_gifts)
+        )
+        # bulk_create() doesn't update the stored statistics.
+        WeddingGiftRegistry.objects.rebuild_gift_stats()
+        cls.registry = registry
+
+    def test_gift_stats(self):
+        registries = WeddingGiftRegistry.objects.filter(pk=self.registry.pk)
+
+        def joined():
+            # Both gift tables joined in one aggregate.
+            registry = registries.annotate(
+                cash_gift_cnt_=Count("cash_gifts", distinct=True),
+                in_kind_gift_cnt_=Count("in_kind_gifts", distinct=True),
+            ).get()
+            return registry.cash_gift_cnt_, registry.in_kind_gift_cnt_
+
+        def subqueries():
+            registry = registries.with_gift_stats().get()
+            return registry.live_cash_gift_cnt, registry.live_in_kind_gift_cnt
+
+        def stored():
+            registry = registries.get()
+            return registry.cash_gift_cnt, registry.in_kind_gift_cnt
+
+        expected = (self.cash_gifts, self.in_kind_gifts)
+        times = {}
+        for name, run in [
+            ("joined", joined),
+            ("subqueries", subqueries),
+            ("stored", stored),
+        ]:
+            self.assertEqual(run(), expected)
+            times[name] = min(timeit.repeat(run, number=1, repeat=self.repeat))
+        print(
+            f"\n{self.cash_gifts} x {self.in_kind_gifts} gifts counted: "
+            + ", ".join(f"{name} {time * 1000:.1f}ms" for name, time in times.items())
+        )
+        self.assertLess(times["subqueries"], times["joined"])
+        self.assertLess(times["stored"], times["subqueries"])
+
+
+@pytest.mark.benchmark
+class PriceDistributionBenchmark(TestCase):
+    """
+    Computes the price distribution of a registry with 1,000,000 cash gifts.
+    Run with `pytest -m benchmark -s`.
+    """
+
+    gifts = 1_000_000
+    repeat = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.registry = WeddingGiftRegistryFactory()
+        CashGift.objects.bulk_create(
+            (
+                CashGift(registry=cls.registry, name="guest", price=(i * 7919) % 500000)
+                for i in range(cls.gifts)
+            ),
+            batch_size=10000,
+        )
+
+    def test_price_distribution(self):
+        def per_row():
+            # Model instances and Python loops over every gift.
+            prices = sorted(
+                gift.price for gift in CashGift.objects.filter(registry=self.registry)
+            )
+            histogram = [0] * (len(PRICE_BANDS) + 1)
+            for price in prices:
+                histogram[sum(price >= bound for bound in PRICE_BANDS)] += 1
+            return statistics.median(prices), histogram
+
+        def vectorized():
+            distribution = get_price_distribution(
+                fetch_prices(registry_id=self.registry.pk)
+            )
+            return distribution["median"], distribution["histogram"]
+
+        self.assertEqual(per_row(), vectorized())
+        per_row_time = min(timeit.repeat(per_row, number=1, repeat=1))
+        vectorized_time = min(timeit.repeat(vectorized, number=1, repeat=self.repeat))
+        print(
+            f"\n{self.gifts} gift prices: "
+            f"per row {per_row_time * 1000:.1f}ms, "
+            f"array {vectorized_time * 1000:.1f}ms"
+        )
+        self.assertLess(vectorized_time, per_row_time)
+
+
+@pytest.mark.benchmark
+class GiftSearchBenchmark(TestCase):
+    """
+    Searches the name and detail of 500,000 in-kind gifts with the icontains
+    lookups and with the full text search of InKindGiftTable.
+    Run with `pytest -m benchmark -s`.
+    """
+
+    gifts = 500_000
+    repeat = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.registry = WeddingGiftRegistryFactory()
+        InKindGift.objects.bulk_create(
+            (
+                InKindGift(
+                    registry=cls.registry,
+                    name=f"guest {i}",
+                    price=10000,
+                    kind="appliance",
+                    kind_detail=f"rice cooker model{i % 5000}x",
+                )
+                for i in range(cls.gifts)
+            ),
+            batch_size=10000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {InKindGift._meta.db_table}")
+
+    def test_search(self):
+        request = RequestFactory().get("/fake-url/", {"search": "model42x"})
+        queryset = InKindGift.objects.filter(registry=self.registry).order_by("-id")
+
+        def search(table_class):
+            def run():
+                table = table_class(request, InKindGift, queryset)
+                return sorted(gift.pk for gift in table.result_objects)
+
+            return run
+
+        self.assertEqual(search(InKindGiftLookupTable)(), search(InKindGiftTable)())
+        lookup_time = min(
+            timeit.repeat(search(InKindGiftLookupTable), number=1, repeat=self.repeat)
+        )
+        full_text_time = min(
+            timeit.repeat(search(InKindGiftTable), number=1, repeat=self.repeat)
+        )
+        print(
+            f"\n{self.gifts} gifts searched: "
+            f"icontains {lookup_time * 1000:.1f}ms, "
+            f"full text {full_text_time * 1000:.1f}ms"
+        )
+        self.assertLess(full_text_time, lookup_time)
+
+
+@pytest.mark.benchmark
+class GiftNameSearchBenchmark(TestCase):
+    """
+    Searches the initial consonants of the names of a registry with 50,000
+    cash gifts, through the name_search index and in Python.
+    Run with `pytest -m benchmark -s`.
+    """
+
+    gifts = 50_000
+    repeat = 5
+    family_names = "김이박최정강조윤장임한오서신권황안송류홍"
+    given_names = "민서지하준도윤우예은현수진영호성연아유경"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.registry = WeddingGiftRegistryFactory()
+        given_name_cnt = len(cls.given_names)
+        CashGift.objects.bulk_create(
+            (
+                CashGift(
+                    registry=cls.registry,
+                    name=(
+                        cls.family_names[i % len(cls.family_names)]
+                        + cls.given_names[i // 7 % given_name_cnt]
+                        + cls.given_names[i // 131 % given_name_cnt]
+                    ),
+                    price=10000,
+                )
+                for i in range(cls.gifts)
+            ),
+            batch_size=10000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {CashGift._meta.db_table}")
+
+    def test_initial_consonants(self):
+        search = "ㅎㅈㅇ"
+        request = RequestFactory().get(
+            "/fake-url/", {"search": search, "search_mode": "partial"}
+        )
+        queryset = CashGift.objects.filter(registry=self.registry).order_by("-id")
+
+        def in_python():
+            names = queryset.values_list("pk", "name")
+            return sorted(pk for pk, name in names if search in get_choseong(name))
+
+        def indexed():
+            table = CashGiftTable(request, CashGift, queryset, list_per_page=1000)
+            return sorted(gift.pk for gift in table.result_objects)
+
+        self.assertEqual(in_python(), indexed())
+        python_time = min(timeit.repeat(in_python, number=1, repeat=self.repeat))
+        indexed_time = min(timeit.repeat(indexed, number=1, repeat=self.repeat))
+        print(
+            f"\n{self.gifts} gift names searched: "
+            f"in Python {python_time * 1000:.1f}ms, "
+            f"name_search index {indexed_time * 1000:.1f}ms"
+        )
+        self.assertLess(indexed_time, python_time)
+
+
+class CashGiftIExactTable(CashGiftTable):
+    search_fields = ["name__iexact"]
+
+
+@pytest.mark.benchmark
+class GiftExactSearchBenchmark(TestCase):
+    """
+    Searches an exact name among 500,000 cash gifts of a registry with
+    name__iexact and with the normalized name index of CashGiftTable.
+    Run with `pytest -m benchmark -s`.
+    """
+
+    gifts = 500_000
+    repeat = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.registry = WeddingGiftRegistryFactory()
+        CashGift.objects.bulk_create(
+            (
+                CashGift(registry=cls.registry, name=f"Guest {i}", price=10000)
+                for i in range(cls.gifts)
+            ),
+            batch_size=10000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {CashGift._meta.db_table}")
+
+    def test_exact_search(self):
+        request = RequestFactory().get("/fake-url/", {"search": "guest 4242"})
+        queryset = CashGift.objects.filter(registry=self.registry).order_by("-id")
+
+        def search(table_class):
+            def run():
+                table = table_class(request, CashGift, queryset)
+                return [gift.pk for gift in table.result_objects]
+
+            return run
+
+        self.assertEqual(search(CashGiftIExactTable)(), search(CashGiftTable)())
+        iexact_time = min(
+            timeit.repeat(search(CashGiftIExactTable), number=1, repeat=self.repeat)
+        )
+        normalized_time = min(
+            timeit.repeat(search(CashGiftTable), number=1, repeat=self.repeat)
+        )
+        print(
+            f"\n{self.gifts} gift names searched: "
+            f"iexact {iexact_time * 1000:.1f}ms, "
+            f"normalized name index {normalized_time * 1000:.1f}ms"
+        )
+        self.assertLess(normalized_time, iexact_time)
@@ -0,0 +1,123 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from kara.accounts.factories import UserFactory
+from kara.wedding_gifts.factories import (
+    CashGiftFactory,
+    GiftTagFactory,
+    InKindGiftFactory,
+    WeddingGiftRegistryFactory,
+)
+from kara.wedding_gifts.insights import get_gift_insights
+
+
+def summarize(rows):
+    return [(row.key, row.cnt, row.total_price) for row in rows]
+
+
+class GiftInsightsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.registry = WeddingGiftRegistryFactory(owner=cls.user)
+        family = GiftTagFactory(owner=cls.user, name="Family")
+        friend = GiftTagFactory(owner=cls.user, name="Friend")
+        day = datetime.date(2030, 7, 7)
+        for name, price, tags in [
+            ("Kim", 50000, [family]),
+            ("Lee", 100000, [family, friend]),
+            ("Kim", 20000, []),
+        ]:
+            gift = CashGiftFactory(
+                registry=cls.registry, name=name, price=price, receipt_date=day
+            )
+            gift.tags.set(tags)
+        gift = InKindGiftFactory(
+            registry=cls.registry,
+            name="Park",
+            price=600000,
+            kind="furniture",
+            receipt_date=day + datetime.timedelta(days=1),
+        )
+        gift.tags.set([friend])
+        # Gifts of other registries are left out.
+        CashGiftFactory(name="Kim", price=1000000)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_insights(self):
+        with self.assertNumQueries(1):
+            insights = get_gift_insights(self.registry)
+        self.assertEqual(insights["total_cnt"], 4)
+        self.assertEqual(insights["total_price"], 770000)
+        self.assertEqual(
+            summarize(insights["gift_types"]),
+            [("cash", 3, 170000), ("in_kind", 1, 600000)],
+        )
+        self.assertEqual(summarize(insights["kinds"]), [("furniture", 1, 600000)])
+        self.assertEqual(
+            summarize(insights["tags"]),
+            [("Friend", 2, 700000), ("Family", 2, 150000)],
+        )
+        self.assertEqual(
+            summarize(insights["receipts"]),
+            [
+                (datetime.date(2030, 7, 7), 3, 170000),
+                (datetime.date(2030, 7, 8), 1, 600000),
+            ],
+        )
+        self.assertEqual(
+            summarize(insights["top_givers"]),
+            [("Park", 1, 600000), ("Lee", 1, 100000), ("Kim", 2, 70000)],
+        )
+        self.assertEqual(
+            summarize(insights["price_bands"]),
+            [
+                (0, 1, 20000),
+                (1, 0, 0),
+                (2, 1, 50000),
+                (3, 1, 100000),
+                (4, 0, 0),
+                (5, 1, 600000),
+            ],
+        )
+        self.assertEqual(
+            [row.ratio for row in insights["price_bands"]], [100, 0, 100, 100, 0, 100]
+        )
+        self.assertEqual([row.ratio for row in insights["gift_types"]], [28, 100])
+
+    def test_empty_registry(self):
+        insights = get_gift_insights(WeddingGiftRegistryFactory())
+        self.assertEqual(insights["total_cnt"], 0)
+        self.assertEqual(summarize(insights["gift_types"])[0], ("cash", 0, 0))
+        self.assertEqual(insights["top_givers"], [])
+        self.assertEqual({row.ratio for row in insights["price_bands"]}, {0})
+
+    def test_insights_cached(self):
+        insights = get_gift_insights(self.registry)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_gift_insights(self.registry), insights)
+        CashGiftFactory(registry=self.registry, name="Choi", price=30000)
+        with self.assertNumQueries(1):
+            insights = get_gift_insights(self.registry)
+        self.assertEqual(insights["total_cnt"], 5)
+        tag = GiftTagFactory(owner=self.user, name="Work")
+        self.registry.cash_gifts.get(name="Choi").tags.add(tag)
+        insights = get_gift_insights(self.registry)
+        self.assertIn(("Work", 1, 30000), summarize(insights["tags"]))
+
+    def test_view(self):
+        url = reverse("gift_insight", args=(self.registry.pk,))
+        self.client.force_login(UserFactory())
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Park")
+        self.assertContains(response, "500,000 ~")
+        self.assertContains(response, "4 gifts received, 770,000 won in total")
@@ -0,0 +1,243 @@
+import datetime
+from io import StringIO
+from unittest.mock import ANY
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from kara.wedding_gifts.factories import (
+    CashGiftFactory,
+    InKindGiftFactory,
+    WeddingGiftRegistryFactory,
+)
+from kara.wedding_gifts.models import (
+    CashGift,
+    GiftDailyRollup,
+    InKindGift,
+    WeddingGiftRegistry,
+)
+
+
+class RegistryGiftStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.registry = WeddingGiftRegistryFactory()
+        cls.other_registry = WeddingGiftRegistryFactory()
+
+    def assertStats(self, registry, *stats):
+        registry.refresh_from_db()
+        self.assertEqual(
+            tuple(getattr(registry, field) for field in registry.STATS_FIELDS), stats
+        )
+
+    def test_gift_create_update_delete(self):
+        gift = CashGiftFactory(registry=self.registry, price=10000)
+        CashGiftFactory(registry=self.registry, price=5000)
+        InKindGiftFactory(registry=self.registry, price=70000)
+        self.assertStats(self.registry, 2, 1, 15000, 70000)
+        self.assertEqual(self.registry.total_gift_cnt, 3)
+        self.assertEqual(self.registry.total_price, 85000)
+        gift.price = 20000
+        gift.save()
+        self.assertStats(self.registry, 2, 1, 25000, 70000)
+        gift.registry = self.other_registry
+        gift.save()
+        self.assertStats(self.registry, 1, 1, 5000, 70000)
+        self.assertStats(self.other_registry, 1, 0, 20000, 0)
+        gift.delete()
+        CashGift.objects.filter(registry=self.registry).delete()
+        self.assertStats(self.registry, 0, 1, 0, 70000)
+        self.assertStats(self.other_registry, 0, 0, 0, 0)
+
+    def test_gift_save_update_fields(self):
+        gift = CashGiftFactory(registry=self.registry, price=10000)
+        gift.price = 20000
+        gift.registry = self.other_registry
+        gift.save(update_fields=["name"])
+        self.assertStats(self.registry, 1, 0, 10000, 0)
+        self.assertStats(self.other_registry, 0, 0, 0, 0)
+        gift.save(update_fields=["price"])
+        self.assertStats(self.registry, 1, 0, 20000, 0)
+        self.assertStats(self.other_registry, 0, 0, 0, 0)
+        gift.save(update_fields=["registry_id"])
+        self.assertStats(self.registry, 0, 0, 0, 0)
+        self.assertStats(self.other_registry, 1, 0, 20000, 0)
+        self.assertFalse(WeddingGiftRegistry.objects.with_outdated_gift_stats())
+
+    def test_registry_save_keeps_stats(self):
+        registry = WeddingGiftRegistry.objects.get(pk=self.registry.pk)
+        CashGiftFactory(registry=self.registry, price=10000)
+        registry.receiver = "evian"
+        registry.save()
+        self.assertStats(registry, 1, 0, 10000, 0)
+        self.assertEqual(registry.receiver, "evian")
+
+    def test_registry_save_deferred_fields(self):
+        registry = WeddingGiftRegistry.objects.only("owner", "receiver").get(
+            pk=self.registry.pk
+        )
+        registry.receiver = "evian"
+        with self.assertNumQueries(1):
+            registry.save()
+        registry.refresh_from_db()
+        self.assertEqual(registry.receiver, "evian")
+        self.assertEqual(registry.receptionist, self.registry.receptionist)
+
+    def test_with_gift_stats(self):
+        CashGiftFactory.create_batch(3, registry=self.registry, price=10000)
+        InKindGiftFactory.create_batch(2, registry=self.registry, price=70000)
+        registry = WeddingGiftRegistry.objects.with_gift_stats().get(
+            pk=self.registry.pk
+        )
+        self.assertEqual(
+            [getattr(registry, f"live_{field}") for field in registry.STATS_FIELDS],
+            [3, 2, 30000, 140000],
+        )
+        other_registry = WeddingGiftRegistry.objects.with_gift_stats().get(
+            pk=self.other_registry.pk
+        )
+        self.assertEqual(other_registry.live_cash_gift_cnt, 0)
+        self.assertEqual(other_registry.live_in_kind_gift_total_price, 0)
+        self.assertFalse(WeddingGiftRegistry.objects.with_outdated_gift_stats())
+
+    def test_rebuild_registry_stats(self):
+        CashGiftFactory(registry=self.registry, price=10000)
+        InKindGiftFactory(registry=self.other_registry, price=70000)
+        # Bulk operations don't update the statistics.
+        CashGift.objects.bulk_create(
+            [CashGift(registry=self.registry, name="guest", price=5000)]
+        )
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "1 of 2 registries"):
+            call_command("rebuild_registry_stats", verify=True, stdout=out)
+        self.assertIn(f"Registry {self.registry.pk} is out of date.", out.getvalue())
+        self.assertStats(self.registry, 1, 0, 10000, 0)
+        call_command("rebuild_registry_stats", batch_size=1, stdout=out)
+        self.assertStats(self.registry, 2, 0, 15000, 0)
+        self.assertStats(self.other_registry, 0, 1, 0, 70000)
+        out = StringIO()
+        call_command("rebuild_registry_stats", verify=True, stdout=out)
+        self.assertIn("2 registries checked, 0 were out of date.", out.getvalue())
+
+
+class GiftDailyRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.registry = WeddingGiftRegistryFactory(side=WeddingGiftRegistry.GROOM)
+        cls.other_registry = WeddingGiftRegistryFactory(side=WeddingGiftRegistry.BRIDE)
+        cls.day = datetime.date(2030, 7, 7)
+        cls.next_day = datetime.date(2030, 7, 8)
+
+    def assertRollups(self, *rollups):
+        self.assertEqual(
+            list(
+                GiftDailyRollup.objects.order_by(
+                    "registry__side", "date", "gift_type"
+                ).values_list("side", "date", "gift_type", "cnt", "total_price")
+            ),
+            list(rollups),
+        )
+
+    def test_gift_create_update_delete(self):
+        gift = CashGiftFactory(
+            registry=self.registry, price=10000, receipt_date=self.day
+        )
+        CashGiftFactory(registry=self.registry, price=5000, receipt_date=self.day)
+        InKindGiftFactory(registry=self.registry, price=70000, receipt_date=self.day)
+        self.assertRollups(
+            ("Groom", self.day, "cash", 2, 15000),
+            ("Groom", self.day, "in_kind", 1, 70000),
+        )
+        gift.price = 20000
+        gift.save()
+        self.assertRollups(
+            ("Groom", self.day, "cash", 2, 25000),
+            ("Groom", self.day, "in_kind", 1, 70000),
+        )
+        gift.receipt_date = self.next_day
+        gift.save()
+        gift.registry = self.other_registry
+        gift.save()
+        self.assertRollups(
+            ("Bride", self.next_day, "cash", 1, 20000),
+            ("Groom", self.day, "cash", 1, 5000),
+            ("Groom", self.day, "in_kind", 1, 70000),
+        )
+        gift.delete()
+        InKindGift.objects.get().delete()
+        self.assertRollups(("Groom", self.day, "cash", 1, 5000))
+
+    def test_gift_save_update_fields(self):
+        gift = CashGiftFactory(
+            registry=self.registry, price=10000, receipt_date=self.day
+        )
+        gift.price = 20000
+        gift.receipt_date = self.next_day
+        gift.save(update_fields=["name"])
+        self.assertRollups(("Groom", self.day, "cash", 1, 10000))
+        gift.save(update_fields=["receipt_date"])
+        self.assertRollups(("Groom", self.next_day, "cash", 1, 10000))
+        gift.save(update_fields=["price"])
+        self.assertRollups(("Groom", self.next_day, "cash", 1, 20000))
+
+    def test_registry_side_change(self):
+        CashGiftFactory(registry=self.registry, price=10000, receipt_date=self.day)
+        self.registry.side = WeddingGiftRegistry.BRIDE
+        self.registry.save()
+        self.assertRollups(("Bride", self.day, "cash", 1, 10000))
+        self.registry.delete()
+        self.assertRollups()
+
+    def test_registry_owner_delete(self):
+        CashGiftFactory(registry=self.registry, price=10000, receipt_date=self.day)
+        InKindGiftFactory(registry=self.registry, price=70000, receipt_date=self.day)
+        CashGiftFactory(registry=self.other_registry, receipt_date=self.day)
+        self.registry.owner.delete()
+        self.assertFalse(WeddingGiftRegistry.objects.filter(pk=self.registry.pk))
+        self.assertRollups(("Bride", self.day, "cash", 1, ANY))
+
+    def test_no_rollup_created_by_subtraction(self):
+        CashGift.objects.bulk_create(
+            [
+                CashGift(
+                    registry=self.registry,
+                    name="guest",
+                    price=5000,
+                    receipt_date=self.day,
+                )
+            ]
+        )
+        CashGift.objects.get().delete()
+        self.assertRollups()
+
+    def test_rebuild_gift_daily_rollups(self):
+        CashGiftFactory(registry=self.registry, price=10000, receipt_date=self.day)
+        InKindGiftFactory(
+            registry=self.other_registry, price=70000, receipt_date=self.day
+        )
+        # Bulk operations don't update the rollups.
+        CashGift.objects.bulk_create(
+            [
+                CashGift(
+                    registry=self.registry,
+                    name="guest",
+                    price=5000,
+                    receipt_date=self.next_day,
+                )
+            ]
+        )
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "1 of 2 registries"):
+            call_command("rebuild_gift_daily_rollups", verify=True, stdout=out)
+        self.assertIn(f"Registry {self.registry.pk} is out of date.", out.getvalue())
+        call_command("rebuild_gift_daily_rollups", batch_size=1, stdout=out)
+        self.assertRollups(
+            ("Bride", self.day, "in_kind", 1, 70000),
+            ("Groom", self.day, "cash", 1, 10000),
+            ("Groom", self.next_day, "cash", 1, 5000),
+        )
+        out = StringIO()
+        call_command("rebuild_gift_daily_rollups", verify=True, stdout=out)
+        self.assertIn("2 registries checked, 0 were out of date.", out.getvalue())
@@ -0,0 +1,96 @@
+import statistics
+from array import array
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from kara.accounts.factories import UserFactory
+from kara.wedding_gifts.factories import (
+    CashGiftFactory,
+    InKindGiftFactory,
+    WeddingGiftRegistryFactory,
+)
+from kara.wedding_gifts.price_stats import (
+    fetch_prices,
+    get_owner_price_distribution,
+    get_price_distribution,
+    get_registry_price_distribution,
+    is_outlier,
+    percentile,
+)
+
+
+class PriceDistributionTests(SimpleTestCase):
+    def test_percentile(self):
+        prices = array("l", [10, 20, 30, 40, 1000])
+        self.assertEqual(percentile(prices, 0), 10)
+        self.assertEqual(percentile(prices, 50), 30)
+        self.assertEqual(percentile(prices, 100), 1000)
+        self.assertEqual(
+            [percentile(prices, percent) for percent in (25, 50, 75)],
+            statistics.quantiles(prices, n=4, method="inclusive"),
+        )
+        self.assertEqual(percentile(array("l", [7]), 90), 7)
+
+    def test_distribution(self):
+        prices = array("l", sorted([20000, 50000, 50000, 50000, 100000, 1000000]))
+        distribution = get_price_distribution(prices)
+        self.assertEqual(distribution["cnt"], 6)
+        self.assertEqual((distribution["min"], distribution["max"]), (20000, 1000000))
+        self.assertEqual(distribution["mean"], statistics.mean(prices))
+        self.assertEqual(distribution["median"], statistics.median(prices))
+        # ~ 30,000 | ~ 50,000 | ~ 100,000 | ~ 200,000 | ~ 500,000 | 500,000 ~
+        self.assertEqual(distribution["histogram"], [1, 0, 3, 1, 0, 1])
+        self.assertEqual(distribution["low_outlier_cnt"], 0)
+        self.assertEqual(distribution["high_outlier_cnt"], 1)
+        self.assertTrue(is_outlier(1000000, distribution))
+        self.assertFalse(is_outlier(20000, distribution))
+
+    def test_no_prices(self):
+        self.assertIsNone(get_price_distribution(array("l")))
+
+
+class PriceDistributionQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.registry = WeddingGiftRegistryFactory(owner=cls.user)
+        other_registry = WeddingGiftRegistryFactory(owner=cls.user)
+        for price in (50000, 10000, 30000):
+            CashGiftFactory(registry=cls.registry, price=price)
+        InKindGiftFactory(registry=cls.registry, price=20000)
+        CashGiftFactory(registry=other_registry, price=70000)
+        CashGiftFactory(price=5000)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fetch_prices(self):
+        with self.assertNumQueries(1):
+            prices = fetch_prices(registry_id=self.registry.pk)
+        self.assertEqual(prices, array("l", [10000, 20000, 30000, 50000]))
+        self.assertEqual(
+            fetch_prices(registry__owner_id=self.user.pk),
+            array("l", [10000, 20000, 30000, 50000, 70000]),
+        )
+
+    def test_registry_distribution_cached(self):
+        with self.assertNumQueries(1):
+            distribution = get_registry_price_distribution(self.registry.pk)
+        self.assertEqual(distribution["median"], 25000)
+        with self.assertNumQueries(0):
+            get_registry_price_distribution(self.registry.pk)
+        CashGiftFactory(registry=self.registry, price=40000)
+        distribution = get_registry_price_distribution(self.registry.pk)
+        self.assertEqual(distribution["median"], 30000)
+
+    def test_owner_distribution(self):
+        distribution = get_owner_price_distribution(self.user.pk)
+        self.assertEqual(distribution["cnt"], 5)
+        self.assertEqual(distribution["median"], 30000)
+        owner = UserFactory()
+        self.assertIsNone(get_owner_price_distribution(owner.pk))
+        # No gifts is cached too.
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_owner_price_distribution(owner.pk))
@@ -1,5 +1,6 @@
 import factory
 import pytest
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from playwright.sync_api import expect
@@ -11,6 +12,7 @@ from kara.wedding_gifts.factories import (
     WeddingGiftRegistryFactory,
 )
 from kara.wedding_gifts.models import WeddingGiftRegistry
+from kara.wedding_gifts.summary import get_registry_summary
 
 
 class RegistryAddViewTests(TestCase):
@@ -107,6 +109,60 @@ class RegistryDetailViewTests(TestCase):
         )
 
 
+class MyRegistryDashboardViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.registries = WeddingGiftRegistryFactory.create_batch(3, owner=cls.user)
+        CashGiftFactory.create_batch(2, price=10000, registry=cls.registries[0])
+        InKindGiftFactory.create_batch(2, price=10000, registry=cls.registries[0])
+        CashGiftFactory.create(price=500000, registry=cls.registries[1])
+        # Not counted.
+        CashGiftFactory.create_batch(5, registry=WeddingGiftRegistryFactory())
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_registry_summary(self):
+        with self.assertNumQueries(1):
+            summary = get_registry_summary(self.user)
+        self.assertEqual(summary["my_registry_cnt"], 3)
+        self.assertEqual(summary["my_cash_gift_cnt"], 3)
+        self.assertEqual(summary["my_in_kind_gift_cnt"], 2)
+        top_gift_cnt_registry = summary["top_gift_cnt_registry"]
+        self.assertEqual(top_gift_cnt_registry, self.registries[0])
+        self.assertEqual(top_gift_cnt_registry.cash_gift_cnt, 2)
+        self.assertEqual(top_gift_cnt_registry.in_kind_gift_cnt, 2)
+        self.assertEqual(top_gift_cnt_registry.total_gift_cnt, 4)
+        top_total_price_registry = summary["top_total_price_registry"]
+        self.assertEqual(top_total_price_registry, self.registries[1])
+        self.assertEqual(top_total_price_registry.total_price, 500000)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_registry_summary(self.user), summary)
+
+    def test_registry_summary_invalidated(self):
+        get_registry_summary(self.user)
+        InKindGiftFactory.create(price=1000000, registry=self.registries[2])
+        summary = get_registry_summary(self.user)
+        self.assertEqual(summary["my_in_kind_gift_cnt"], 3)
+        self.assertEqual(summary["top_total_price_registry"], self.registries[2])
+        self.registries[0].delete()
+        summary = get_registry_summary(self.user)
+        self.assertEqual(summary["my_registry_cnt"], 2)
+        self.assertEqual(summary["my_cash_gift_cnt"], 1)
+
+    def test_registry_summary_without_registry(self):
+        summary = get_registry_summary(UserFactory())
+        self.assertEqual(summary["my_registry_cnt"], 0)
+        self.assertIsNone(summary["top_gift_cnt_registry"])
+
+    def test_template_render(self):
+        response = self.client.get(reverse("my_registry_dashboard"))
+        self.assertEqual(response.context["my_registry_cnt"], 3)
+        self.assertContains(response, 'data-count="500000"')
+
+
 @pytest.mark.playwright
 class TestPlaywright:
 
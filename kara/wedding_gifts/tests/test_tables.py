@@ -1,6 +1,9 @@
+import unicodedata
 from datetime import date
 
-from django.test import TestCase, override_settings
+from django.db import connection
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 
 from kara.wedding_gifts.factories import (
@@ -10,6 +13,16 @@ from kara.wedding_gifts.factories import (
     UserFactory,
     WeddingGiftRegistryFactory,
 )
+from kara.wedding_gifts.models import AllGift, CashGift, InKindGift
+from kara.wedding_gifts.tables import AllGiftTable, CashGiftTable, InKindGiftTable
+
+
+class CashGiftRowTable(CashGiftTable):
+    row_mode = "tuple"
+
+
+class InKindGiftRowTable(InKindGiftTable):
+    row_mode = "tuple"
 
 
 @override_settings(DATE_FORMAT="F j, Y")
@@ -62,3 +75,232 @@ class GiftTableTest(TestCase):
                 "</ul></td>"
             ),
         )
+
+    def test_display_for_value(self):
+        cases = [
+            (CashGiftTable, InKindGiftTable),
+            (CashGiftRowTable, InKindGiftRowTable),
+        ]
+        for cash_gift_table, in_kind_gift_table in cases:
+            with self.subTest(row_mode=cash_gift_table.row_mode):
+                self.assert_display_for_value(cash_gift_table, in_kind_gift_table)
+
+    def assert_display_for_value(self, cash_gift_table, in_kind_gift_table):
+        request = RequestFactory().get("/fake-url/")
+        queryset = InKindGift.objects.all()
+        table = in_kind_gift_table(request, InKindGift, queryset)
+        gift = table.result_objects[0]
+        self.assertEqual(table.display_for_value(gift, "kind"), "Appliance")
+        self.assertEqual(
+            table.display_for_value(gift, "kind_detail"),
+            "very very loooo ooooo ooooo ooooo ooooo ooooo …",
+        )
+        self.assertEqual(table.display_for_value(gift, "price"), "10,000")
+        self.assertEqual(table.display_for_value(gift, "receipt_date"), "July 7, 2030")
+        queryset = CashGift.objects.all()
+        table = cash_gift_table(request, CashGift, queryset)
+        gift = table.result_objects[0]
+        self.assertEqual(table.display_for_value(gift, "price"), "100,000,000")
+        self.assertHTMLEqual(
+            table.display_for_value(gift, "tags"),
+            (
+                '<ul class="tags">'
+                '<li style="background-color: #527525; color: white;">Family</li>'
+                '<li style="background-color: #9965BA; color: white;">Friend</li>'
+                "</ul>"
+            ),
+        )
+
+    def test_fast_render_parity(self):
+        template = Template("{% load tables %}{% table table %}")
+        cases = [
+            (CashGiftTable, CashGift),
+            (InKindGiftTable, InKindGift),
+            (InKindGiftRowTable, InKindGift),
+        ]
+        request = RequestFactory().get("/fake-url/")
+        for table_class, model in cases:
+            with self.subTest(table_class=table_class):
+                table = table_class(request, model, model.objects.all())
+                fast_html = template.render(Context({"table": table}))
+                table.fast_render = False
+                html = template.render(Context({"table": table}))
+                self.assertEqual(fast_html, html)
+                self.assertIn('<ul class="tags">', fast_html)
+
+
+class InKindGiftSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        registry = WeddingGiftRegistryFactory()
+        for name, kind_detail in [
+            ("김민수", "냉장고"),
+            ("Lee", "LG 냉장고 냉장고 세트"),
+            ("Park", "냄비"),
+            ("냉장고 가게", None),
+        ]:
+            InKindGiftFactory(registry=registry, name=name, kind_detail=kind_detail)
+        # Gifts of other registries are not searched.
+        InKindGiftFactory(name="Choi", kind_detail="냉장고")
+        cls.queryset = InKindGift.objects.filter(registry=registry).order_by("-id")
+
+    def search(self, value):
+        request = RequestFactory().get("/fake-url/", {"search": value})
+        table = InKindGiftTable(request, InKindGift, self.queryset)
+        return [gift.name for gift in table.result_objects]
+
+    def test_search_name_and_detail(self):
+        self.assertEqual(self.search("김민수"), ["김민수"])
+        self.assertEqual(self.search("lg"), ["Lee"])
+        # The beginning of a word is enough and every word must match.
+        self.assertEqual(self.search("냉장 세트"), ["Lee"])
+        self.assertEqual(self.search("장고"), [])
+
+    def test_best_matches_first(self):
+        self.assertEqual(self.search("냉장고"), ["Lee", "냉장고 가게", "김민수"])
+
+    def test_search_vector_follows_gift(self):
+        gift = InKindGift.objects.get(name="Park")
+        gift.kind_detail = "전자레인지"
+        gift.save()
+        self.assertEqual(self.search("전자"), ["Park"])
+        self.assertEqual(self.search("냄비"), [])
+
+
+class CashGiftPartialSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.registry = WeddingGiftRegistryFactory(owner=cls.user)
+        CashGift.objects.bulk_create(
+            CashGift(registry=cls.registry, name=name, price=10000)
+            for name in ["김민수", "김민지", "이민수", "Kim Minsu", "황보 닭"]
+        )
+        # Gifts of other registries are not searched.
+        CashGiftFactory(name="김민수")
+        cls.queryset = CashGift.objects.filter(registry=cls.registry).order_by("id")
+
+    def search(self, value, search_mode="partial"):
+        request = RequestFactory().get(
+            "/fake-url/", {"search": value, "search_mode": search_mode}
+        )
+        table = CashGiftTable(request, CashGift, self.queryset)
+        return [gift.name for gift in table.result_objects]
+
+    def test_initial_consonants(self):
+        self.assertEqual(self.search("ㄱㅁㅅ"), ["김민수"])
+        self.assertEqual(self.search("ㅁㅅ"), ["김민수", "이민수"])
+        self.assertEqual(self.search("ㄷ"), ["황보 닭"])
+
+    def test_part_of_name(self):
+        self.assertEqual(self.search("김민"), ["김민수", "김민지"])
+        # Syllables still being typed.
+        self.assertEqual(self.search("김미"), ["김민수", "김민지"])
+        self.assertEqual(self.search("김ㅁ"), ["김민수", "김민지"])
+        self.assertEqual(self.search("호"), ["황보 닭"])
+        self.assertEqual(self.search("민수"), ["김민수", "이민수"])
+        self.assertEqual(self.search("minsu kI"), ["Kim Minsu"])
+        self.assertEqual(self.search("김민수 이"), [])
+
+    def test_exact_mode(self):
+        self.assertEqual(self.search("김민"), ["김민수", "김민지"])
+        self.assertEqual(self.search("김민", search_mode="exact"), [])
+        self.assertEqual(self.search("kim minsu", search_mode="exact"), ["Kim Minsu"])
+        self.assertEqual(self.search("kim minsu", search_mode=""), ["Kim Minsu"])
+
+    def test_name_search_follows_name(self):
+        gift = CashGiftFactory(registry=self.registry, name="박서준")
+        self.assertEqual(self.search("ㅂㅅㅈ"), ["박서준"])
+        gift.name = "박보검"
+        gift.save(update_fields=["name"])
+        self.assertEqual(self.search("ㅂㅅㅈ"), [])
+        self.assertEqual(self.search("ㅂㅂㄱ"), ["박보검"])
+
+    def test_all_gifts(self):
+        InKindGiftFactory(registry=self.registry, name="김민국")
+        request = RequestFactory().get(
+            "/fake-url/", {"search": "ㄱㅁ", "search_mode": "partial"}
+        )
+        table = AllGiftTable(
+            request, AllGift, AllGift.objects.filter(registry=self.registry)
+        )
+        self.assertEqual(
+            sorted(gift.name for gift in table.result_objects),
+            ["김민국", "김민수", "김민지"],
+        )
+
+    def test_search_mode_rendered(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("gift_table", args=(self.registry.pk,)),
+            {"search": "ㄱㅁㅅ", "search_mode": "partial"},
+        )
+        self.assertContains(response, '<option value="partial" selected>', html=False)
+        self.assertEqual(
+            [gift.name for gift in response.context["table"].result_objects],
+            ["김민수"],
+        )
+
+
+class GiftExactSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.registry = WeddingGiftRegistryFactory()
+        for name in ["Kim Minsu", "Kim Min", "김민수"]:
+            CashGiftFactory(registry=cls.registry, name=name)
+        InKindGiftFactory(registry=cls.registry, name="kim  minsu")
+        # Gifts of other registries are not searched.
+        CashGiftFactory(name="Kim Minsu")
+
+    def search(self, table_class, model, value):
+        request = RequestFactory().get("/fake-url/", {"search": value})
+        queryset = model.objects.filter(registry=self.registry)
+        return table_class(request, model, queryset).result_objects
+
+    def test_search(self):
+        self.assertEqual(
+            [gift.name for gift in self.search(CashGiftTable, CashGift, " KIM  minsu")],
+            ["Kim Minsu"],
+        )
+        # Decomposed Hangul (NFD), e.g. typed on macOS.
+        nfd_name = unicodedata.normalize("NFD", "김민수")
+        self.assertEqual(
+            [gift.name for gift in self.search(CashGiftTable, CashGift, nfd_name)],
+            ["김민수"],
+        )
+        self.assertEqual(
+            sorted(
+                gift.name for gift in self.search(AllGiftTable, AllGift, "kim minsu")
+            ),
+            ["Kim Minsu", "kim  minsu"],
+        )
+
+    def test_search_uses_registry_name_index(self):
+        for model in (CashGift, InKindGift):
+            model.objects.bulk_create(
+                model(registry=self.registry, name=f"guest {i}", price=10000)
+                for i in range(500)
+            )
+        with connection.cursor() as cursor:
+            for model in (CashGift, InKindGift):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        for table_class, model, indexes in [
+            (CashGiftTable, CashGift, ["cashgift_registry_name"]),
+            (InKindGiftTable, InKindGift, []),
+            (
+                AllGiftTable,
+                AllGift,
+                ["cashgift_registry_name", "inkindgift_registry_name"],
+            ),
+        ]:
+            with self.subTest(table_class=table_class):
+                queryset = model.objects.filter(registry=self.registry)
+                request = RequestFactory().get("/fake-url/", {"search": "kim minsu"})
+                table = table_class(request, model, queryset)
+                plan = table.get_search_result(queryset, table.search_value).explain()
+                for index in indexes:
+                    self.assertIn(index, plan)
@@ -0,0 +1,153 @@
+import datetime
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from kara.accounts.factories import UserFactory
+from kara.base.cache import claim_request, is_latest_request
+from kara.wedding_gifts.factories import (
+    CashGiftFactory,
+    InKindGiftFactory,
+    WeddingGiftRegistryFactory,
+)
+from kara.wedding_gifts.typeahead import get_gift_suggestions
+
+
+def get_gift_queries(queries):
+    return [query["sql"] for query in queries if "gift" in query["sql"]]
+
+
+class GiftTypeaheadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.registry = WeddingGiftRegistryFactory(owner=cls.user)
+        for day, name in enumerate(["김민수", "김민지", "이민수", "김철수"], 1):
+            CashGiftFactory(
+                registry=cls.registry,
+                name=name,
+                price=50000,
+                receipt_date=datetime.date(2030, 7, day),
+            )
+        InKindGiftFactory(
+            registry=cls.registry, name="김민국", receipt_date=datetime.date(2030, 7, 9)
+        )
+        # Gifts of other registries are not suggested.
+        CashGiftFactory(name="김민수")
+        cls.url = reverse("gift_typeahead", args=(cls.registry.pk,))
+
+    def setUp(self):
+        cache.clear()
+
+    def suggest(self, search, gift_type="cash"):
+        return [
+            suggestion.name
+            for suggestion in get_gift_suggestions(self.registry.pk, gift_type, search)
+        ]
+
+    def test_suggestions(self):
+        self.assertEqual(self.suggest("ㄱㅁ"), ["김민지", "김민수"])
+        self.assertEqual(self.suggest("민수"), ["이민수", "김민수"])
+        self.assertEqual(self.suggest("ㄱㅁ", "all"), ["김민국", "김민지", "김민수"])
+        self.assertEqual(self.suggest("ㄱㅁ", "in_kind"), ["김민국"])
+        self.assertEqual(self.suggest(" "), [])
+
+    def test_longer_searches_filtered_from_cache(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.suggest("김"), ["김철수", "김민지", "김민수"])
+        self.assertEqual(len(get_gift_queries(queries)), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.suggest("김미"), ["김민지", "김민수"])
+            self.assertEqual(self.suggest("김민 ㅅ"), ["김민수"])
+            self.assertEqual(self.suggest("김민수"), ["김민수"])
+        self.assertEqual(get_gift_queries(queries), [])
+        # A search that isn't narrower than the cached one is queried.
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.suggest("철"), ["김철수"])
+        self.assertEqual(len(get_gift_queries(queries)), 1)
+
+    def test_cache_follows_gifts(self):
+        self.assertEqual(self.suggest("김민"), ["김민지", "김민수"])
+        CashGiftFactory(
+            registry=self.registry,
+            name="김민호",
+            receipt_date=datetime.date(2030, 8, 1),
+        )
+        self.assertEqual(self.suggest("김민"), ["김민호", "김민지", "김민수"])
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, {"search": "ㄱㅁㅅ", "gift_type": "cash"})
+        self.assertContains(response, "김민수")
+        self.assertNotContains(response, "김민지")
+        self.assertContains(response, "search_mode=exact")
+        response = self.client.get(self.url, {"search": "ㅎ"})
+        self.assertContains(response, "No matching gifts.")
+        response = self.client.get(self.url, {"search": "김", "gift_type": "other"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_view_of_another_owner(self):
+        self.client.force_login(UserFactory())
+        response = self.client.get(self.url, {"search": "김"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_stale_requests_dropped(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, {"search": "김민", "typeahead_seq": "2"})
+        self.assertContains(response, "김민수")
+        response = self.client.get(self.url, {"search": "김", "typeahead_seq": "1"})
+        self.assertEqual(response.status_code, 204)
+        # Other tables of the client are not affected.
+        response = self.client.get(
+            self.url, {"search": "김", "typeahead_seq": "1", "gift_type": "all"}
+        )
+        self.assertContains(response, "김민국")
+
+    def test_claim_request(self):
+        self.assertTrue(claim_request("table", 2))
+        self.assertTrue(claim_request("table", 2))
+        self.assertFalse(claim_request("table", 1))
+        self.assertTrue(is_latest_request("table", 2))
+        self.assertTrue(claim_request("table", 3))
+        self.assertFalse(is_latest_request("table", 2))
+        self.assertTrue(is_latest_request("other-table", 1))
+
+    def test_concurrent_claims(self):
+        """
+        A later request claimed while an older claim is in progress is
+        recorded after it, not overwritten by it.
+        """
+        later_claim = threading.Thread(target=claim_request, args=("table", 2))
+        cache_set = cache.set
+
+        def set_after_later_claim(*args, **kwargs):
+            if later_claim.ident is None:
+                later_claim.start()
+                time.sleep(0.02)
+            cache_set(*args, **kwargs)
+
+        with mock.patch.object(cache, "set", side_effect=set_after_later_claim):
+            self.assertTrue(claim_request("table", 1))
+            later_claim.join()
+        self.assertTrue(is_latest_request("table", 2))
+        self.assertFalse(is_latest_request("table", 1))
+
+    def test_claim_lock_timeout(self):
+        cache.add("kara.request_sequence.table.lock", 1)
+        with mock.patch("kara.base.cache.CLAIM_LOCK_ATTEMPTS", 2):
+            self.assertFalse(claim_request("table", 2))
+        cache.delete("kara.request_sequence.table.lock")
+        self.assertTrue(claim_request("table", 2))
+
+    def test_gift_table_search_box(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("gift_table", args=(self.registry.pk,)))
+        self.assertContains(response, 'id="table-search-typeahead"')
+        self.assertContains(response, f"{self.url}?gift_type=cash")
@@ -1,11 +1,17 @@
 import datetime
+import html
+import io
 import re
 from unittest import skip
 
+import openpyxl
 import pytest
+from django.core.cache import cache
+from django.db import connection
 from django.db.models.query import QuerySet
 from django.template.defaultfilters import urlencode
 from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.views.generic import ListView
 from playwright.sync_api import expect
@@ -18,8 +24,18 @@ from kara.wedding_gifts.factories import (
     InKindGiftFactory,
     WeddingGiftRegistryFactory,
 )
-from kara.wedding_gifts.models import CashGift, GiftTag, InKindGift
-from kara.wedding_gifts.views import WeddingGiftRegistryContextMixin
+from kara.wedding_gifts.models import (
+    AllGift,
+    CashGift,
+    GiftTag,
+    InKindGift,
+    WeddingGiftRegistry,
+)
+from kara.wedding_gifts.views import (
+    AllGiftCursorPagination,
+    GiftTableView,
+    WeddingGiftRegistryContextMixin,
+)
 
 
 class GiftAddViewTests(TestCase):
@@ -88,6 +104,35 @@ class GiftAddViewTests(TestCase):
             list(tags.values_list("id", flat=True)), [self.tag1.id, self.tag2.id]
         )
 
+    def test_add_gift_form_partial(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f"{self.url}?gift_type=cash",
+                data={
+                    "name": "Tim Bread",
+                    "price_0": "10000",
+                    "price_1": 10,
+                    "receipt_date_0": "2020",
+                    "receipt_date_1": "5",
+                    "receipt_date_2": "19",
+                },
+                headers={"HX-Request": "true", "HX-Target": "gift-form"},
+            )
+        self.assertTrue(CashGift.objects.filter(name="Tim Bread").exists())
+        self.assertEqual(set(response.context_data), {"view", "gift_form"})
+        content = response.content.decode()
+        self.assertTrue(content.strip().startswith('<form id="gift-form"'))
+        self.assertIn('name="name"', content)
+        # The registry selector isn't rendered, so registries aren't listed.
+        self.assertFalse(
+            [
+                query
+                for query in queries
+                if 'WHERE "wedding_gifts_weddinggiftregistry"."owner_id"'
+                in query["sql"]
+            ]
+        )
+
     @skip("reuse_form will be applied when HTMX is added to the form.")
     def test_reuse_before_selected_price_button(self):
         response = self.client.get(self.url)
@@ -116,6 +161,402 @@ class GiftAddViewTests(TestCase):
         )
 
 
+@override_settings(WEDDING_GIFT_REGISTRY_SELECTOR_LIST_PER_PAGE=5)
+class RegistrySelectorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.registries = WeddingGiftRegistryFactory.create_batch(
+            6, owner=cls.user, receptionist="isis"
+        )
+        cls.searched = WeddingGiftRegistryFactory(
+            owner=cls.user, receiver="evian", receptionist="isis"
+        )
+        # Registries of other users aren't listed.
+        WeddingGiftRegistryFactory(receiver="evian")
+        cls.url = reverse("add_gift", args=(cls.registries[0].pk,))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_selector(self, query=""):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                f"{self.url}{query}",
+                headers={"HX-Request": "true", "HX-Target": "registry-selector"},
+            )
+        registry_queries = [
+            query
+            for query in queries
+            if WeddingGiftRegistry._meta.db_table in query["sql"]
+        ]
+        content = response.content.decode()
+        pks = re.findall(r'href="/[^"]*registry/([0-9a-f-]+)/gift/add/"', content)
+        return pks, registry_queries
+
+    def test_paginated(self):
+        pks, _ = self.get_selector()
+        self.assertEqual(len(pks), 5)
+        # The current registry comes first.
+        self.assertEqual(pks[0], str(self.registries[0].pk))
+        next_pks, _ = self.get_selector("?registry_page=2")
+        self.assertEqual(len(next_pks), 2)
+        self.assertEqual(
+            {*pks, *next_pks},
+            {str(registry.pk) for registry in [*self.registries, self.searched]},
+        )
+
+    def test_search(self):
+        pks, _ = self.get_selector("?registry_search=evi")
+        self.assertEqual(pks, [str(self.searched.pk)])
+
+    def test_cached(self):
+        pks, registry_queries = self.get_selector()
+        self.assertTrue(registry_queries)
+        cached_pks, registry_queries = self.get_selector()
+        self.assertEqual(cached_pks, pks)
+        self.assertEqual(registry_queries, [])
+        CashGiftFactory(registry=self.registries[0])
+        _, registry_queries = self.get_selector()
+        self.assertTrue(registry_queries)
+
+
+class GiftTableViewCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.registry = WeddingGiftRegistryFactory(owner=cls.user)
+        cls.gift = CashGiftFactory(registry=cls.registry, name="guest")
+        cls.url = reverse("gift_table", args=(cls.registry.pk,))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_table_area(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.url,
+                headers={"HX-Request": "true", "HX-Target": "partial-table-area"},
+            )
+        gift_queries = [
+            query for query in queries if CashGift._meta.db_table in query["sql"]
+        ]
+        return response.content.decode(), gift_queries
+
+    def test_table_scoped_to_registry(self):
+        CashGiftFactory(name="other guest")
+        content, _ = self.get_table_area()
+        self.assertIn("<td>guest</td>", content)
+        self.assertNotIn("other guest", content)
+
+    def test_table_of_another_owner(self):
+        self.client.force_login(UserFactory())
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_unknown_gift_type(self):
+        response = self.client.get(self.url, {"gift_type": "other"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_table_fragment_cached(self):
+        content, gift_queries = self.get_table_area()
+        self.assertIn("<td>guest</td>", content)
+        self.assertTrue(gift_queries)
+        cached_content, gift_queries = self.get_table_area()
+        self.assertEqual(cached_content, content)
+        self.assertEqual(gift_queries, [])
+
+    def test_table_fragment_invalidated(self):
+        self.get_table_area()
+        self.gift.name = "new guest"
+        self.gift.save()
+        content, gift_queries = self.get_table_area()
+        self.assertIn("<td>new guest</td>", content)
+        self.assertTrue(gift_queries)
+        tag = GiftTagFactory(owner=self.user, name="Family")
+        self.get_table_area()
+        self.gift.tags.add(tag)
+        content, _ = self.get_table_area()
+        self.assertIn("Family", content)
+        tag.name = "Friend"
+        tag.save()
+        content, _ = self.get_table_area()
+        self.assertIn("Friend", content)
+
+
+@override_settings(WEDDING_GIFT_REGISTRY_TABLE_LIST_PER_PAGE=3)
+class GiftTableViewInfiniteScrollTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        registry = WeddingGiftRegistryFactory(owner=cls.user)
+        cls.gifts = [
+            CashGiftFactory(registry=registry, name=f"guest {i}") for i in range(8)
+        ]
+        cls.url = reverse("gift_table", args=(registry.pk,))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get_next_rows_url(self, content):
+        match = re.search(r'<tr id="table-next-rows"[^>]* hx-get="([^"]+)"', content)
+        return html.unescape(match[1]) if match else None
+
+    def test_scroll_through_rows(self):
+        response = self.client.get(f"{self.url}?scroll=infinite")
+        content = response.content.decode()
+        self.assertNotIn('class="pagination"', content)
+        names = re.findall(r"<td>(guest \d)</td>", content)
+        next_rows_url = self.get_next_rows_url(content)
+        while next_rows_url:
+            response = self.client.get(
+                f"{self.url}{next_rows_url}",
+                headers={"HX-Request": "true", "HX-Target": "table-next-rows"},
+            )
+            content = response.content.decode()
+            # Only the new rows are rendered.
+            self.assertNotIn("<table", content)
+            self.assertTrue(content.strip().startswith("<tr>"))
+            names += re.findall(r"<td>(guest \d)</td>", content)
+            next_rows_url = self.get_next_rows_url(content)
+        self.assertEqual(names, [gift.name for gift in reversed(self.gifts)])
+
+    def test_invalid_order_param(self):
+        self.gifts[7].tags.set(
+            [GiftTagFactory(owner=self.user), GiftTagFactory(owner=self.user)]
+        )
+        orders = ["?", "registry__owner__password", "-unknown", "tags", "registry"]
+        for scroll in ["infinite", "pages"]:
+            for order in orders:
+                with self.subTest(scroll=scroll, order=order):
+                    response = self.client.get(
+                        self.url, {"scroll": scroll, "order": order}
+                    )
+                    self.assertEqual(response.status_code, 200)
+                    names = re.findall(
+                        r"<td>(guest \d)</td>", response.content.decode()
+                    )
+                    self.assertEqual(names, ["guest 7", "guest 6", "guest 5"])
+
+    def test_page_links_by_default(self):
+        response = self.client.get(self.url)
+        content = response.content.decode()
+        self.assertIn('class="pagination"', content)
+        self.assertIsNone(self.get_next_rows_url(content))
+
+
+@override_settings(WEDDING_GIFT_REGISTRY_TABLE_LIST_PER_PAGE=3)
+class AllGiftTableTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        registry = WeddingGiftRegistryFactory(owner=cls.user)
+        for i in range(4):
+            CashGiftFactory(
+                registry=registry,
+                name=f"cash {i}",
+                receipt_date=datetime.date(2030, 7, 1 + i * 2),
+            )
+            InKindGiftFactory(
+                registry=registry,
+                name=f"in kind {i}",
+                kind="decor",
+                receipt_date=datetime.date(2030, 7, 2 + i * 2),
+            )
+        CashGiftFactory(
+            registry=registry,
+            name="Kim",
+            price=50000,
+            receipt_date=datetime.date(2030, 6, 1),
+        )
+        InKindGiftFactory(
+            registry=registry,
+            name="kim",
+            price=70000,
+            receipt_date=datetime.date(2030, 6, 1),
+        )
+        # Gifts of other registries are not listed.
+        InKindGiftFactory(name="Kim")
+        cls.registry = registry
+        cls.url = reverse("gift_table", args=(registry.pk,))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_names(self, content):
+        return re.findall(r"<td>((?:cash|in kind) \d)</td>", content)
+
+    def test_all_gifts_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                f"{self.url}?gift_type=all",
+                headers={"HX-Request": "true", "HX-Target": "partial-table-area"},
+            )
+        content = response.content.decode()
+        self.assertEqual(self.get_names(content), ["in kind 3", "cash 3", "in kind 2"])
+        self.assertIn("<td>Decor</td>", content)
+        # The page and the count are fetched together from the view.
+        gift_queries = [
+            query["sql"] for query in queries if "wedding_gifts_allgift" in query["sql"]
+        ]
+        self.assertEqual(len(gift_queries), 1)
+        self.assertIn("COUNT(*) OVER ()", gift_queries[0])
+        self.assertEqual(response.context["table"].pagination.result_count, 10)
+
+    def test_search_all_gifts(self):
+        response = self.client.get(f"{self.url}?gift_type=all&search=KIM")
+        table = response.context["table"]
+        self.assertEqual(
+            sorted((obj.gift_type, obj.price) for obj in table.result_objects),
+            [("cash", 50000), ("in_kind", 70000)],
+        )
+        gift = next(obj for obj in table.result_objects if obj.gift_type == "in_kind")
+        self.assertIsInstance(gift.get_gift(), InKindGift)
+        self.assertEqual(gift.get_gift().name, "kim")
+
+    def test_scroll_through_all_gifts(self):
+        response = self.client.get(f"{self.url}?gift_type=all&scroll=infinite")
+        content = response.content.decode()
+        names = self.get_names(content)
+        while match := re.search(
+            r'<tr id="table-next-rows"[^>]* hx-get="([^"]+)"', content
+        ):
+            response = self.client.get(
+                f"{self.url}{html.unescape(match[1])}",
+                headers={"HX-Request": "true", "HX-Target": "table-next-rows"},
+            )
+            content = response.content.decode()
+            names += self.get_names(content)
+        self.assertEqual(
+            names,
+            [
+                f"{gift_type} {i}"
+                for i in range(3, -1, -1)
+                for gift_type in ("in kind", "cash")
+            ],
+        )
+
+    def test_scroll_uses_registry_date_index(self):
+        for model in (CashGift, InKindGift):
+            model.objects.bulk_create(
+                model(registry=self.registry, name=f"guest {i}", price=10000)
+                for i in range(500)
+            )
+        with connection.cursor() as cursor:
+            for model in (CashGift, InKindGift):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        queryset = AllGift.objects.filter(registry=self.registry).order_by(
+            *GiftTableView.ordering["all"]
+        )
+        pagination = AllGiftCursorPagination(RequestFactory().get("/"), queryset, 3)
+        pagination.get_objects()
+        self.assertEqual(
+            pagination.ordering, ["-receipt_date", "-gift_id", "gift_type"]
+        )
+        plan = queryset.order_by(*pagination.ordering)[:4].explain()
+        # Both tables are read in order of (receipt_date, id) from their index.
+        self.assertRegex(
+            plan, r"Merge Append.*\n\s+Sort Key: \S+receipt_date DESC, \S+id DESC"
+        )
+        self.assertIn("cashgift_registry_date", plan)
+        self.assertIn("inkindgift_registry_date", plan)
+
+
+class GiftTableExportViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        tag = GiftTagFactory(owner=cls.user, name="Family")
+        cls.registry = WeddingGiftRegistryFactory(owner=cls.user, receiver="Kim")
+        for i in range(5):
+            gift = CashGiftFactory(
+                registry=cls.registry,
+                name=f"guest {i}",
+                price=10000 * (i + 1),
+                receipt_date=datetime.date(2030, 7, 7),
+            )
+            gift.tags.set([tag])
+        InKindGiftFactory(
+            registry=cls.registry,
+            name="=SUM(A1)",
+            kind="appliance",
+            price=30000,
+            receipt_date=datetime.date(2030, 7, 8),
+        )
+        # Gifts of other registries are not exported.
+        CashGiftFactory(name="guest of another registry")
+        cls.url = reverse("gift_export", args=(cls.registry.pk,))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_export_csv(self):
+        response = self.client.get(f"{self.url}?order=price&search=guest 3")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("Kim_cashgift.csv", response["Content-Disposition"])
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(
+            content,
+            "\ufeffname,price,date of receipt,tags\r\n"
+            "guest 3,40000,2030-07-07,Family\r\n",
+        )
+        response = self.client.get(f"{self.url}?order=-price")
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 6)
+        self.assertTrue(rows[1].startswith("guest 4,50000,"))
+
+    def test_export_in_kind_xlsx(self):
+        response = self.client.get(f"{self.url}?gift_type=in_kind&format=xlsx")
+        self.assertIn("Kim_inkindgift.xlsx", response["Content-Disposition"])
+        workbook = openpyxl.load_workbook(
+            io.BytesIO(b"".join(response.streaming_content))
+        )
+        rows = list(workbook.active.values)
+        self.assertEqual(
+            rows[0],
+            ("name", "Gift Kind", "Gift Detail", "price", "date of receipt", "tags"),
+        )
+        self.assertEqual(
+            rows[1],
+            (
+                "=SUM(A1)",
+                "Appliance",
+                None,
+                30000,
+                datetime.datetime(2030, 7, 8),
+                None,
+            ),
+        )
+
+    def test_export_csv_formula(self):
+        response = self.client.get(f"{self.url}?gift_type=in_kind")
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn("'=SUM(A1),Appliance", content)
+
+    def test_invalid_export(self):
+        other_registry = WeddingGiftRegistryFactory()
+        urls = [
+            f"{self.url}?format=pdf",
+            f"{self.url}?gift_type=unknown",
+            reverse("gift_export", args=(other_registry.pk,)),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
 class FishView(WeddingGiftRegistryContextMixin, ListView):
     template_name = "blue_fish.html"
     model = Fish
@@ -59,3 +59,16 @@ WEDDING_GIFT_REGISTRY_DETAIL = [
     _("Simple Registry Insights"),
     _("See the simple insights for the currently selected registry"),
 ]
+
+GIFT_INSIGHTS = [
+    _("Gift Insights"),
+    _("See how the gifts of the selected registry add up"),
+    _("Cash and in kind gifts"),
+    _("Gifts by kind"),
+    _("Gifts by tag"),
+    _("Gifts received per day"),
+    _("Top givers"),
+    _("Gifts by price band"),
+    _("Prices are in won"),
+    _("Gift price distribution"),
+]
@@ -0,0 +1,97 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from kara.base.cache import get_data_version, make_cache_key
+from kara.base.hangul import get_words, is_broader_search, matches_search
+from kara.base.search import HangulSearch
+
+from .models import AllGift, CashGift, InKindGift, WeddingGiftRegistry
+
+# Number of gifts suggested while typing.
+TYPEAHEAD_LIMIT = 8
+# Number of matching gifts cached for a search. The gifts matching a longer
+# search are filtered from them if they are all the matching gifts.
+TYPEAHEAD_CANDIDATE_LIMIT = 200
+# Longer searches aren't looked up in the cache of their prefixes.
+TYPEAHEAD_PREFIX_MAX_LENGTH = 32
+
+GIFT_MODELS = {"cash": CashGift, "in_kind": InKindGift, "all": AllGift}
+
+Suggestion = namedtuple("Suggestion", ["name", "price", "receipt_date"])
+
+name_search = HangulSearch("name_search")
+
+
+def get_cache_key(registry_pk, gift_type, version, search):
+    return make_cache_key(
+        "kara.gift_typeahead", str(registry_pk), gift_type, version, search
+    )
+
+
+def fetch_candidates(registry_pk, gift_type, search):
+    model = GIFT_MODELS[gift_type]
+    queryset = name_search.filter(
+        model.objects.filter(registry_id=registry_pk), search
+    ).order_by("-receipt_date", "-pk")
+    rows = list(
+        queryset.values_list("name", "price", "receipt_date")[
+            : TYPEAHEAD_CANDIDATE_LIMIT + 1
+        ]
+    )
+    return {
+        "complete": len(rows) <= TYPEAHEAD_CANDIDATE_LIMIT,
+        "gifts": [Suggestion(*row) for row in rows[:TYPEAHEAD_CANDIDATE_LIMIT]],
+    }
+
+
+def get_gift_suggestions(registry_pk, gift_type, search):
+    """
+    Returns the latest gifts of the registry whose name matches the search,
+    as in the "partial" search mode of the gift table.
+
+    The matching gifts are cached for a few seconds per registry, gift type
+    and search, and until the registry or its gifts change. While typing,
+    each search extends the previous one, so the gifts are usually filtered
+    in Python from those cached for a prefix of the search instead of
+    being queried.
+    """
+    search = " ".join(get_words(search))
+    if not search:
+        return []
+    version = get_data_version(WeddingGiftRegistry.get_data_version_key(registry_pk))
+    prefixes = [search]
+    if len(search) <= TYPEAHEAD_PREFIX_MAX_LENGTH:
+        prefixes += [search[:end] for end in range(len(search) - 1, 0, -1)]
+    cache_keys = {
+        prefix: get_cache_key(registry_pk, gift_type, version, prefix)
+        for prefix in prefixes
+    }
+    cached = cache.get_many(cache_keys.values())
+    candidates = cached.get(cache_keys[search])
+    if candidates is None:
+        for prefix in prefixes[1:]:
+            prefix_candidates = cached.get(cache_keys[prefix])
+            if (
+                prefix_candidates is not None
+                and prefix_candidates["complete"]
+                and is_broader_search(prefix, search)
+            ):
+                candidates = {
+                    "complete": True,
+                    "gifts": [
+                        gift
+                        for gift in prefix_candidates["gifts"]
+                        if matches_search(gift.name, search)
+                    ],
+                }
+                break
+        else:
+            candidates = fetch_candidates(registry_pk, gift_type, search)
+        cache.set(
+            cache_keys[search],
+            candidates,
+            timeout=settings.WEDDING_GIFT_TYPEAHEAD_CACHE_TIMEOUT,
+        )
+    return candidates["gifts"][:TYPEAHEAD_LIMIT]
@@ -33,6 +33,16 @@ urlpatterns = [
         views.GiftTableView.as_view(),
         name="gift_table",
     ),
+    path(
+        "registry/<uuid:pk>/gift/typeahead/",
+        views.GiftTypeaheadView.as_view(),
+        name="gift_typeahead",
+    ),
+    path(
+        "registry/<uuid:pk>/gift/export/",
+        views.GiftTableExportView.as_view(),
+        name="gift_export",
+    ),
     path(
         "registry/<uuid:pk>/gift/insight/",
         views.GiftInsightsView.as_view(),
@@ -1,22 +1,24 @@
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import (
-    Case,
-    Count,
-    F,
-    IntegerField,
-    OuterRef,
-    Subquery,
-    Sum,
-    Value,
-    When,
-)
-from django.db.models.functions import Coalesce
+from django.db.models import Case, IntegerField, Q, When
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import CreateView, TemplateView, UpdateView, View
 from django.views.generic.base import ContextMixin
 
+from kara.base.cache import (
+    claim_request,
+    get_data_version,
+    is_latest_request,
+    make_cache_key,
+)
+from kara.base.exports import EXPORT_WRITERS, export_table
+from kara.base.pagination import CachedCount, CursorPagination, Pagination
 from kara.base.views import (
     PartialTemplateCreateView,
     PartialTemplateListView,
@@ -24,8 +26,20 @@ from kara.base.views import (
 )
 
 from .forms import CashGiftForm, InKindGiftForm, WeddingGiftRegistryForm
-from .models import CashGift, InKindGift, WeddingGiftRegistry
-from .tables import CashGiftTable, InKindGiftTable
+from .insights import get_gift_insights
+from .models import AllGift, CashGift, InKindGift, WeddingGiftRegistry
+from .price_stats import get_owner_price_distribution, get_registry_price_distribution
+from .summary import REGISTRY_SUMMARY_KEYS, get_registry_summary
+from .tables import (
+    SEARCH_MODE_VAR,
+    AllGiftExportTable,
+    AllGiftTable,
+    CashGiftExportTable,
+    CashGiftTable,
+    InKindGiftExportTable,
+    InKindGiftTable,
+)
+from .typeahead import GIFT_MODELS, get_gift_suggestions
 
 
 class WeddingGiftRegistryActionSelectView(TemplateView):
@@ -34,6 +48,8 @@ class WeddingGiftRegistryActionSelectView(TemplateView):
 
 class WeddingGiftRegistryContextMixin(ContextMixin):
     partial_template = ["registry-selector"]
+    registry_page_var = "registry_page"
+    registry_search_var = "registry_search"
 
     def dispatch(self, request, *args, **kwargs):
         htmx_target = self.request.headers.get("Hx-Target", None)
@@ -41,23 +57,48 @@ class WeddingGiftRegistryContextMixin(ContextMixin):
             self.template_name = "wedding_gifts/base.html"
         return super().dispatch(request, *args, **kwargs)
 
-    def get_context_data(self, **kwargs):
+    def get_registry_search(self):
+        return self.request.GET.get(self.registry_search_var, "").strip()
+
+    def get_registry_queryset(self):
         current_registry = self.kwargs.get("pk")
-        context = super().get_context_data(**kwargs)
         objects = (
             WeddingGiftRegistry.objects.filter(owner=self.request.user)
             .annotate(
-                cash_gift_cnt=Count("cash_gifts", distinct=True),
-                in_kind_gift_cnt=Count("in_kind_gifts", distinct=True),
                 current_is_first=Case(
                     When(pk=current_registry, then=0),
                     default=1,
                     output_field=IntegerField(),
                 ),
             )
-            .order_by("current_is_first", "updated_at")
+            .order_by("current_is_first", "updated_at", "pk")
         )
+        search = self.get_registry_search()
+        if search:
+            objects = objects.filter(
+                Q(receiver__icontains=search) | Q(receptionist__icontains=search)
+            )
+        return objects
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        objects = self.get_registry_queryset()
         context["registries"] = objects
+        # The selector is cached until a registry of the user or one of its
+        # gifts changes, the registries are only fetched on a cache miss.
+        context["registries_pagination"] = SimpleLazyObject(
+            lambda: Pagination(
+                self.request,
+                objects,
+                settings.WEDDING_GIFT_REGISTRY_SELECTOR_LIST_PER_PAGE,
+                self.registry_page_var,
+            )
+        )
+        context["registry_search_var"] = self.registry_search_var
+        context["registry_search"] = self.get_registry_search()
+        context["registry_selector_version_key"] = (
+            WeddingGiftRegistry.get_owner_data_version_key(self.request.user.pk)
+        )
         return context
 
 
@@ -65,72 +106,17 @@ class MyRegistryDashboardView(LoginRequiredMixin, PartialTemplateListView):
     template_name = "wedding_gifts/my_registry_dashboard.html"
     paginate = {WeddingGiftRegistry._meta.model_name: {"list_per_page": 2}}
     context_object_name = {WeddingGiftRegistry._meta.model_name: "registries"}
+    partial_context = {"my-registries": ["registries", "registries_pagination"]}
 
-    def dispatch(self, request, *args, **kwargs):
-        user = request.user
-        cash_gift_cnt = Count("cash_gifts", distinct=True)
-        in_kind_gift_cnt = Count("in_kind_gifts", distinct=True)
-        self.queryset = [
-            WeddingGiftRegistry.objects.filter(owner=user).annotate(
-                cash_gift_cnt=cash_gift_cnt,
-                in_kind_gift_cnt=in_kind_gift_cnt,
-            )
-        ]
-        # Number of registries, total recorded cash, and number of in kind gifts
-        self.my_wedding_gift_items_cnt = WeddingGiftRegistry.objects.filter(
-            owner=user
-        ).aggregate(
-            my_registry_cnt=Count("id", distinct=True),
-            my_cash_gift_cnt=cash_gift_cnt,
-            my_in_kind_gift_cnt=in_kind_gift_cnt,
-        )
-        # Registry with the most recorded gifts
-        self.top_gift_cnt_registry = (
-            WeddingGiftRegistry.objects.filter(owner=user)
-            .annotate(
-                cash_gift_cnt=cash_gift_cnt,
-                in_kind_gift_cnt=in_kind_gift_cnt,
-                total_gift_cnt=F("cash_gift_cnt") + F("in_kind_gift_cnt"),
-            )
-            .order_by("-total_gift_cnt")
-            .first()
-        )
-        # Registry with the highest received amount
-        self.top_total_price_registry = (
-            WeddingGiftRegistry.objects.filter(owner=user)
-            .annotate(
-                total_price=Coalesce(
-                    Subquery(
-                        CashGift.objects.filter(registry=OuterRef("pk"))
-                        .values("registry")
-                        .annotate(total=Sum("price"))
-                        .values("total")[:1]
-                    ),
-                    Value(0),
-                )
-                + Coalesce(
-                    Subquery(
-                        InKindGift.objects.filter(registry=OuterRef("pk"))
-                        .values("registry")
-                        .annotate(total=Sum("price"))
-                        .values("total")[:1]
-                    ),
-                    Value(0),
-                )
-            )
-            .order_by("-total_price")
-            .first()
-        )
-        return super().dispatch(request, *args, **kwargs)
+    def get_queryset(self):
+        return [WeddingGiftRegistry.objects.filter(owner=self.request.user)]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        extra_context = {
-            "top_gift_cnt_registry": self.top_gift_cnt_registry,
-            "top_total_price_registry": self.top_total_price_registry,
-        }
-        context.update(extra_context)
-        context.update(self.my_wedding_gift_items_cnt)
+        if self.needs_context(*REGISTRY_SUMMARY_KEYS):
+            # Number of registries and gifts, and the registries with the most
+            # gifts and the highest received amount.
+            context.update(get_registry_summary(self.request.user))
         return context
 
 
@@ -170,21 +156,12 @@ class WeddingGiftRegistryDetailView(UpdateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        registry = WeddingGiftRegistry.objects.filter(pk=self.object.pk)
-        cash_gift_insight = registry.aggregate(
-            cash_gift_cnt=Count("cash_gifts"),
-            cash_gift_total_price=Coalesce(Sum("cash_gifts__price"), 0),
-        )
-        in_kind_gift_insight = registry.aggregate(
-            in_kind_gift_cnt=Count("in_kind_gifts"),
-            in_kind_gift_total_price=Coalesce(Sum("in_kind_gifts__price"), 0),
-        )
-        context.update(cash_gift_insight)
-        context.update(in_kind_gift_insight)
-        context["gift_total_price"] = (
-            cash_gift_insight["cash_gift_total_price"]
-            + in_kind_gift_insight["in_kind_gift_total_price"]
-        )
+        registry = self.object
+        context["cash_gift_cnt"] = registry.cash_gift_cnt
+        context["cash_gift_total_price"] = registry.cash_gift_total_price
+        context["in_kind_gift_cnt"] = registry.in_kind_gift_cnt
+        context["in_kind_gift_total_price"] = registry.in_kind_gift_total_price
+        context["gift_total_price"] = registry.total_price
 
         return context
 
@@ -198,6 +175,7 @@ class GiftAddView(
         "cash": CashGiftForm,
         "in_kind": InKindGiftForm,
     }
+    partial_context = {"gift-form": ["gift_form"]}
 
     def dispatch(self, request, *args, **kwargs):
         gift_type = self.request.GET.get("gift_type", None) or self.request.POST.get(
@@ -222,15 +200,53 @@ class GiftAddView(
         return context
 
 
+class AllGiftCursorPagination(CursorPagination):
+    # Unlike the key of a mixed gift (e.g. "cash:42"), the gift id is indexed
+    # (see GiftTableView.ordering).
+    tiebreaker = ("gift_id", "gift_type")
+
+
 class GiftTableView(
-    WeddingGiftRegistryContextMixin, PartialTemplateResponseMixin, View
+    LoginRequiredMixin,
+    WeddingGiftRegistryContextMixin,
+    PartialTemplateResponseMixin,
+    View,
 ):
     template_name = "wedding_gifts/gift_table.html"
     model = {
         "cash": CashGift,
         "in_kind": InKindGift,
+        "all": AllGift,
+    }
+    table = {"cash": CashGiftTable, "in_kind": InKindGiftTable, "all": AllGiftTable}
+    # Newest first. Ids of cash and in-kind gifts don't compare, so the mixed
+    # list is ordered by date of receipt, then by id, matching the
+    # (registry, receipt_date, id) indexes of both tables. The gift type only
+    # orders a cash and an in-kind gift of the same date and id.
+    ordering = {
+        "cash": ["-id"],
+        "in_kind": ["-id"],
+        "all": ["-receipt_date", "-gift_id", "gift_type"],
+    }
+    # Set to CursorPagination to page through the table with keyset pagination.
+    pagination_class = None
+    # Append the next rows while scrolling instead of rendering page links.
+    # The "scroll" query parameter ("infinite" or "pages") overrides it.
+    infinite_scroll = False
+    partial_context = {
+        "partial-table-area": [
+            "table",
+            "table_cache_version",
+            "infinite_scroll",
+            "current_registry_pk",
+        ],
+        "table-next-rows": [
+            "table",
+            "table_cache_version",
+            "infinite_scroll",
+            "current_registry_pk",
+        ],
     }
-    table = {"cash": CashGiftTable, "in_kind": InKindGiftTable}
 
     def dispatch(self, request, *args, **kwargs):
         gift_type = self.request.GET.get("gift_type", None) or self.request.POST.get(
@@ -240,26 +256,185 @@ class GiftTableView(
         return super().dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        queryset = self.model[self.gift_type].objects.all().order_by("-id")
+        # Matches the (registry, -id) index of the gifts.
+        queryset = (
+            self.model[self.gift_type]
+            .objects.filter(registry_id=self.kwargs.get("pk"))
+            .order_by(*self.ordering[self.gift_type])
+        )
         return queryset
 
     def get(self, request, *args, **kwargs):
+        registry_pk = self.kwargs.get("pk")
+        if self.gift_type not in self.model:
+            raise Http404
+        if not WeddingGiftRegistry.objects.filter(
+            pk=registry_pk, owner=request.user
+        ).exists():
+            raise Http404
         context = self.get_context_data()
         return self.render_to_response(context)
 
+    def get_infinite_scroll(self):
+        scroll = self.request.GET.get("scroll", None)
+        if scroll in ("infinite", "pages"):
+            return scroll == "infinite"
+        return self.infinite_scroll
+
+    def get_pagination_class(self):
+        if self.get_infinite_scroll():
+            # The next rows are fetched with a cursor, see table_rows.html.
+            if self.gift_type == "all":
+                return AllGiftCursorPagination
+            return CursorPagination
+        return self.pagination_class
+
+    def get_count_provider(self):
+        # The cached count is invalidated whenever a gift of the registry
+        # is saved or deleted.
+        return CachedCount(version=get_data_version(self.get_data_version_key()))
+
+    def get_data_version_key(self):
+        """
+        Returns the data version key of the table, bumped whenever the
+        registry, its gifts or their tags change.
+        """
+        return WeddingGiftRegistry.get_data_version_key(self.kwargs.get("pk"))
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # The table queries only when a cached fragment misses.
         table = self.table[self.gift_type](
             self.request,
             model=self.model[self.gift_type],
             base_queryset=self.get_queryset(),
             list_per_page=settings.WEDDING_GIFT_REGISTRY_TABLE_LIST_PER_PAGE,
+            pagination_class=self.get_pagination_class(),
+            count_provider=self.get_count_provider(),
         )
         context["table"] = table
+        context["table_cache_version"] = self.get_data_version_key()
+        context["infinite_scroll"] = self.get_infinite_scroll()
         context["gift_type"] = self.gift_type
         context["current_registry_pk"] = self.kwargs.get("pk")
+        context["typeahead_url"] = (
+            reverse("gift_typeahead", args=(self.kwargs.get("pk"),))
+            + "?"
+            + urlencode({"gift_type": self.gift_type})
+        )
         return context
 
 
-class GiftInsightsView(TemplateView):
+class GiftTableExportView(LoginRequiredMixin, View):
+    """
+    Streams all gifts of a registry as a CSV or XLSX file.
+    The search, ordering and hidden columns of the gift table apply.
+    """
+
+    model = GiftTableView.model
+    table = {
+        "cash": CashGiftExportTable,
+        "in_kind": InKindGiftExportTable,
+        "all": AllGiftExportTable,
+    }
+
+    def get(self, request, *args, **kwargs):
+        gift_type = request.GET.get("gift_type", None) or "cash"
+        export_format = request.GET.get("format", None) or "csv"
+        if gift_type not in self.model or export_format not in EXPORT_WRITERS:
+            raise Http404
+        registry = get_object_or_404(
+            WeddingGiftRegistry, pk=self.kwargs.get("pk"), owner=request.user
+        )
+        model = self.model[gift_type]
+        table = self.table[gift_type](
+            request,
+            model=model,
+            base_queryset=model.objects.filter(registry=registry).order_by(
+                *GiftTableView.ordering[gift_type]
+            ),
+            paginate=False,
+        )
+        filename = f"{registry.receiver}_{model._meta.model_name}"
+        return export_table(table, export_format, filename)
+
+
+class GiftInsightsView(
+    LoginRequiredMixin, WeddingGiftRegistryContextMixin, TemplateView
+):
     template_name = "wedding_gifts/gift_insights.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        registry = get_object_or_404(
+            WeddingGiftRegistry.objects.only("pk", "receiver"),
+            pk=self.kwargs.get("pk"),
+            owner=self.request.user,
+        )
+        context["registry"] = registry
+        # All charts come from a single query, cached until the registry
+        # or its gifts change.
+        context["insights"] = get_gift_insights(registry)
+        context["price_distribution"] = get_registry_price_distribution(registry.pk)
+        context["owner_price_distribution"] = get_owner_price_distribution(
+            self.request.user.pk
+        )
+        return context
+
+
+class GiftTypeaheadView(LoginRequiredMixin, View):
+    """
+    Renders the gifts suggested while typing in the gift table search box,
+    without rendering the table (see get_gift_suggestions()).
+
+    The search box sends a growing "typeahead_seq" with each request. A
+    request older than the latest one of the same session and table gets
+    an empty 204 response, which htmx doesn't swap, so bursts of keystrokes
+    don't keep the workers busy.
+    """
+
+    template_name = "wedding_gifts/gift_typeahead.html"
+    sequence_var = "typeahead_seq"
+
+    def get_sequence(self):
+        try:
+            return int(self.request.GET.get(self.sequence_var, ""))
+        except ValueError:
+            return None
+
+    def get(self, request, *args, **kwargs):
+        pk = self.kwargs.get("pk")
+        gift_type = request.GET.get("gift_type", None) or "cash"
+        if gift_type not in GIFT_MODELS:
+            raise Http404
+        sequence = self.get_sequence()
+        sync_key = make_cache_key(
+            "kara.gift_typeahead.sync",
+            request.session.session_key,
+            str(pk),
+            gift_type,
+        )
+        if sequence is not None and not claim_request(sync_key, sequence):
+            return HttpResponse(status=204)
+        if not WeddingGiftRegistry.objects.filter(pk=pk, owner=request.user).exists():
+            raise Http404
+        search = request.GET.get(settings.SEARCH_VAR, "")
+        suggestions = get_gift_suggestions(pk, gift_type, search)
+        if sequence is not None and not is_latest_request(sync_key, sequence):
+            return HttpResponse(status=204)
+        table_params = {"gift_type": gift_type}
+        if gift_type != "in_kind":
+            table_params[SEARCH_MODE_VAR] = "exact"
+        table_url = reverse("gift_table", args=(pk,))
+        context = {
+            "suggestions": [
+                (
+                    suggestion,
+                    f"{table_url}?"
+                    + urlencode({**table_params, settings.SEARCH_VAR: suggestion.name}),
+                )
+                for suggestion in suggestions
+            ],
+            "search": search,
+        }
+        return render(request, self.template_name, context)